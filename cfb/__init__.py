@@ -0,0 +1,85 @@
+"""
+CFB (Cipher Feedback) mode engine used by the Streamlit pages
+
+The package has no Streamlit dependency. Names are resolved lazily from
+their submodules, so ``import cfb`` is cheap and pycryptodome and NumPy
+are only loaded by the parts that need them.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "AuthenticationError": "cfb.auth",
+    "BACKENDS": "cfb.backends",
+    "BLOCK_SIZE": "cfb.engine",
+    "CFBCache": "cfb.cache",
+    "CFBDecryptor": "cfb.stream",
+    "CFBEncryptor": "cfb.stream",
+    "CFBStreamReader": "cfb.aio",
+    "CFBStreamWriter": "cfb.aio",
+    "CFBTrace": "cfb.trace",
+    "CheckpointError": "cfb.checkpoint",
+    "CompressingReader": "cfb.compress",
+    "ContainerLayout": "cfb.container",
+    "DEFAULT_BACKEND": "cfb.backends",
+    "DecompressingWriter": "cfb.compress",
+    "ENCRYPTED_SUFFIX": "cfb.files",
+    "JobLimitError": "cfb.jobs",
+    "JobManager": "cfb.jobs",
+    "MappedCiphertext": "cfb.ranges",
+    "Profile": "cfb.instrument",
+    "SEGMENT_BITS": "cfb.bits",
+    "cfb_decrypt": "cfb.engine",
+    "cfb_decrypt_batch": "cfb.batch",
+    "cfb_decrypt_bits": "cfb.bits",
+    "cfb_decrypt_parallel": "cfb.parallel",
+    "cfb_encrypt": "cfb.engine",
+    "cfb_encrypt_batch": "cfb.batch",
+    "cfb_encrypt_bits": "cfb.bits",
+    "compress_stream": "cfb.compress",
+    "container_compressed": "cfb.compress",
+    "decompress_stream": "cfb.compress",
+    "decrypt_file": "cfb.files",
+    "decrypt_file_chunked": "cfb.container",
+    "decrypt_file_resumable": "cfb.checkpoint",
+    "decrypt_range": "cfb.ranges",
+    "decrypt_range_chunked": "cfb.container",
+    "decrypt_stream": "cfb.stream",
+    "decrypt_stream_authenticated": "cfb.auth",
+    "decrypt_stream_chunked": "cfb.container",
+    "decrypted_name": "cfb.files",
+    "describe_segment": "cfb.bits",
+    "encrypt_file": "cfb.files",
+    "encrypt_file_chunked": "cfb.container",
+    "encrypt_file_resumable": "cfb.checkpoint",
+    "encrypt_stream": "cfb.stream",
+    "encrypt_stream_authenticated": "cfb.auth",
+    "encrypt_stream_chunked": "cfb.container",
+    "encrypted_name": "cfb.files",
+    "generate_iv": "cfb.keys",
+    "generate_key": "cfb.keys",
+    "get_backend": "cfb.backends",
+    "is_authenticated": "cfb.auth",
+    "is_chunked": "cfb.container",
+    "is_compressed": "cfb.compress",
+    "open_cfb_connection": "cfb.aio",
+    "profiling": "cfb.instrument",
+    "spooled_output": "cfb.stream",
+    "start_cfb_server": "cfb.aio",
+    "verify_stream_authenticated": "cfb.auth",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'cfb' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,5 @@
+import sys
+
+from cfb.cli import main
+
+sys.exit(main())
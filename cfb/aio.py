@@ -0,0 +1,345 @@
+"""
+CFB encryption of asyncio streams
+
+``CFBStreamWriter`` and ``CFBStreamReader`` wrap an ``asyncio.StreamWriter``
+/ ``asyncio.StreamReader`` pair and encrypt or decrypt data as it is
+written or read, carrying the feedback register across calls. The bytes
+after the IV are exactly ``cfb_encrypt`` of everything written, and no
+byte is held back waiting for the rest of its segment. Back-pressure is
+left to the wrapped streams: ``drain()`` waits for the transport buffer
+like ``StreamWriter.drain()``.
+
+Each direction of a connection uses its own random IV, sent in clear as
+the first 16 bytes of the stream, so both peers only need to share the
+key. ``open_cfb_connection`` and ``start_cfb_server`` mirror
+``asyncio.open_connection`` and ``asyncio.start_server``.
+
+A loopback echo benchmark with many concurrent connections is run with::
+
+    python -m cfb loopback --connections 2000 --messages 20 --message-size 1K
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from cfb.backends import DEFAULT_BACKEND
+from cfb.engine import BLOCK_SIZE, check_parameters
+from cfb.keys import generate_iv, generate_key
+from cfb.stream import CFBDecryptor, CFBEncryptor
+
+# Ciphertext read from the socket per step
+READ_SIZE = 64 * 1024
+
+
+class CFBStreamWriter:
+    """
+    Encrypting wrapper around an ``asyncio.StreamWriter``
+
+    Args:
+        writer: Underlying ``asyncio.StreamWriter``
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (default: random), sent before the first ciphertext byte
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+    """
+
+    def __init__(self, writer, key, iv=None, segment_size=16, backend=DEFAULT_BACKEND):
+        self.writer = writer
+        self.iv = generate_iv() if iv is None else bytes(iv)
+        self.encryptor = CFBEncryptor(key, self.iv, segment_size, backend, emit_partial=True)
+        self.writer.write(self.iv)
+
+    def write(self, data):
+        """Encrypt ``data`` and queue it on the transport"""
+        ciphertext = self.encryptor.update(data)
+        if ciphertext:
+            self.writer.write(ciphertext)
+
+    def writelines(self, lines):
+        for data in lines:
+            self.write(data)
+
+    async def drain(self):
+        """Wait until the transport buffer is below its high-water mark"""
+        await self.writer.drain()
+
+    def can_write_eof(self):
+        return self.writer.can_write_eof()
+
+    def write_eof(self):
+        self.writer.write(self.encryptor.finalize())
+        self.writer.write_eof()
+
+    def is_closing(self):
+        return self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+    async def wait_closed(self):
+        await self.writer.wait_closed()
+
+    def get_extra_info(self, name, default=None):
+        return self.writer.get_extra_info(name, default)
+
+
+class CFBStreamReader:
+    """
+    Decrypting wrapper around an ``asyncio.StreamReader``
+
+    The IV is taken from the first 16 bytes of the stream.
+
+    Args:
+        reader: Underlying ``asyncio.StreamReader``
+        key: 256-bit decryption key (32 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+    """
+
+    def __init__(self, reader, key, segment_size=16, backend=DEFAULT_BACKEND):
+        # Validate the segment size now, the IV only arrives with the stream
+        check_parameters(bytes(BLOCK_SIZE), segment_size)
+        self.reader = reader
+        self.key = key
+        self.segment_size = segment_size
+        self.backend = backend
+        self.iv = None
+        self.decryptor = None
+        self.buffer = bytearray()
+        self.eof = False
+
+    async def _fill(self, size=READ_SIZE):
+        """Decrypt the next piece of the stream into the buffer, returning False at EOF"""
+        if self.eof:
+            return False
+        if self.decryptor is None:
+            try:
+                self.iv = await self.reader.readexactly(BLOCK_SIZE)
+            except asyncio.IncompleteReadError:
+                self.eof = True
+                return False
+            self.decryptor = CFBDecryptor(self.key, self.iv, self.segment_size, self.backend, emit_partial=True)
+        chunk = await self.reader.read(size)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.decryptor.finalize()
+            return False
+        self.buffer += self.decryptor.update(chunk)
+        return True
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def read(self, n=-1):
+        """
+        Read up to ``n`` plaintext bytes (all of them until EOF when ``n`` is -1)
+
+        Returns:
+            Plaintext (bytes), empty at EOF
+        """
+        if n < 0:
+            while await self._fill():
+                pass
+            return self._take(len(self.buffer))
+        if not self.buffer:
+            await self._fill(max(n, 1))
+        return self._take(n)
+
+    async def readexactly(self, n):
+        """
+        Read exactly ``n`` plaintext bytes
+
+        Raises:
+            asyncio.IncompleteReadError: The stream ended first
+        """
+        while len(self.buffer) < n:
+            if not await self._fill(max(n - len(self.buffer), 1)):
+                partial = self._take(len(self.buffer))
+                raise asyncio.IncompleteReadError(partial, n)
+        return self._take(n)
+
+    async def readline(self):
+        """Read one line ending with ``\\n`` (or the rest of the stream)"""
+        while b'\n' not in self.buffer:
+            if not await self._fill():
+                return self._take(len(self.buffer))
+        return self._take(self.buffer.index(b'\n') + 1)
+
+    def at_eof(self):
+        return self.eof and not self.buffer
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+
+def wrap_streams(reader, writer, key, segment_size=16, backend=DEFAULT_BACKEND):
+    """Wrap a plain asyncio stream pair, returning (CFBStreamReader, CFBStreamWriter)"""
+    return (CFBStreamReader(reader, key, segment_size, backend),
+            CFBStreamWriter(writer, key, None, segment_size, backend))
+
+
+async def open_cfb_connection(host, port, key, segment_size=16, backend=DEFAULT_BACKEND, **kwargs):
+    """
+    Open an encrypted connection, like ``asyncio.open_connection``
+
+    Args:
+        host: Host to connect to
+        port: Port to connect to
+        key: Shared 256-bit key (32 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+        **kwargs: Passed on to ``asyncio.open_connection``
+
+    Returns:
+        (CFBStreamReader, CFBStreamWriter)
+    """
+    reader, writer = await asyncio.open_connection(host, port, **kwargs)
+    return wrap_streams(reader, writer, key, segment_size, backend)
+
+
+async def start_cfb_server(client_connected_cb, host, port, key, segment_size=16, backend=DEFAULT_BACKEND,
+                           **kwargs):
+    """
+    Start a server whose callback receives encrypted streams, like ``asyncio.start_server``
+
+    Args:
+        client_connected_cb: Coroutine function called with (CFBStreamReader, CFBStreamWriter)
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free one)
+        key: Shared 256-bit key (32 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+        **kwargs: Passed on to ``asyncio.start_server``
+
+    Returns:
+        asyncio.Server
+    """
+    async def handle(reader, writer):
+        await client_connected_cb(*wrap_streams(reader, writer, key, segment_size, backend))
+
+    return await asyncio.start_server(handle, host, port, **kwargs)
+
+
+async def _echo(reader, writer):
+    """Send every decrypted byte back, re-encrypted"""
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _client(host, port, key, segment_size, backend, payload, messages, latencies):
+    reader, writer = await open_cfb_connection(host, port, key, segment_size, backend)
+    try:
+        for _ in range(messages):
+            started = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            if await reader.readexactly(len(payload)) != payload:
+                raise ValueError("echoed data does not match")
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def loopback_benchmark(connections=100, messages=10, message_size=1024, segment_size=16,
+                             backend=DEFAULT_BACKEND, host="127.0.0.1"):
+    """
+    Run encrypted echo round trips over many concurrent loopback connections
+
+    Args:
+        connections: Number of concurrent client connections
+        messages: Round trips per connection
+        message_size: Plaintext bytes per message
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+        host: Loopback address to listen on
+
+    Returns:
+        Dictionary with the elapsed time, throughput and latency percentiles
+    """
+    key = generate_key()
+    payload = os.urandom(message_size)
+    latencies = []
+    server = await start_cfb_server(_echo, host, 0, key, segment_size, backend, backlog=connections)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(_client(host, port, key, segment_size, backend, payload, messages, latencies)
+                               for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    latencies.sort()
+    # Every message is encrypted and decrypted twice, on the way out and back
+    transferred = 2 * message_size * len(latencies)
+    return {
+        "connections": connections,
+        "messages": len(latencies),
+        "message_size": message_size,
+        "segment_size": segment_size,
+        "seconds": elapsed,
+        "mb_per_s": transferred / elapsed / 1e6,
+        "round_trips_per_s": len(latencies) / elapsed,
+        "latency_ms": {
+            "median": statistics.median(latencies) * 1000,
+            "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            "max": latencies[-1] * 1000,
+        },
+    }
+
+
+def main(argv=None):
+    from cfb.backends import BACKENDS
+    from cfb.bench import parse_size
+
+    parser = argparse.ArgumentParser(prog="python -m cfb loopback",
+                                     description="Encrypted echo benchmark over loopback connections")
+    parser.add_argument("--connections", type=int, default=1000, help="concurrent connections (default: 1000)")
+    parser.add_argument("--messages", type=int, default=10, help="round trips per connection (default: 10)")
+    parser.add_argument("--message-size", default="1K", help="plaintext bytes per message (default: 1K)")
+    parser.add_argument("-s", "--segment-size", type=int, default=16, choices=range(1, BLOCK_SIZE + 1),
+                        metavar="{1..16}", help="segment size in bytes (default: 16)")
+    parser.add_argument("--implementation", choices=list(BACKENDS), default=DEFAULT_BACKEND)
+    args = parser.parse_args(argv)
+
+    try:
+        result = asyncio.run(loopback_benchmark(args.connections, args.messages, parse_size(args.message_size),
+                                                args.segment_size, args.implementation))
+    except OSError as e:
+        # Typically too many open files: each connection needs two descriptors
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    latency = result["latency_ms"]
+    print(f"{result['connections']} connections, {result['messages']} round trips of "
+          f"{result['message_size']} bytes in {result['seconds']:.3f} s")
+    print(f"{result['mb_per_s']:.2f} MB/s, {result['round_trips_per_s']:.0f} round trips/s")
+    print(f"latency: median {latency['median']:.3f} ms, p99 {latency['p99']:.3f} ms, max {latency['max']:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Authenticated CFB files (encrypt-then-MAC with HMAC-SHA256)
+
+The container is a short header, the CFB ciphertext and an HMAC-SHA256 tag::
+
+    b"CFBA" | version (1 byte) | segment size (1 byte) | flags (1 byte) | IV (16 bytes) | ciphertext | tag (32 bytes)
+
+The only flag, ``FLAG_COMPRESSED``, records that the plaintext went
+through ``cfb.compress`` before it was encrypted. Version 1 files have no
+flags byte and are still read. The tag covers the header and the ciphertext. It is computed in the same
+streaming pass as the encryption: every ciphertext chunk goes through one
+extra ``hmac.update`` call before it is written, so the data is read only
+once. The ciphertext itself is exactly ``cfb_encrypt`` of the plaintext.
+
+Decryption also makes a single pass, checking the tag while it decrypts
+into the target. The plaintext is only released once the tag has been
+verified: on a mismatch the target is emptied and ``AuthenticationError``
+is raised, so the target should be a temporary file such as
+``spooled_output()``. When the target does more than store the bytes (a
+``DecompressingWriter`` expanding compressed plaintext), pass
+``verify_first=True``: the tag is then checked in a first pass over the
+ciphertext, and nothing reaches the target unless it matches.
+
+The HMAC key is derived from the encryption key, so a single 256-bit key
+is still all that needs to be shared.
+"""
+
+import hashlib
+import hmac
+import struct
+
+from cfb.backends import DEFAULT_BACKEND
+from cfb.engine import BLOCK_SIZE, check_parameters
+from cfb.stream import CHUNK_SIZE, CFBDecryptor, CFBEncryptor
+
+MAGIC = b"CFBA"
+VERSION = 2
+# The plaintext is compressed (see cfb.compress)
+FLAG_COMPRESSED = 0x01
+_PREFIX = struct.Struct(">4sBB")
+_HEADERS = {
+    1: struct.Struct(f">4sBB{BLOCK_SIZE}s"),
+    VERSION: struct.Struct(f">4sBBB{BLOCK_SIZE}s"),
+}
+HEADER_SIZE = _HEADERS[VERSION].size
+TAG_SIZE = hashlib.sha256().digest_size
+MAC_KEY_LABEL = b"cfb encrypt-then-MAC key"
+
+
+class AuthenticationError(ValueError):
+    """Raised when the tag of an authenticated file does not match its contents"""
+
+
+def derive_mac_key(key):
+    """HMAC key used for the tag, derived from the encryption key"""
+    return hmac.new(key, MAC_KEY_LABEL, hashlib.sha256).digest()
+
+
+def is_authenticated(prefix):
+    """True if ``prefix`` (the first bytes of a file) starts an authenticated container"""
+    return bytes(prefix[:len(MAGIC)]) == MAGIC
+
+
+def header_size(prefix):
+    """Size of the header starting ``prefix`` (at least its first 6 bytes), which depends on its version"""
+    if len(prefix) < _PREFIX.size or not is_authenticated(prefix):
+        raise ValueError("Not an authenticated CFB file")
+    version = _PREFIX.unpack(bytes(prefix[:_PREFIX.size]))[1]
+    if version not in _HEADERS:
+        raise ValueError(f"Unsupported authenticated CFB version {version}")
+    return _HEADERS[version].size
+
+
+def parse_header(header):
+    """
+    Read the header of an authenticated container
+
+    Args:
+        header: First bytes of the file (``HEADER_SIZE`` are always enough)
+
+    Returns:
+        (segment size, IV, flags)
+    """
+    size = header_size(header)
+    if len(header) < size:
+        raise ValueError("Authenticated CFB file is truncated")
+    fields = _HEADERS[header[4]].unpack(bytes(header[:size]))
+    segment_size, iv = fields[2], fields[-1]
+    flags = fields[3] if len(fields) == 5 else 0
+    check_parameters(iv, segment_size)
+    return segment_size, iv, flags
+
+
+def read_header(source):
+    """Read the header from the start of a binary file object, returning (header bytes, segment size, IV, flags)"""
+    header = source.read(_PREFIX.size)
+    header += source.read(header_size(header) - len(header))
+    return (header, *parse_header(header))
+
+
+def unpack_container(data):
+    """
+    Split an authenticated container held in memory, without verifying it
+
+    Args:
+        data: Complete container (bytes-like)
+
+    Returns:
+        (segment size, IV, ciphertext as a memoryview)
+    """
+    segment_size, iv, _ = parse_header(data[:HEADER_SIZE])
+    start = header_size(data)
+    if len(data) < start + TAG_SIZE:
+        raise ValueError("Authenticated CFB file is truncated")
+    return segment_size, iv, memoryview(data)[start:len(data) - TAG_SIZE]
+
+
+def encrypt_stream_authenticated(source, target, key, iv, segment_size=16, chunk_size=CHUNK_SIZE,
+                                 backend=DEFAULT_BACKEND, compressed=False):
+    """
+    Encrypt a binary file object into an authenticated container in one pass
+
+    Args:
+        source: Readable binary file object with the plaintext
+        target: Writable binary file object for the container
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes), stored in the header
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+        compressed: Set ``FLAG_COMPRESSED``: ``source`` is the output of a ``CompressingReader``
+
+    Returns:
+        Number of plaintext bytes processed (int)
+    """
+    encryptor = CFBEncryptor(key, iv, segment_size, backend)
+    flags = FLAG_COMPRESSED if compressed else 0
+    header = _HEADERS[VERSION].pack(MAGIC, VERSION, segment_size, flags, bytes(iv))
+    mac = hmac.new(derive_mac_key(key), header, hashlib.sha256)
+    target.write(header)
+
+    total = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        ciphertext = encryptor.update(chunk)
+        mac.update(ciphertext)
+        target.write(ciphertext)
+        total += len(chunk)
+
+    ciphertext = encryptor.finalize()
+    mac.update(ciphertext)
+    target.write(ciphertext)
+    target.write(mac.digest())
+    return total
+
+
+def _check_tag(mac, tail):
+    if len(tail) < TAG_SIZE or not hmac.compare_digest(mac.digest(), tail):
+        raise AuthenticationError("Authentication failed: the file was modified or the key is wrong")
+
+
+def verify_stream_authenticated(source, key, chunk_size=CHUNK_SIZE):
+    """
+    Check the tag of an authenticated container without decrypting it
+
+    Args:
+        source: Readable binary file object with the container
+        key: 256-bit key (32 bytes)
+        chunk_size: Bytes read per step (default: 1 MB)
+
+    Raises:
+        AuthenticationError: The file was modified or the key is wrong
+    """
+    header = read_header(source)[0]
+    mac = hmac.new(derive_mac_key(key), header, hashlib.sha256)
+    tail = b''
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        data = tail + chunk
+        mac.update(memoryview(data)[:-TAG_SIZE])
+        tail = data[-TAG_SIZE:]
+    _check_tag(mac, tail)
+
+
+def decrypt_stream_authenticated(source, target, key, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND,
+                                 verify_first=False):
+    """
+    Verify and decrypt an authenticated container in one pass
+
+    The segment size and IV are read from the header. On a tag mismatch the
+    target is truncated to zero bytes before the error is raised.
+
+    Args:
+        source: Readable binary file object with the container (seekable with ``verify_first``)
+        target: Seekable, writable binary file object for the plaintext
+        key: 256-bit decryption key (32 bytes)
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+        verify_first: Check the tag in a separate pass before anything is written to ``target``
+
+    Returns:
+        Number of plaintext bytes (int)
+
+    Raises:
+        AuthenticationError: The file was modified or the key is wrong
+    """
+    if verify_first:
+        start = source.tell()
+        verify_stream_authenticated(source, key, chunk_size)
+        source.seek(start)
+    header, segment_size, iv, _ = read_header(source)
+    decryptor = CFBDecryptor(key, iv, segment_size, backend)
+    mac = hmac.new(derive_mac_key(key), header, hashlib.sha256)
+
+    # The last TAG_SIZE bytes read so far may be the tag, they are held back
+    tail = b''
+    total = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if len(chunk) >= TAG_SIZE:
+            body = memoryview(chunk)[:-TAG_SIZE]
+            for ciphertext in (tail, body):
+                mac.update(ciphertext)
+                target.write(decryptor.update(ciphertext))
+                total += len(ciphertext)
+            tail = bytes(chunk[-TAG_SIZE:])
+        else:
+            data = tail + chunk
+            ciphertext, tail = data[:-TAG_SIZE], data[-TAG_SIZE:]
+            mac.update(ciphertext)
+            target.write(decryptor.update(ciphertext))
+            total += len(ciphertext)
+    target.write(decryptor.finalize())
+
+    try:
+        _check_tag(mac, tail)
+    except AuthenticationError:
+        target.seek(0)
+        target.truncate()
+        raise
+    return total
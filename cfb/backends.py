@@ -0,0 +1,144 @@
+"""
+Interchangeable CFB implementations
+
+Every backend exposes ``encrypt(data, key, iv, segment_size)`` and
+``decrypt(data, key, iv, segment_size)`` and produces identical output:
+
+- ``educational``: the step-by-step reference loop
+- ``vectorized``: the linear-time engine, with batched decryption
+- ``native``: pycryptodome's C implementation of ``AES.MODE_CFB``
+
+If the native implementation cannot be used, ``get_backend`` falls back to
+the vectorized one. The modules behind each backend (pycryptodome, NumPy)
+are only imported the first time the backend is called.
+"""
+
+import importlib
+import os
+from collections import namedtuple
+
+from cfb.engine import check_parameters
+from cfb.instrument import run_timed
+
+Backend = namedtuple("Backend", ["name", "description", "encrypt", "decrypt"])
+
+DEFAULT_BACKEND = "native"
+FALLBACK_BACKEND = "vectorized"
+
+
+def _lazy(module, attribute):
+    """Function that resolves ``module.attribute`` when it is first called"""
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module), attribute)(*args, **kwargs)
+
+    call.__name__ = attribute
+    call.__qualname__ = f"{module}.{attribute}"
+    return call
+
+
+def _timed(function):
+    """Backend function timed as a whole when profiling (see ``cfb.instrument``)"""
+    def call(data, key, iv, segment_size=16):
+        return run_timed(function, data, key, iv, segment_size, segments=-(-len(data) // segment_size))
+
+    call.__name__ = function.__name__
+    call.__qualname__ = function.__qualname__
+    return call
+
+
+def native_cipher(key, iv, segment_size):
+    """pycryptodome ``MODE_CFB`` cipher object with a segment size given in bytes"""
+    from Crypto.Cipher import AES
+
+    check_parameters(iv, segment_size)
+    return AES.new(key, AES.MODE_CFB, iv=iv, segment_size=segment_size * 8)
+
+
+def native_encrypt(plaintext_bytes, key, iv, segment_size=16):
+    """CFB encryption with pycryptodome's ``MODE_CFB``"""
+    return native_cipher(key, iv, segment_size).encrypt(plaintext_bytes)
+
+
+def native_decrypt(ciphertext_bytes, key, iv, segment_size=16):
+    """CFB decryption with pycryptodome's ``MODE_CFB``"""
+    return native_cipher(key, iv, segment_size).decrypt(ciphertext_bytes)
+
+
+BACKENDS = {
+    "educational": Backend(
+        "educational", "Step-by-step Python loop (mirrors the Theory page)",
+        _timed(_lazy("cfb.educational", "cfb_encrypt")), _timed(_lazy("cfb.educational", "cfb_decrypt")),
+    ),
+    "vectorized": Backend(
+        "vectorized", "Linear-time engine with batched, multi-threaded decryption",
+        _lazy("cfb.engine", "cfb_encrypt"), _lazy("cfb.parallel", "cfb_decrypt_parallel"),
+    ),
+    "native": Backend(
+        "native", "pycryptodome C implementation of AES.MODE_CFB",
+        _timed(native_encrypt), _timed(native_decrypt),
+    ),
+}
+
+_native_checked = None
+
+
+def native_available():
+    """Return True if pycryptodome's ``MODE_CFB`` works in this environment"""
+    global _native_checked
+    if _native_checked is None:
+        try:
+            native_encrypt(b'\x00', bytes(32), bytes(16), 1)
+            _native_checked = True
+        except Exception:
+            _native_checked = False
+    return _native_checked
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """
+    Look up a backend by name
+
+    Args:
+        name: One of ``BACKENDS`` (default: "native")
+
+    Returns:
+        Backend, the vectorized one if the native backend is unavailable
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CFB backend '{name}', expected one of {', '.join(BACKENDS)}")
+    if name == "native" and not native_available():
+        name = FALLBACK_BACKEND
+    return BACKENDS[name]
+
+
+def cross_check(lengths=(0, 1, 15, 16, 17, 31, 100, 1000), segment_sizes=range(1, 17)):
+    """
+    Compare every backend against the educational one on random inputs
+
+    This is the quick check behind ``python -m cfb selftest``, for an
+    installed copy; the test suite covers the same ground in
+    ``tests/test_backends.py``.
+
+    Args:
+        lengths: Message lengths to try, including non-aligned ones
+        segment_sizes: Segment sizes in bytes to try
+
+    Returns:
+        List of (backend, operation, segment_size, length) that disagreed
+    """
+    mismatches = []
+    key = os.urandom(32)
+    iv = os.urandom(16)
+    reference = BACKENDS["educational"]
+
+    for segment_size in segment_sizes:
+        for length in lengths:
+            plaintext = os.urandom(length)
+            ciphertext = reference.encrypt(plaintext, key, iv, segment_size)
+            for backend in BACKENDS.values():
+                if bytes(backend.encrypt(plaintext, key, iv, segment_size)) != ciphertext:
+                    mismatches.append((backend.name, "encrypt", segment_size, length))
+                if bytes(backend.decrypt(ciphertext, key, iv, segment_size)) != plaintext:
+                    mismatches.append((backend.name, "decrypt", segment_size, length))
+
+    return mismatches
@@ -0,0 +1,124 @@
+"""
+Batched CFB encryption of many short messages under one key
+
+Encrypting messages one at a time pays for the AES key schedule and the
+Python loop of every message. ``cfb_encrypt_batch`` sets the key up once
+and advances all messages in lock-step: round ``r`` encrypts segment
+``r`` of every message that is still that long, with a single AES-ECB
+call over all their feedback registers. Messages are sorted by length so
+the active ones are always a prefix of the register array. All messages
+share one array with a row per segment (each message padded to whole
+segments), so a few long messages do not inflate memory and every round
+moves whole rows.
+
+Decryption needs no lock-step: every register is made of known
+ciphertext, so the registers of all messages are gathered at once and
+decrypted with a few large ECB calls.
+"""
+
+import numpy as np
+
+from cfb.engine import BLOCK_SIZE, cfb_decrypt, cfb_encrypt, check_parameters, new_ecb
+
+# Feedback registers per AES-ECB call when decrypting (4 MB of registers)
+DECRYPT_BATCH_REGISTERS = 256 * 1024
+# Below this many messages the NumPy setup costs more than it saves
+MIN_BATCH = 4
+
+
+def _segments(messages, segment_size):
+    """
+    Lay (data, IV) pairs out as one row per segment, each message padded to whole segments
+
+    Returns:
+        (segment rows (n, segment_size), first row of every message, message lengths)
+    """
+    datas = [bytes(data) for data, _ in messages]
+    for _, iv in messages:
+        check_parameters(iv, segment_size)
+    lengths = np.fromiter(map(len, datas), dtype=np.int64, count=len(datas))
+    counts = -(-lengths // segment_size)
+    first_rows = np.zeros(len(datas), dtype=np.int64)
+    np.cumsum(counts[:-1], out=first_rows[1:])
+    padded = b''.join(data + bytes(-len(data) % segment_size) for data in datas)
+    rows = np.frombuffer(padded, dtype=np.uint8).reshape(-1, segment_size)
+    return rows, first_rows, lengths
+
+
+def _split(rows, first_rows, lengths, segment_size):
+    data = rows.tobytes()
+    return [data[row * segment_size:row * segment_size + length]
+            for row, length in zip(first_rows.tolist(), lengths.tolist())]
+
+
+def cfb_encrypt_batch(messages, key, segment_size=16):
+    """
+    Encrypt many messages under one key, all advancing in lock-step
+
+    Args:
+        messages: Sequence of (plaintext, IV) pairs (bytes-like, IVs of 16 bytes)
+        key: 256-bit encryption key (32 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        List of ciphertexts (bytes), in the order of ``messages``
+    """
+    if len(messages) < MIN_BATCH:
+        return [cfb_encrypt(data, key, iv, segment_size) for data, iv in messages]
+    plaintext, first_rows, lengths = _segments(messages, segment_size)
+    ivs = np.frombuffer(b''.join(bytes(iv) for _, iv in messages), dtype=np.uint8).reshape(-1, BLOCK_SIZE)
+    cipher = new_ecb(key)
+
+    # Longest first: the messages still active in a round are a prefix
+    order = np.argsort(-lengths, kind='stable')
+    rows = first_rows[order]
+    counts = -(-lengths[order] // segment_size)
+    registers = ivs[order].copy()
+    ciphertext = np.empty_like(plaintext)
+
+    active = len(messages)
+    for round_number in range(int(counts[0])):
+        while counts[active - 1] <= round_number:
+            active -= 1
+        keystream = np.frombuffer(cipher.encrypt(registers[:active].tobytes()), dtype=np.uint8)
+        segment = plaintext[rows[:active] + round_number] ^ keystream.reshape(active, BLOCK_SIZE)[:, :segment_size]
+        ciphertext[rows[:active] + round_number] = segment
+        registers[:active] = np.concatenate([registers[:active, segment_size:], segment], axis=1)
+
+    return _split(ciphertext, first_rows, lengths, segment_size)
+
+
+def cfb_decrypt_batch(messages, key, segment_size=16):
+    """
+    Decrypt many messages under one key with a few large AES-ECB calls
+
+    Args:
+        messages: Sequence of (ciphertext, IV) pairs (bytes-like, IVs of 16 bytes)
+        key: 256-bit decryption key (32 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        List of plaintexts (bytes), in the order of ``messages``
+    """
+    if len(messages) < MIN_BATCH:
+        return [cfb_decrypt(data, key, iv, segment_size) for data, iv in messages]
+    ciphertext, first_rows, lengths = _segments(messages, segment_size)
+    cipher = new_ecb(key)
+
+    # IV || ciphertext of every message, back to back: the register of a
+    # segment is the 16 bytes of its message's stream before it
+    stream = np.frombuffer(b''.join(bytes(iv) + bytes(data) for data, iv in messages), dtype=np.uint8)
+    windows = np.lib.stride_tricks.sliding_window_view(stream, BLOCK_SIZE)
+    counts = -(-lengths // segment_size)
+    stream_offsets = np.zeros(len(messages), dtype=np.int64)
+    np.cumsum(lengths[:-1] + BLOCK_SIZE, out=stream_offsets[1:])
+    # Stream offset of each segment's register: message start + position in the message
+    register_at = np.repeat(stream_offsets - first_rows * segment_size, counts) + np.arange(len(ciphertext)) * segment_size
+
+    plaintext = np.empty_like(ciphertext)
+    for first in range(0, len(ciphertext), DECRYPT_BATCH_REGISTERS):
+        last = min(first + DECRYPT_BATCH_REGISTERS, len(ciphertext))
+        keystream = np.frombuffer(cipher.encrypt(windows[register_at[first:last]].tobytes()), dtype=np.uint8)
+        plaintext[first:last] = ciphertext[first:last] ^ keystream.reshape(-1, BLOCK_SIZE)[:, :segment_size]
+
+    return _split(plaintext, first_rows, lengths, segment_size)
@@ -0,0 +1,332 @@
+"""
+Benchmark harness for the CFB implementations
+
+Measures throughput (MB/s) and per-segment latency of every backend for a
+range of input sizes and segment sizes, writes the results as JSON and
+compares them with a stored baseline to catch regressions. ``--batch``
+measures the batched multi-message API instead (messages/s for every
+batch size and segment size); its reports are marked with
+``"benchmark": "batch"`` in their metadata.
+
+Run headless with::
+
+    python -m cfb.bench --sizes 1K 1M 16M --output results.json
+    python -m cfb.bench --baseline results.json
+    python -m cfb.bench --startup
+    python -m cfb.bench --batch --batch-sizes 1 100 10000 100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from cfb.backends import BACKENDS
+
+DEFAULT_SIZES = ["1K", "16K", "256K", "1M", "4M", "16M", "64M", "256M"]
+DEFAULT_SEGMENT_SIZES = [1, 8, 16]
+OPERATIONS = ["encrypt", "decrypt"]
+# The educational loop is quadratic, larger inputs would take hours
+SIZE_LIMITS = {"educational": 256 * 1024}
+# A result is a regression when it is slower than this fraction of the baseline
+DEFAULT_TOLERANCE = 0.8
+
+# ``import cfb`` plus loading the engine must stay below this (milliseconds)
+STARTUP_BUDGET_MS = 50
+_STARTUP_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+import cfb
+cfb.cfb_encrypt, cfb.cfb_decrypt, cfb.generate_key
+print(time.perf_counter() - started, "streamlit" in sys.modules)
+"""
+
+# Messages per batch for the batched multi-message API
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+DEFAULT_MESSAGE_SIZE = 100
+
+_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text):
+    """Convert a size such as ``"64K"`` or ``"256M"`` to a number of bytes"""
+    text = str(text).strip().upper().rstrip("B")
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    """Convert a number of bytes to the shortest ``K``/``M``/``G`` form"""
+    for unit, factor in sorted(_UNITS.items(), key=lambda item: -item[1]):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def measure(function, data, key, iv, segment_size, repeat=3, min_time=0.2):
+    """
+    Time one implementation on one input
+
+    Runs the function at least ``repeat`` times and until ``min_time`` seconds
+    have elapsed, and keeps the fastest run.
+
+    Returns:
+        Best wall-clock time in seconds (float)
+    """
+    best = float("inf")
+    runs = 0
+    started = time.perf_counter()
+    while runs < repeat or (time.perf_counter() - started < min_time and runs < 100):
+        begin = time.perf_counter()
+        function(data, key, iv, segment_size)
+        best = min(best, time.perf_counter() - begin)
+        runs += 1
+    return best
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, segment_sizes=DEFAULT_SEGMENT_SIZES, implementations=None,
+                   operations=OPERATIONS, repeat=3, progress=None):
+    """
+    Benchmark every combination of implementation, operation, size and segment size
+
+    Args:
+        sizes: Input sizes (bytes or strings such as "1M")
+        segment_sizes: Segment sizes in bytes
+        implementations: Backend names (default: all)
+        operations: "encrypt" and/or "decrypt"
+        repeat: Minimum number of timed runs per combination
+        progress: Optional callable receiving each result as it is produced
+
+    Returns:
+        Dictionary with "meta" and "results" entries (JSON serialisable)
+    """
+    implementations = implementations or list(BACKENDS)
+    key = os.urandom(32)
+    iv = os.urandom(16)
+    results = []
+
+    for size in map(parse_size, sizes):
+        data = os.urandom(size)
+        for name in implementations:
+            if size > SIZE_LIMITS.get(name, size):
+                continue
+            backend = BACKENDS[name]
+            for segment_size in segment_sizes:
+                for operation in operations:
+                    function = getattr(backend, operation)
+                    seconds = measure(function, data, key, iv, segment_size, repeat)
+                    segments = max(1, -(-size // segment_size))
+                    result = {
+                        "implementation": name,
+                        "operation": operation,
+                        "size": size,
+                        "segment_size": segment_size,
+                        "seconds": seconds,
+                        "mb_per_s": size / seconds / 1e6 if seconds else float("inf"),
+                        "segment_latency_us": seconds / segments * 1e6,
+                    }
+                    results.append(result)
+                    if progress:
+                        progress(result)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def run_batch_benchmarks(batch_sizes=DEFAULT_BATCH_SIZES, message_size=DEFAULT_MESSAGE_SIZE, segment_sizes=(16,),
+                         repeat=3, progress=None):
+    """
+    Compare ``cfb_encrypt_batch`` / ``cfb_decrypt_batch`` with one call per message
+
+    Args:
+        batch_sizes: Numbers of messages per batch
+        message_size: Bytes per message
+        segment_sizes: Segment sizes in bytes
+        repeat: Minimum number of timed runs per combination
+        progress: Optional callable receiving each result as it is produced
+
+    Returns:
+        Dictionary with "meta" and "results" entries (JSON serialisable)
+    """
+    from cfb.batch import cfb_decrypt_batch, cfb_encrypt_batch
+    from cfb.engine import cfb_decrypt, cfb_encrypt
+
+    def loop(function):
+        return lambda messages, key, _, segment_size: [function(data, key, iv, segment_size) for data, iv in messages]
+
+    implementations = {
+        ("loop", "encrypt"): loop(cfb_encrypt),
+        ("loop", "decrypt"): loop(cfb_decrypt),
+        ("batch", "encrypt"): lambda messages, key, _, segment_size: cfb_encrypt_batch(messages, key, segment_size),
+        ("batch", "decrypt"): lambda messages, key, _, segment_size: cfb_decrypt_batch(messages, key, segment_size),
+    }
+    key = os.urandom(32)
+    results = []
+    for batch_size in batch_sizes:
+        messages = [(os.urandom(message_size), os.urandom(16)) for _ in range(batch_size)]
+        for segment_size in segment_sizes:
+            for (name, operation), function in implementations.items():
+                seconds = measure(function, messages, key, None, segment_size, repeat)
+                result = {
+                    "implementation": name,
+                    "operation": operation,
+                    "batch_size": batch_size,
+                    "message_size": message_size,
+                    "segment_size": segment_size,
+                    "seconds": seconds,
+                    "messages_per_s": batch_size / seconds if seconds else float("inf"),
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+
+    return {
+        "meta": {
+            "benchmark": "batch",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def measure_startup(repeat=5):
+    """
+    Time ``import cfb`` and loading the engine in fresh interpreters
+
+    Returns:
+        (best time in milliseconds, True if Streamlit got imported)
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = float("inf")
+    imports_streamlit = False
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=package_root,
+                                capture_output=True, text=True, check=True).stdout.split()
+        best = min(best, float(output[0]) * 1000)
+        imports_streamlit = imports_streamlit or output[1] == "True"
+    return best, imports_streamlit
+
+
+def is_batch_report(report):
+    """True if ``report`` was written by ``run_batch_benchmarks`` (``--batch``) rather than ``run_benchmarks``"""
+    results = report.get("results") or [{}]
+    return report.get("meta", {}).get("benchmark") == "batch" or "batch_size" in results[0]
+
+
+def _result_key(result):
+    return (result["implementation"], result["operation"], result["size"], result["segment_size"])
+
+
+def find_regressions(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two benchmark runs
+
+    Args:
+        current: Results of ``run_benchmarks``
+        baseline: Earlier results of ``run_benchmarks``
+        tolerance: Fraction of the baseline throughput that is still acceptable
+
+    Returns:
+        List of (current result, baseline MB/s) pairs that got slower
+    """
+    reference = {_result_key(result): result["mb_per_s"] for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        expected = reference.get(_result_key(result))
+        if expected and result["mb_per_s"] < expected * tolerance:
+            regressions.append((result, expected))
+    return regressions
+
+
+def format_result(result):
+    """One line summary of a benchmark result"""
+    return (f"{result['implementation']:<12} {result['operation']:<8} {format_size(result['size']):>6} "
+            f"seg={result['segment_size']:<2} {result['mb_per_s']:10.2f} MB/s "
+            f"{result['segment_latency_us']:10.3f} us/segment")
+
+
+def format_batch_result(result):
+    """One line summary of a batch benchmark result"""
+    return (f"{result['implementation']:<6} {result['operation']:<8} batch={result['batch_size']:<7} "
+            f"{result['message_size']}B seg={result['segment_size']:<2} {result['messages_per_s']:14,.0f} messages/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cfb.bench", description="Benchmark the CFB implementations")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="input sizes, e.g. 1K 1M 256M")
+    parser.add_argument("--segment-sizes", nargs="+", type=int, default=DEFAULT_SEGMENT_SIZES,
+                        help="segment sizes in bytes (--batch measures each of them too)")
+    parser.add_argument("--implementations", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--repeat", type=int, default=3, help="minimum timed runs per combination")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results stored in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="fraction of baseline throughput below which a result is a regression")
+    parser.add_argument("--startup", action="store_true",
+                        help="only check the package import time against --startup-budget")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS, help="milliseconds")
+    parser.add_argument("--batch", action="store_true",
+                        help="compare batched multi-message encryption with one call per message")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--message-size", default=str(DEFAULT_MESSAGE_SIZE), help="bytes per message (--batch)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        milliseconds, imports_streamlit = measure_startup()
+        print(f"import cfb: {milliseconds:.1f} ms (budget {args.startup_budget:.0f} ms)")
+        if imports_streamlit:
+            print("FAIL: importing cfb pulls in Streamlit")
+        if milliseconds > args.startup_budget:
+            print("FAIL: import time over budget")
+        return 1 if imports_streamlit or milliseconds > args.startup_budget else 0
+
+    if args.batch:
+        report = run_batch_benchmarks(args.batch_sizes, parse_size(args.message_size), args.segment_sizes, args.repeat,
+                                      progress=lambda result: print(format_batch_result(result), flush=True))
+        if args.output:
+            with open(args.output, "w") as handle:
+                json.dump(report, handle, indent=2)
+            print(f"Results written to {args.output}")
+        return 0
+
+    report = run_benchmarks(args.sizes, args.segment_sizes, args.implementations, args.operations,
+                            args.repeat, progress=lambda result: print(format_result(result), flush=True))
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if is_batch_report(baseline):
+            print(f"{args.baseline} holds --batch results, which cannot serve as a throughput baseline")
+            return 2
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for result, expected in regressions:
+            print(f"REGRESSION {format_result(result)} (baseline {expected:.2f} MB/s)")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
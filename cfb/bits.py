@@ -0,0 +1,171 @@
+"""
+Bit-granular CFB modes (NIST SP 800-38A CFB-1, CFB-8, CFB-64, CFB-128)
+
+Segment sizes here are given in bits. Multiples of 8 are handled by the
+byte-oriented backends; CFB-1 needs one AES call per bit, so it keeps the
+feedback register as a 128-bit integer (shifting in one bit costs a
+couple of integer operations) and calls pycryptodome's ECB primitive
+directly to avoid most of the per-call overhead of ``cipher.encrypt``.
+CFB-1 decryption knows every register up front and is computed in
+batches with NumPy.
+"""
+
+import ctypes
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.engine import BLOCK_SIZE, check_parameters, new_ecb
+from cfb.instrument import run_timed
+
+SEGMENT_BITS = (1, 8, 64, 128)
+# Input bytes decrypted per batch in CFB-1 (the registers take 128 bytes per input byte)
+CFB1_DECRYPT_CHUNK = 16 * 1024
+
+_REGISTER_MASK = (1 << (8 * BLOCK_SIZE)) - 1
+
+
+def describe_segment(segment_bits):
+    """Human readable name of a segment size, e.g. ``"8 bits / 1 byte (CFB-8)"``"""
+    if segment_bits == 1:
+        return "1 bit (CFB-1)"
+    size = segment_bits // 8
+    return f"{segment_bits} bits / {size} byte{'s' if size > 1 else ''} (CFB-{segment_bits})"
+
+
+def _check_segment_bits(segment_bits):
+    if segment_bits != 1 and (segment_bits % 8 or not 8 <= segment_bits <= 8 * BLOCK_SIZE):
+        raise ValueError(f"Segment size must be 1 bit or a multiple of 8 bits up to 128, got {segment_bits}")
+
+
+def _first_byte_encryptor(key):
+    """
+    Function returning the first byte of the AES encryption of a 16-byte register
+
+    Uses the raw ECB function of pycryptodome through ctypes when available,
+    which is several times faster than ``cipher.encrypt`` for single blocks.
+    """
+    cipher = new_ecb(key)
+    try:
+        from Crypto.Cipher import _mode_ecb
+
+        library = _mode_ecb.raw_ecb_lib
+        if not isinstance(library, ctypes.CDLL):
+            raise TypeError("pycryptodome is not using ctypes")
+        ecb_encrypt = library.ECB_encrypt
+        state = cipher._state.get()
+    except (ImportError, AttributeError, TypeError):
+        encrypt = cipher.encrypt
+        return lambda register: encrypt(register)[0]
+
+    output = (ctypes.c_ubyte * BLOCK_SIZE)()
+    length = ctypes.c_size_t(BLOCK_SIZE)
+
+    def first_byte(register, _keep_alive=cipher):
+        ecb_encrypt(state, register, output, length)
+        return output[0]
+
+    return first_byte
+
+
+def cfb1_encrypt(plaintext_bytes, key, iv):
+    """
+    CFB-1 encryption: one keystream bit per AES call
+
+    Args:
+        plaintext_bytes: Data to encrypt (bytes)
+        key: AES key (16, 24 or 32 bytes)
+        iv: Initialization vector (16 bytes)
+
+    Returns:
+        Encrypted ciphertext (bytes)
+    """
+    check_parameters(iv, 1)
+    first_byte = _first_byte_encryptor(key)
+    register = int.from_bytes(iv, 'big')
+    mask = _REGISTER_MASK
+    ciphertext = bytearray(len(plaintext_bytes))
+
+    for index, byte in enumerate(plaintext_bytes):
+        value = 0
+        for shift in (7, 6, 5, 4, 3, 2, 1, 0):
+            bit = ((byte >> shift) ^ (first_byte(register.to_bytes(16, 'big')) >> 7)) & 1
+            value = (value << 1) | bit
+            register = ((register << 1) | bit) & mask
+        ciphertext[index] = value
+
+    return bytes(ciphertext)
+
+
+def cfb1_decrypt(ciphertext_bytes, key, iv):
+    """
+    CFB-1 decryption with every feedback register built up front
+
+    The register for bit ``i`` is bits ``i`` to ``i + 127`` of IV || ciphertext,
+    so each chunk is decrypted with a single AES-ECB call.
+
+    Args:
+        ciphertext_bytes: Data to decrypt (bytes)
+        key: AES key (16, 24 or 32 bytes)
+        iv: Initialization vector (16 bytes)
+
+    Returns:
+        Decrypted plaintext (bytes)
+    """
+    import numpy as np
+
+    check_parameters(iv, 1)
+    cipher = new_ecb(key)
+    stream = np.frombuffer(bytes(iv) + bytes(ciphertext_bytes), dtype=np.uint8)
+    plaintext = bytearray(len(ciphertext_bytes))
+    bits_per_register = 8 * BLOCK_SIZE
+
+    for start in range(0, len(ciphertext_bytes), CFB1_DECRYPT_CHUNK):
+        stop = min(start + CFB1_DECRYPT_CHUNK, len(ciphertext_bytes))
+        # Bits of IV || ciphertext from the register of the first bit to the last ciphertext bit
+        bits = np.unpackbits(stream[start:stop + BLOCK_SIZE])
+        registers = np.lib.stride_tricks.sliding_window_view(bits, bits_per_register)[:8 * (stop - start)]
+        keystream = np.frombuffer(cipher.encrypt(np.packbits(registers, axis=1).tobytes()), dtype=np.uint8)
+        keystream_bits = keystream[::BLOCK_SIZE] >> 7
+        ciphertext_bits = bits[bits_per_register:]
+        plaintext[start:stop] = np.packbits(ciphertext_bits ^ keystream_bits).tobytes()
+
+    return bytes(plaintext)
+
+
+def cfb_encrypt_bits(plaintext_bytes, key, iv, segment_bits=1, backend=DEFAULT_BACKEND):
+    """
+    CFB encryption with the segment size given in bits
+
+    Args:
+        plaintext_bytes: Data to encrypt (bytes)
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_bits: 1 or a multiple of 8 up to 128 (default: 1)
+        backend: Backend used for byte-sized segments (default: "native")
+
+    Returns:
+        Encrypted ciphertext (bytes)
+    """
+    _check_segment_bits(segment_bits)
+    if segment_bits == 1:
+        return run_timed(cfb1_encrypt, plaintext_bytes, key, iv, segments=8 * len(plaintext_bytes))
+    return bytes(get_backend(backend).encrypt(plaintext_bytes, key, iv, segment_bits // 8))
+
+
+def cfb_decrypt_bits(ciphertext_bytes, key, iv, segment_bits=1, backend=DEFAULT_BACKEND):
+    """
+    CFB decryption with the segment size given in bits
+
+    Args:
+        ciphertext_bytes: Data to decrypt (bytes)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_bits: 1 or a multiple of 8 up to 128 (default: 1)
+        backend: Backend used for byte-sized segments (default: "native")
+
+    Returns:
+        Decrypted plaintext (bytes)
+    """
+    _check_segment_bits(segment_bits)
+    if segment_bits == 1:
+        return run_timed(cfb1_decrypt, ciphertext_bytes, key, iv, segments=8 * len(ciphertext_bytes))
+    return bytes(get_backend(backend).decrypt(ciphertext_bytes, key, iv, segment_bits // 8))
@@ -0,0 +1,118 @@
+"""
+Bounded LRU cache for CFB results
+
+Entries are keyed on a digest of the operation, key, IV, segment size and
+input, and the cache is capped both by number of entries and by the total
+size of the stored outputs. Least recently used entries are evicted first.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class CFBCache:
+    """
+    Memoize CFB encryption and decryption results
+
+    Args:
+        max_entries: Maximum number of cached results
+        max_bytes: Maximum total size of cached results in bytes
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(operation, key, iv, segment_size, data):
+        """Digest identifying one (operation, key, IV, segment size, input) combination"""
+        digest = hashlib.blake2b(digest_size=32)
+        for part in (operation.encode(), bytes(key), bytes(iv), segment_size.to_bytes(2, 'big')):
+            digest.update(len(part).to_bytes(4, 'big'))
+            digest.update(part)
+        digest.update(data)
+        return digest.digest()
+
+    def get(self, operation, key, iv, segment_size, data):
+        """
+        Look up a cached result
+
+        Returns:
+            Cached output (bytes), or None on a miss
+        """
+        entry_key = self.make_key(operation, key, iv, segment_size, data)
+        with self._lock:
+            result = self._entries.get(entry_key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return result
+
+    def put(self, operation, key, iv, segment_size, data, result):
+        """Store a result, evicting least recently used entries to stay within the limits"""
+        result = bytes(result)
+        if len(result) > self.max_bytes or self.max_entries <= 0:
+            return
+        entry_key = self.make_key(operation, key, iv, segment_size, data)
+        with self._lock:
+            previous = self._entries.pop(entry_key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[entry_key] = result
+            self._bytes += len(result)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def cached(self, operation, function, data, key, iv, segment_size):
+        """
+        Return ``function(data, key, iv, segment_size)``, computing it only on a miss
+
+        Args:
+            operation: "encrypt" or "decrypt"
+            function: CFB function to call on a miss
+            data: Input data (bytes)
+            key: 256-bit key (32 bytes)
+            iv: Initialization vector (16 bytes)
+            segment_size: Segment size in bytes
+
+        Returns:
+            Output of the function (bytes)
+        """
+        result = self.get(operation, key, iv, segment_size, data)
+        if result is None:
+            result = bytes(function(data, key, iv, segment_size))
+            self.put(operation, key, iv, segment_size, data, result)
+        return result
+
+    def clear(self):
+        """Drop every entry, e.g. after the key or IV changed"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,304 @@
+"""
+Resumable, checkpointed encryption and decryption of large files
+
+Between two segments the whole state of CFB is tiny: the feedback
+register and the position in the file. ``encrypt_file_resumable`` and
+``decrypt_file_resumable`` stream a file like ``encrypt_stream`` and,
+every ``interval`` bytes of input, save that state to a sidecar file next
+to the output (``<output>.cfb_checkpoint``, JSON)::
+
+    offset          input bytes read
+    output_length   output bytes written
+    pending         input bytes of an incomplete segment (hex), between the two
+    register        feedback register after ``output_length`` bytes (hex)
+    output_digest   SHA-256 of the last output bytes (up to ``DIGEST_BYTES``)
+
+plus the segment size, the size and modification time of the source and
+a fingerprint of the key and IV (an HMAC, the key itself is never
+stored). The output is flushed to disk before the checkpoint covering it
+is written, and checkpoints are replaced atomically through a rename, so
+a checkpoint never claims more than the disk holds.
+
+Run again after a crash, the operation checks the checkpoint against the
+key and IV, the source file and the output (its digest, and that the
+register is the tail of IV || ciphertext), truncates the output to
+``output_length`` and continues from ``offset``: only the work since the
+last checkpoint is redone. The checkpoint is removed once the file is
+complete. Under ``profiling()`` the file reads and writes are timed as the
+"read" and "write" phases.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+
+from cfb.backends import DEFAULT_BACKEND
+from cfb.engine import BLOCK_SIZE, check_parameters
+from cfb.instrument import timed
+from cfb.stream import CHUNK_SIZE, CFBDecryptor, CFBEncryptor
+
+CHECKPOINT_SUFFIX = ".cfb_checkpoint"
+VERSION = 1
+# Input bytes processed between two checkpoints
+CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+# Output bytes covered by the digest checked before resuming
+DIGEST_BYTES = 64 * 1024
+_FINGERPRINT_LABEL = b"cfb checkpoint"
+
+
+class CheckpointError(ValueError):
+    """Raised when a checkpoint does not match the key, the source or the output it describes"""
+
+
+def checkpoint_path(target_path):
+    """Path of the sidecar checkpoint of an output file"""
+    return f"{target_path}{CHECKPOINT_SUFFIX}"
+
+
+def _fingerprint(key, iv, segment_size, operation):
+    message = _FINGERPRINT_LABEL + bytes(iv) + bytes([segment_size]) + operation.encode()
+    return hmac.new(bytes(key), message, hashlib.sha256).hexdigest()
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _tail(handle, end, size):
+    """The ``size`` bytes of an open file before offset ``end`` (fewer at the start of the file)"""
+    start = max(end - size, 0)
+    handle.seek(start)
+    return handle.read(end - start)
+
+
+class Checkpoint:
+    """
+    Saved state of an interrupted file operation
+
+    Attributes:
+        operation: "encrypt" or "decrypt"
+        segment_size: Segment size in bytes
+        source_size: Size of the source file when the operation started
+        source_mtime_ns: Modification time of the source file (nanoseconds)
+        fingerprint: HMAC of the IV, segment size and operation under the key
+        offset: Input bytes read
+        output_length: Output bytes written
+        pending: Input bytes of an incomplete segment (bytes)
+        register: Feedback register after ``output_length`` bytes (bytes)
+        output_digest: SHA-256 of the last output bytes (hex)
+    """
+
+    def __init__(self, operation, segment_size, source_size, source_mtime_ns, fingerprint, offset=0,
+                 output_length=0, pending=b'', register=b'', output_digest=""):
+        self.operation = operation
+        self.segment_size = segment_size
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        self.fingerprint = fingerprint
+        self.offset = offset
+        self.output_length = output_length
+        self.pending = bytes(pending)
+        self.register = bytes(register)
+        self.output_digest = output_digest
+
+    def to_json(self):
+        """The checkpoint as a JSON document"""
+        return json.dumps({
+            "version": VERSION,
+            "operation": self.operation,
+            "segment_size": self.segment_size,
+            "source_size": self.source_size,
+            "source_mtime_ns": self.source_mtime_ns,
+            "fingerprint": self.fingerprint,
+            "offset": self.offset,
+            "output_length": self.output_length,
+            "pending": self.pending.hex(),
+            "register": self.register.hex(),
+            "output_digest": self.output_digest,
+        }, indent=2)
+
+    @classmethod
+    def from_json(cls, text):
+        """Parse a checkpoint written by ``to_json``"""
+        try:
+            fields = json.loads(text)
+            version = fields.pop("version")
+            fields["pending"] = bytes.fromhex(fields["pending"])
+            fields["register"] = bytes.fromhex(fields["register"])
+            checkpoint = cls(**fields)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise CheckpointError(f"Unreadable checkpoint: {e}") from None
+        if version != VERSION:
+            raise CheckpointError(f"Unsupported checkpoint version {version}")
+        return checkpoint
+
+    def save(self, path):
+        """Write the checkpoint to ``path`` atomically"""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as handle:
+            handle.write(self.to_json())
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+
+
+def load_checkpoint(target_path):
+    """
+    Checkpoint left by an interrupted operation writing ``target_path``
+
+    Returns:
+        Checkpoint, or None if there is none
+    """
+    try:
+        with open(checkpoint_path(target_path)) as handle:
+            return Checkpoint.from_json(handle.read())
+    except FileNotFoundError:
+        return None
+
+
+def _check_resumable(checkpoint, output, key, iv, segment_size, operation, source, source_stat):
+    """Raise CheckpointError unless the operation can continue from ``checkpoint``"""
+    if checkpoint.operation != operation or checkpoint.segment_size != segment_size:
+        raise CheckpointError(f"The checkpoint belongs to a different operation "
+                              f"({checkpoint.operation}, {checkpoint.segment_size}-byte segments)")
+    if not hmac.compare_digest(checkpoint.fingerprint, _fingerprint(key, iv, segment_size, operation)):
+        raise CheckpointError("The checkpoint was made with a different key or IV")
+    if (checkpoint.source_size, checkpoint.source_mtime_ns) != source_stat:
+        raise CheckpointError("The source file changed since the checkpoint")
+    length = checkpoint.output_length
+    if not 0 <= checkpoint.offset - length == len(checkpoint.pending) < segment_size:
+        raise CheckpointError("The checkpoint is inconsistent")
+    output.seek(0, os.SEEK_END)
+    if output.tell() < length:
+        raise CheckpointError("The output is shorter than the checkpoint says")
+    if hashlib.sha256(_tail(output, length, DIGEST_BYTES)).hexdigest() != checkpoint.output_digest:
+        raise CheckpointError("The output does not match the checkpoint")
+    # After whole segments the register holds the last 16 bytes of IV || ciphertext
+    ciphertext = output if operation == "encrypt" else source
+    if (bytes(iv) + _tail(ciphertext, length, BLOCK_SIZE))[-BLOCK_SIZE:] != checkpoint.register:
+        raise CheckpointError("The feedback register does not match the ciphertext")
+
+
+def _transform_file_resumable(source_path, target_path, key, iv, segment_size, operation, interval, resume,
+                              progress, chunk_size, backend):
+    check_parameters(iv, segment_size)
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        raise ValueError("Resumable operations need a separate output file")
+    sidecar = checkpoint_path(target_path)
+    source_stat = _source_stat(source_path)
+    cipher_class = CFBEncryptor if operation == "encrypt" else CFBDecryptor
+    cipher = cipher_class(key, iv, segment_size, backend)
+    checkpoint = load_checkpoint(target_path) if resume and os.path.exists(target_path) else None
+
+    with open(source_path, 'rb') as source, open(target_path, 'r+b' if checkpoint else 'w+b') as output:
+        if checkpoint:
+            _check_resumable(checkpoint, output, key, iv, segment_size, operation, source, source_stat)
+            output.truncate(checkpoint.output_length)
+            output.seek(checkpoint.output_length)
+            source.seek(checkpoint.offset)
+            cipher.feedback = checkpoint.register
+            cipher.pending = bytearray(checkpoint.pending)
+            done, output_length = checkpoint.offset, checkpoint.output_length
+        else:
+            # A checkpoint of an earlier run no longer describes the (truncated) output
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            checkpoint = Checkpoint(operation, segment_size, *source_stat,
+                                    _fingerprint(key, iv, segment_size, operation))
+            done = output_length = 0
+        if progress:
+            progress(done, source_stat[0])
+
+        saved = done
+        while True:
+            with timed("read"):
+                chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            data = cipher.update(chunk)
+            with timed("write"):
+                output.write(data)
+            done += len(chunk)
+            output_length += len(data)
+            if done - saved >= interval:
+                # The output must be on disk before a checkpoint claims it
+                with timed("write"):
+                    output.flush()
+                    os.fsync(output.fileno())
+                checkpoint.offset = done
+                checkpoint.output_length = output_length
+                checkpoint.pending = bytes(cipher.pending)
+                checkpoint.register = cipher.feedback
+                checkpoint.output_digest = hashlib.sha256(_tail(output, output_length, DIGEST_BYTES)).hexdigest()
+                output.seek(output_length)
+                checkpoint.save(sidecar)
+                saved = done
+            if progress:
+                progress(done, source_stat[0])
+        data = cipher.finalize()
+        with timed("write"):
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+    return done
+
+
+def encrypt_file_resumable(source_path, target_path, key, iv, segment_size=16, interval=CHECKPOINT_INTERVAL,
+                           resume=True, progress=None, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND):
+    """
+    Encrypt a file, saving a checkpoint every ``interval`` bytes and resuming from the last one
+
+    Args:
+        source_path: Path of the plaintext file
+        target_path: Path of the ciphertext file (must differ from ``source_path``)
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        interval: Input bytes processed between two checkpoints (default: 64 MB)
+        resume: Continue from the checkpoint of an earlier run if there is one (default: True);
+            False starts over
+        progress: Optional callable receiving (bytes done, total bytes) after each chunk
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Number of bytes processed, including those of earlier runs (int)
+
+    Raises:
+        CheckpointError: The checkpoint does not match the key, IV, source or output
+    """
+    return _transform_file_resumable(source_path, target_path, key, iv, segment_size, "encrypt", interval, resume,
+                                     progress, chunk_size, backend)
+
+
+def decrypt_file_resumable(source_path, target_path, key, iv, segment_size=16, interval=CHECKPOINT_INTERVAL,
+                           resume=True, progress=None, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND):
+    """
+    Decrypt a file, saving a checkpoint every ``interval`` bytes and resuming from the last one
+
+    Args:
+        source_path: Path of the ciphertext file
+        target_path: Path of the plaintext file (must differ from ``source_path``)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        interval: Input bytes processed between two checkpoints (default: 64 MB)
+        resume: Continue from the checkpoint of an earlier run if there is one (default: True);
+            False starts over
+        progress: Optional callable receiving (bytes done, total bytes) after each chunk
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Number of bytes processed, including those of earlier runs (int)
+
+    Raises:
+        CheckpointError: The checkpoint does not match the key, IV, source or output
+    """
+    return _transform_file_resumable(source_path, target_path, key, iv, segment_size, "decrypt", interval, resume,
+                                     progress, chunk_size, backend)
@@ -0,0 +1,409 @@
+"""
+Command-line interface for bulk CFB encryption
+
+Usage::
+
+    python -m cfb encrypt report.pdf data/ -o encrypted/ --workers 4
+    python -m cfb encrypt huge.iso --chunked --workers 8
+    python -m cfb encrypt server.log --compress zlib
+    python -m cfb decrypt server.log.cfb_encrypted --decompress
+    python -m cfb encrypt backup.tar --resumable
+    python -m cfb decrypt encrypted/ -o restored/
+    cat message.txt | python -m cfb encrypt > message.txt.cfb_encrypted
+    python -m cfb keygen --key-file key.b64 --iv-file iv.b64
+    python -m cfb bench --sizes 1K 1M
+    python -m cfb loopback --connections 2000
+    python -m cfb selftest
+
+The key and IV are read from ``--key-file`` / ``--iv-file`` (raw bytes or
+Base64 text) or from the ``CFB_KEY`` / ``CFB_IV`` environment variables
+(Base64, as shown on the Simulation page). Only the standard library and
+the ``cfb`` package are imported, never Streamlit.
+
+With ``--chunked`` each file is written in the chunked container format
+and its chunks are spread over the worker processes, which speeds up
+single large files. Chunked files, and the authenticated files written by
+the File Operations tab, are recognised automatically when decrypting;
+chunked files are decrypted one at a time with their chunks spread over
+the workers in the same way, and authenticated files are only written out
+once their tag is verified.
+
+With ``--compress`` the data is compressed before it is encrypted (see
+``cfb.compress``). Chunked containers record this in their header and
+are decompressed automatically; raw files have no header, so they must be
+decrypted with ``--decompress``.
+
+With ``--resumable`` a checkpoint is saved next to each output file as it
+is written (see ``cfb.checkpoint``); running the same command again after
+a crash continues from the last checkpoint.
+"""
+
+import argparse
+import base64
+import binascii
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from cfb.auth import AuthenticationError, decrypt_stream_authenticated, is_authenticated
+from cfb.checkpoint import (CheckpointError, checkpoint_path, decrypt_file_resumable, encrypt_file_resumable,
+                            load_checkpoint)
+from cfb.compress import (PREFIX_SIZE, CompressingReader, DecompressingWriter, available_methods, compress_stream,
+                          container_compressed, decompress_stream)
+from cfb.container import decrypt_file_chunked, encrypt_file_chunked, is_chunked
+from cfb.engine import BLOCK_SIZE
+from cfb.files import ENCRYPTED_SUFFIX, decrypt_file, decrypted_name, encrypt_file, encrypted_name
+from cfb.keys import KEY_SIZE, generate_iv, generate_key
+from cfb.stream import decrypt_stream, encrypt_stream
+
+KEY_ENV = "CFB_KEY"
+IV_ENV = "CFB_IV"
+
+
+class CLIError(Exception):
+    """Raised for invalid command-line input, reported without a traceback"""
+
+
+def _decode_secret(raw, size, what):
+    """Accept ``size`` raw bytes or their Base64 encoding"""
+    if len(raw) == size:
+        return raw
+    try:
+        decoded = base64.b64decode(raw.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        decoded = b''
+    if len(decoded) != size:
+        raise CLIError(f"{what} must be {size} bytes (raw or Base64 encoded)")
+    return decoded
+
+
+def load_secret(path, env_name, size, what):
+    """
+    Read the key or IV from a file or an environment variable
+
+    Args:
+        path: File holding the value (raw bytes or Base64), or None
+        env_name: Environment variable holding the Base64 value
+        size: Expected size in bytes
+        what: Name used in error messages
+
+    Returns:
+        Decoded value (bytes)
+    """
+    if path:
+        with open(path, 'rb') as handle:
+            return _decode_secret(handle.read(), size, what)
+    value = os.environ.get(env_name)
+    if value:
+        return _decode_secret(value.encode(), size, what)
+    raise CLIError(f"No {what} given: use --{what.lower()}-file or set {env_name}")
+
+
+def _target_name(name, decrypt):
+    return decrypted_name(name) if decrypt else encrypted_name(name)
+
+
+def plan_jobs(inputs, output, decrypt, in_place=False):
+    """
+    Expand files and directories into (source, target) pairs
+
+    Directories are walked recursively and mirrored below ``output``. When
+    decrypting only ``.cfb_encrypted`` files are picked up from directories,
+    and when encrypting those files are skipped.
+
+    Returns:
+        List of (source path, target path or None for in-place)
+    """
+    jobs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(ENCRYPTED_SUFFIX) != decrypt:
+                        continue
+                    source = os.path.join(root, name)
+                    if in_place:
+                        jobs.append((source, None))
+                        continue
+                    target_dir = root
+                    if output:
+                        target_dir = os.path.normpath(os.path.join(output, os.path.relpath(root, path)))
+                    jobs.append((source, os.path.join(target_dir, _target_name(name, decrypt))))
+        elif os.path.isfile(path):
+            if in_place:
+                jobs.append((path, None))
+            elif output and (os.path.isdir(output) or len(inputs) > 1):
+                jobs.append((path, os.path.join(output, _target_name(os.path.basename(path), decrypt))))
+            else:
+                jobs.append((path, output or os.path.join(os.path.dirname(path),
+                                                          _target_name(os.path.basename(path), decrypt))))
+        else:
+            raise CLIError(f"No such file or directory: {path}")
+    return jobs
+
+
+def _file_prefix(path):
+    with open(path, 'rb') as handle:
+        return handle.read(PREFIX_SIZE)
+
+
+def _temporary_file(near):
+    """Create an empty temporary file in the directory of ``near``, returning (descriptor, path)"""
+    return tempfile.mkstemp(dir=os.path.dirname(near) or '.', prefix=".cfb-")
+
+
+def _compress_file(source, method):
+    """Compress ``source`` into a temporary file next to it, returning its path"""
+    descriptor, path = _temporary_file(source)
+    try:
+        with open(source, 'rb') as handle, os.fdopen(descriptor, 'wb') as target:
+            compress_stream(handle, target, method)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _decompress_file(path):
+    """Replace a decrypted file by its decompressed content"""
+    with open(path, 'rb') as handle:
+        descriptor, temporary = _temporary_file(path)
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                decompress_stream(handle, target)
+        except ValueError as e:
+            os.remove(temporary)
+            raise CLIError(f"{path}: {e}") from None
+        except BaseException:
+            os.remove(temporary)
+            raise
+    shutil.copymode(path, temporary)
+    os.replace(temporary, path)
+
+
+def _run_resumable(transform, source, target, key, iv, segment_size):
+    """Checkpointed transform of one file, continuing an interrupted run"""
+    checkpoint = load_checkpoint(target)
+    if checkpoint:
+        print(f"{source}: resuming after {checkpoint.offset:,} bytes", file=sys.stderr)
+    try:
+        return transform(source, target, key, iv, segment_size)
+    except CheckpointError as e:
+        raise CLIError(f"{target}: {e} (delete {checkpoint_path(target)} to start over)") from None
+
+
+def _decrypt_authenticated_file(source, target, key):
+    """Verify and decrypt an authenticated container into ``target`` (or over ``source``)"""
+    target = target or source
+    descriptor, temporary = _temporary_file(target)
+    try:
+        with open(source, 'rb') as handle, os.fdopen(descriptor, 'w+b') as output:
+            size = decrypt_stream_authenticated(handle, output, key)
+    except AuthenticationError as e:
+        os.remove(temporary)
+        raise CLIError(f"{source}: {e}") from None
+    except BaseException:
+        os.remove(temporary)
+        raise
+    os.replace(temporary, target)
+    return size
+
+
+def _run_job(source, target, key, iv, segment_size, decrypt, chunked=False, workers=1, compression=None,
+             resumable=False, decompress=False):
+    """Process one file, returning its size (runs in a worker process unless ``chunked``)"""
+    if target:
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    if decrypt:
+        prefix = _file_prefix(source)
+        compressed = container_compressed(prefix)
+        if is_authenticated(prefix):
+            size = _decrypt_authenticated_file(source, target, key)
+        elif is_chunked(prefix):
+            if not target:
+                raise CLIError(f"{source}: chunked files cannot be decrypted in place")
+            size = decrypt_file_chunked(source, target, key, workers)
+        elif resumable:
+            size = _run_resumable(decrypt_file_resumable, source, target, key, iv, segment_size)
+        else:
+            size = decrypt_file(source, target, key, iv, segment_size)
+        # Containers record whether they are compressed, raw files rely on --decompress
+        if compressed or (compressed is None and decompress):
+            _decompress_file(target or source)
+        return size
+    if compression:
+        # The compressed copy is encrypted into the target (or over the source when in place)
+        size = os.path.getsize(source)
+        packed = _compress_file(source, compression)
+        try:
+            if chunked:
+                encrypt_file_chunked(packed, target, key, iv, segment_size, workers=workers, compressed=True)
+            else:
+                encrypt_file(packed, target or source, key, iv, segment_size)
+        finally:
+            os.remove(packed)
+        return size
+    if chunked:
+        return encrypt_file_chunked(source, target, key, iv, segment_size, workers=workers)
+    if resumable:
+        return _run_resumable(encrypt_file_resumable, source, target, key, iv, segment_size)
+    return encrypt_file(source, target, key, iv, segment_size)
+
+
+def _report(action, files, total, elapsed):
+    rate = total / elapsed / 1e6 if elapsed else float('inf')
+    print(f"{action} {files} file(s), {total / 1e6:.2f} MB in {elapsed:.3f} s ({rate:.2f} MB/s)", file=sys.stderr)
+
+
+def run_transform(args, decrypt):
+    """Handle the encrypt and decrypt commands"""
+    key = load_secret(args.key_file, KEY_ENV, KEY_SIZE, "Key")
+    iv = load_secret(args.iv_file, IV_ENV, BLOCK_SIZE, "IV")
+    action = "Decrypted" if decrypt else "Encrypted"
+    started = time.perf_counter()
+
+    chunked = getattr(args, 'chunked', False)
+    compression = getattr(args, 'compress', None)
+    if compression and compression not in available_methods():
+        raise CLIError(f"--compress {compression} is not available, use one of {', '.join(available_methods())}")
+    decompress = getattr(args, 'decompress', False)
+    resumable = args.resumable
+    if resumable and (chunked or compression or args.in_place):
+        raise CLIError("--resumable cannot be combined with --chunked, --compress or --in-place")
+    if compression and not chunked:
+        print("Note: raw files do not record compression, decrypt them with --decompress", file=sys.stderr)
+    if not args.inputs or args.inputs == ['-']:
+        if chunked or resumable:
+            raise CLIError(f"--{'chunked' if chunked else 'resumable'} needs file inputs, not stdin")
+        # Stream stdin to stdout (or to the output file)
+        with open(args.output, 'wb') if args.output else nullcontext(sys.stdout.buffer) as output:
+            if decrypt:
+                target = DecompressingWriter(output) if decompress else output
+                total = decrypt_stream(sys.stdin.buffer, target, key, iv, args.segment_size)
+                if decompress:
+                    target.finish()
+            else:
+                source = CompressingReader(sys.stdin.buffer, compression) if compression else sys.stdin.buffer
+                total = encrypt_stream(source, output, key, iv, args.segment_size)
+            output.flush()
+        _report(action, 1, total, time.perf_counter() - started)
+        return 0
+
+    if chunked and args.in_place:
+        raise CLIError("--chunked cannot be combined with --in-place")
+    planned = plan_jobs(args.inputs, args.output, decrypt, args.in_place)
+    # Chunked containers go one at a time, their chunks spread over the workers; other files share the workers
+    containers = [job for job in planned if chunked or (decrypt and is_chunked(_file_prefix(job[0])))]
+    jobs = [job for job in planned if job not in containers] if containers else planned
+    total = 0
+    for source, target in containers:
+        total += _run_job(source, target, key, iv, args.segment_size, decrypt, True, args.workers, compression)
+        if args.verbose:
+            print(f"{source} -> {target}", file=sys.stderr)
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(_run_job, source, target, key, iv, args.segment_size, decrypt,
+                                   compression=compression, resumable=resumable, decompress=decompress)
+                       for source, target in jobs]
+            for (source, target), future in zip(jobs, futures):
+                total += future.result()
+                if args.verbose:
+                    print(f"{source} -> {target or source}", file=sys.stderr)
+    else:
+        for source, target in jobs:
+            total += _run_job(source, target, key, iv, args.segment_size, decrypt, compression=compression,
+                              resumable=resumable, decompress=decompress)
+            if args.verbose:
+                print(f"{source} -> {target or source}", file=sys.stderr)
+
+    _report(action, len(planned), total, time.perf_counter() - started)
+    return 0
+
+
+def run_keygen(args):
+    """Handle the keygen command"""
+    for path, value in ((args.key_file, generate_key()), (args.iv_file, generate_iv())):
+        encoded = base64.b64encode(value).decode()
+        if path:
+            # Keys are secrets: create the file readable by the owner only
+            with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as handle:
+                handle.write(encoded + "\n")
+        else:
+            print(encoded)
+    return 0
+
+
+def run_selftest(args):
+    """Handle the selftest command"""
+    from cfb.backends import cross_check
+
+    mismatches = cross_check()
+    for name, operation, segment_size, length in mismatches:
+        print(f"MISMATCH {name} {operation} segment_size={segment_size} length={length}", file=sys.stderr)
+    print("All backends agree" if not mismatches else f"{len(mismatches)} mismatches", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cfb", description="AES CFB mode encryption tool")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("encrypt", "decrypt"):
+        command = commands.add_parser(name, help=f"{name} files, directories or stdin")
+        command.add_argument("inputs", nargs="*", help="files or directories ('-' or nothing for stdin)")
+        command.add_argument("-o", "--output", help="output file or directory (stdout for stdin input)")
+        command.add_argument("--key-file", help=f"file with the 256-bit key (default: ${KEY_ENV})")
+        command.add_argument("--iv-file", help=f"file with the 128-bit IV (default: ${IV_ENV})")
+        command.add_argument("-s", "--segment-size", type=int, default=16, choices=range(1, BLOCK_SIZE + 1),
+                             metavar="{1..16}", help="segment size in bytes (default: 16)")
+        command.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                             help="worker processes for multiple files or chunks (default: CPU count)")
+        command.add_argument("--in-place", action="store_true", help="overwrite the input files")
+        command.add_argument("--resumable", action="store_true",
+                             help="save checkpoints next to the outputs and resume an interrupted run")
+        command.add_argument("-v", "--verbose", action="store_true", help="list processed files")
+        if name == "encrypt":
+            command.add_argument("--chunked", action="store_true",
+                                 help="write chunked containers, encrypted in parallel across the workers")
+            command.add_argument("--compress", choices=("zlib", "lzma", "zstd"),
+                                 help="compress before encrypting (zstd needs the zstandard package); chunked "
+                                      "files record it, raw files must be decrypted with --decompress")
+        else:
+            command.add_argument("--decompress", action="store_true",
+                                 help="the raw files were encrypted with --compress: decompress after decrypting "
+                                      "(authenticated and chunked files record this themselves)")
+
+    keygen = commands.add_parser("keygen", help="generate a random key and IV (Base64)")
+    keygen.add_argument("--key-file", help="write the key to this file instead of stdout")
+    keygen.add_argument("--iv-file", help="write the IV to this file instead of stdout")
+
+    commands.add_parser("bench", help="run the benchmark harness (see python -m cfb bench --help)", add_help=False)
+    commands.add_parser("loopback", help="encrypted echo benchmark over many loopback connections "
+                        "(see python -m cfb loopback --help)", add_help=False)
+    commands.add_parser("selftest", help="check that every backend produces the same output")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        from cfb.bench import main as bench_main
+        return bench_main(argv[1:])
+    if argv[:1] == ["loopback"]:
+        from cfb.aio import main as loopback_main
+        return loopback_main(argv[1:])
+
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "selftest":
+            return run_selftest(args)
+        if args.command == "keygen":
+            return run_keygen(args)
+        return run_transform(args, decrypt=args.command == "decrypt")
+    except (CLIError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
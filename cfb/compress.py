@@ -0,0 +1,359 @@
+"""
+Optional compression stage ahead of encryption
+
+Ciphertext is exactly as long as its plaintext, so compressing first cuts
+the bytes going through the AES feedback loop, to disk and over the
+download. The stage works chunk by chunk on file objects and plugs into
+the existing pipelines unchanged:
+
+- ``CompressingReader`` wraps the plaintext source of an encryption and
+  yields a small header followed by the compressed stream;
+- ``DecompressingWriter`` wraps the target of a decryption, reads the
+  header and writes the decompressed data.
+
+The header travels inside the ciphertext (it is part of the encrypted
+plaintext), so the raw, authenticated and chunked formats all carry it::
+
+    b"CFBZ" | version (1 byte) | method (1 byte) | compressed stream
+
+Whether a file is compressed at all is never guessed from its plaintext,
+which may start with these bytes by chance. Authenticated and chunked
+containers record it in a flag of their header (``container_compressed``
+reads it); raw ciphertext has no header, so whoever decrypts it has to
+say so (``python -m cfb decrypt --decompress``).
+
+Before compressing, a sample from the start of the data is compressed; if
+it does not shrink by at least ``MIN_SAVING`` the data is stored as is
+(method "none"), which costs only the six header bytes.
+
+zlib and lzma come with Python; zstd needs the optional ``zstandard``
+package. Note that compression makes the ciphertext length depend on the
+content, which leaks information when an attacker can mix their own data
+with a secret in the same message.
+"""
+
+import lzma
+import struct
+import time
+import zlib
+
+from cfb import auth, container
+from cfb.instrument import timed
+from cfb.stream import CHUNK_SIZE
+
+MAGIC = b"CFBZ"
+VERSION = 1
+_HEADER = struct.Struct(">4sBB")
+HEADER_SIZE = _HEADER.size
+METHODS = ("none", "zlib", "lzma", "zstd")
+METHOD_LABELS = {"none": "Stored", "zlib": "zlib", "lzma": "LZMA", "zstd": "Zstandard"}
+DEFAULT_LEVELS = {"zlib": 6, "lzma": 6, "zstd": 3}
+# Bytes compressed to decide whether the data is worth compressing
+SAMPLE_SIZE = 64 * 1024
+# Minimum fraction the sample must shrink by
+MIN_SAVING = 0.1
+# Leading file bytes ``container_compressed`` needs
+PREFIX_SIZE = max(auth.HEADER_SIZE, container.HEADER_SIZE)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+
+def available_methods():
+    """Compression methods usable in this environment (without "none")"""
+    methods = ["zlib", "lzma"]
+    try:
+        _zstd()
+        methods.append("zstd")
+    except ValueError:
+        pass
+    return methods
+
+
+def _compressor(method, level=None):
+    level = DEFAULT_LEVELS[method] if level is None else level
+    if method == "zlib":
+        return zlib.compressobj(level)
+    if method == "lzma":
+        return lzma.LZMACompressor(preset=level)
+    return _zstd().ZstdCompressor(level=level).compressobj()
+
+
+def _decompression_errors(method):
+    """Exceptions the decompressor of ``method`` raises on corrupt data"""
+    if method == "zlib":
+        return zlib.error,
+    if method == "lzma":
+        return lzma.LZMAError, EOFError
+    if method == "zstd":
+        return _zstd().ZstdError,
+    return ()
+
+
+def _decompressor(method):
+    if method == "zlib":
+        return zlib.decompressobj()
+    if method == "lzma":
+        return lzma.LZMADecompressor()
+    return _zstd().ZstdDecompressor().decompressobj()
+
+
+class _Stage:
+    """Shared timing of the compressor calls of a reader or writer"""
+
+    seconds = 0.0
+
+    def _timed(self, function, *args):
+        with timed("compress") as timer:
+            result = function(*args)
+        self.seconds += time.perf_counter() - timer.start
+        return result
+
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError(f"Unknown compression method {method!r}, expected one of {', '.join(METHODS)}")
+
+
+def choose_method(sample, method="zlib", level=None, min_saving=MIN_SAVING):
+    """
+    ``method`` if compressing ``sample`` saves at least ``min_saving`` of it, otherwise "none"
+
+    Args:
+        sample: Leading bytes of the data
+        method: Compression method to try
+        level: Compression level (default: the method's default)
+        min_saving: Minimum fraction the sample must shrink by (default: 0.1)
+    """
+    _check_method(method)
+    if method == "none" or not sample:
+        return "none"
+    compressor = _compressor(method, level)
+    compressed = len(compressor.compress(bytes(sample))) + len(compressor.flush())
+    return method if compressed <= len(sample) * (1 - min_saving) else "none"
+
+
+def pack_header(method):
+    """Header announcing ``method`` (see the module docstring)"""
+    _check_method(method)
+    return _HEADER.pack(MAGIC, VERSION, METHODS.index(method))
+
+
+def parse_header(header):
+    """
+    Compression method announced by a header, or None if ``header`` is not one
+
+    Args:
+        header: First ``HEADER_SIZE`` bytes of the plaintext
+    """
+    if len(header) < HEADER_SIZE or bytes(header[:len(MAGIC)]) != MAGIC:
+        return None
+    _, version, method = _HEADER.unpack(bytes(header[:HEADER_SIZE]))
+    if version != VERSION or method >= len(METHODS):
+        return None
+    return METHODS[method]
+
+
+def is_compressed(prefix):
+    """True if ``prefix`` (the first plaintext bytes) starts with a compression header"""
+    return parse_header(prefix) is not None
+
+
+def container_compressed(prefix):
+    """
+    Whether the header of an authenticated or chunked container flags its plaintext as compressed
+
+    Args:
+        prefix: First bytes of the file (``PREFIX_SIZE`` are always enough)
+
+    Returns:
+        True or False, or None for raw ciphertext, which has no header to record it
+    """
+    if auth.is_authenticated(prefix):
+        return bool(auth.parse_header(prefix)[2] & auth.FLAG_COMPRESSED)
+    if container.is_chunked(prefix):
+        return bool(container.ContainerLayout._parse_header(prefix)[5] & container.FLAG_COMPRESSED)
+    return None
+
+
+class CompressingReader(_Stage):
+    """
+    Readable binary file object yielding a compression header and the compressed ``source``
+
+    Args:
+        source: Readable binary file object with the data
+        method: "zlib", "lzma", "zstd" or "none"
+        level: Compression level (default: the method's default)
+        chunk_size: Bytes read from ``source`` per step (default: 1 MB)
+
+    Attributes:
+        method: Method actually used ("none" if the sample did not compress)
+        bytes_in: Bytes read from ``source`` so far
+        bytes_out: Bytes returned so far, header included
+        seconds: Time spent compressing (sample test included)
+    """
+
+    def __init__(self, source, method="zlib", level=None, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        sample = source.read(SAMPLE_SIZE)
+        self.method = self._timed(choose_method, sample, method, level)
+        self._compressor = None if self.method == "none" else _compressor(self.method, level)
+        self._pending = bytearray(pack_header(self.method))
+        self._pending += self._compress(sample)
+        self._eof = False
+        self.bytes_in = len(sample)
+        self.bytes_out = 0
+
+    def _compress(self, data, flush=False):
+        if not self._compressor:
+            return data
+        return self._timed(self._compressor.flush) if flush else self._timed(self._compressor.compress, data)
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._pending) < size):
+            chunk = self.source.read(self.chunk_size)
+            if not chunk:
+                self._eof = True
+                self._pending += self._compress(b'', flush=True)
+                break
+            self.bytes_in += len(chunk)
+            self._pending += self._compress(chunk)
+        if size < 0 or size >= len(self._pending):
+            data = bytes(self._pending)
+            self._pending.clear()
+        else:
+            data = bytes(self._pending[:size])
+            del self._pending[:size]
+        self.bytes_out += len(data)
+        return data
+
+
+class DecompressingWriter(_Stage):
+    """
+    Writable binary file object that decompresses what is written into ``target``
+
+    The data must start with a compression header, and corrupt or truncated
+    compressed data raises ``ValueError`` like a missing header does.
+    ``finish()`` must be called once everything was written.
+
+    Args:
+        target: Writable binary file object for the plaintext
+
+    Attributes:
+        method: Method announced by the header, None until it was read
+        bytes_in: Bytes written so far, header included
+        bytes_out: Bytes written to ``target`` so far
+        seconds: Time spent decompressing
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.method = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._header = b''
+        self._decompressor = None
+        self._started = False
+
+    def _emit(self, data):
+        if data:
+            self.target.write(data)
+            self.bytes_out += len(data)
+
+    def _start(self, data):
+        """Read the header from the first bytes"""
+        self._started = True
+        self.method = parse_header(data)
+        if self.method is None:
+            raise ValueError("The data does not start with a compression header")
+        if self.method != "none":
+            self._decompressor = _decompressor(self.method)
+        self._feed(data[HEADER_SIZE:])
+
+    def _feed(self, data):
+        try:
+            self._decompress(data)
+        except _decompression_errors(self.method) as e:
+            raise ValueError(f"Corrupt {METHOD_LABELS[self.method]} data: {e}") from None
+
+    def _decompress(self, data):
+        decompressor = self._decompressor
+        if decompressor is None:
+            self._emit(data)
+        elif self.method == "zlib":
+            # Bounded steps, so a chunk that expands a thousandfold is never held at once
+            self._emit(self._timed(decompressor.decompress, data, CHUNK_SIZE))
+            while decompressor.unconsumed_tail:
+                self._emit(self._timed(decompressor.decompress, decompressor.unconsumed_tail, CHUNK_SIZE))
+        elif self.method == "lzma":
+            self._emit(self._timed(decompressor.decompress, data, CHUNK_SIZE))
+            while not decompressor.needs_input and not decompressor.eof:
+                self._emit(self._timed(decompressor.decompress, b'', CHUNK_SIZE))
+        else:
+            self._emit(self._timed(decompressor.decompress, data))
+
+    def write(self, data):
+        self.bytes_in += len(data)
+        if self._started:
+            self._feed(bytes(data))
+        else:
+            self._header += bytes(data)
+            if len(self._header) >= HEADER_SIZE:
+                header, self._header = self._header, b''
+                self._start(header)
+        return len(data)
+
+    def finish(self):
+        """Write out what is still buffered and check that the compressed stream is complete"""
+        if not self._started:
+            header, self._header = self._header, b''
+            self._start(header)
+        if self._decompressor is not None:
+            if hasattr(self._decompressor, 'flush'):
+                try:
+                    self._emit(self._timed(self._decompressor.flush))
+                except _decompression_errors(self.method) as e:
+                    raise ValueError(f"Corrupt {METHOD_LABELS[self.method]} data: {e}") from None
+            if not getattr(self._decompressor, 'eof', True):
+                raise ValueError("Compressed data is truncated")
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+def compress_stream(source, target, method="zlib", level=None, chunk_size=CHUNK_SIZE):
+    """
+    Write the header and the compressed ``source`` to ``target``
+
+    Returns:
+        Method used ("none" if the data did not compress)
+    """
+    reader = CompressingReader(source, method, level, chunk_size)
+    while True:
+        data = reader.read(chunk_size)
+        if not data:
+            return reader.method
+        target.write(data)
+
+
+def decompress_stream(source, target, chunk_size=CHUNK_SIZE):
+    """
+    Decompress what ``compress_stream`` wrote
+
+    Returns:
+        Method announced by the header
+    """
+    writer = DecompressingWriter(target)
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        writer.write(data)
+    writer.finish()
+    return writer.method
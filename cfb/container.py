@@ -0,0 +1,340 @@
+"""
+Chunked CFB container for encryption across several processes
+
+CFB encryption is sequential: every segment needs the ciphertext of the
+one before. The chunked container cuts the input into chunks that are
+encrypted independently, each starting from its own IV, so chunks can be
+encrypted and decrypted by a pool of processes. The layout is::
+
+    header | index | chunk 0 | chunk 1 | ...
+
+    header: b"CFBC" | version (1) | segment size (1) | flags (1) | 1 unused byte | chunk size (8)
+            | chunk count (8) | plaintext size (8) | base IV (16)
+    index:  (file offset (8), length (8)) for every chunk
+
+The only flag, ``FLAG_COMPRESSED``, records that the plaintext went
+through ``cfb.compress`` before it was encrypted (files written before
+the flag existed have zero in its place).
+
+The IV of chunk ``i`` is E(K, base IV + i), all produced by one AES-ECB
+call, so IVs never repeat across chunks and stay unpredictable. The index
+locates any chunk, and so any byte of the plaintext, without scanning
+the file. Each chunk is plain CFB ciphertext of its plaintext chunk.
+"""
+
+import os
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.engine import BLOCK_SIZE, check_parameters, new_ecb
+
+MAGIC = b"CFBC"
+VERSION = 1
+# The plaintext is compressed (see cfb.compress)
+FLAG_COMPRESSED = 0x01
+_HEADER = struct.Struct(f">4sBBBxQQQ{BLOCK_SIZE}s")
+_INDEX_ENTRY = struct.Struct(">QQ")
+HEADER_SIZE = _HEADER.size
+# Plaintext bytes per chunk: small enough that a few uploaded megabytes still spread over the pool
+CONTAINER_CHUNK_SIZE = 1024 * 1024
+
+
+def is_chunked(prefix):
+    """True if ``prefix`` (the first bytes of a file) starts a chunked container"""
+    return bytes(prefix[:len(MAGIC)]) == MAGIC
+
+
+def chunk_ivs(key, base_iv, count, first=0):
+    """IVs of chunks ``first`` to ``first + count - 1`` of a container: E(K, base IV + i)"""
+    base = int.from_bytes(base_iv, 'big')
+    counters = b''.join(((base + i) % (1 << 128)).to_bytes(BLOCK_SIZE, 'big') for i in range(first, first + count))
+    ivs = new_ecb(key).encrypt(counters)
+    return [ivs[i:i + BLOCK_SIZE] for i in range(0, len(ivs), BLOCK_SIZE)]
+
+
+class ContainerLayout:
+    """
+    Header fields and chunk index of a chunked container
+
+    Attributes:
+        segment_size: Segment size in bytes
+        chunk_size: Plaintext bytes per chunk (the last chunk may be shorter)
+        size: Total plaintext size in bytes
+        base_iv: IV the chunk IVs are derived from
+        index: List of (file offset, length) pairs, one per chunk
+        compressed: True if the plaintext is compressed (``FLAG_COMPRESSED``)
+    """
+
+    def __init__(self, segment_size, chunk_size, size, base_iv, index=None, compressed=False):
+        check_parameters(base_iv, segment_size)
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.size = size
+        self.base_iv = bytes(base_iv)
+        if index is None:
+            data_start = HEADER_SIZE + _INDEX_ENTRY.size * -(-size // chunk_size)
+            index = [(data_start + start, min(chunk_size, size - start)) for start in range(0, size, chunk_size)]
+        self.index = index
+        self.compressed = compressed
+
+    @property
+    def header_size(self):
+        """Size of the header and index in bytes"""
+        return HEADER_SIZE + _INDEX_ENTRY.size * len(self.index)
+
+    def pack(self):
+        """Serialized header and index (bytes)"""
+        flags = FLAG_COMPRESSED if self.compressed else 0
+        header = _HEADER.pack(MAGIC, VERSION, self.segment_size, flags, self.chunk_size, len(self.index), self.size,
+                              self.base_iv)
+        return header + b''.join(_INDEX_ENTRY.pack(offset, length) for offset, length in self.index)
+
+    @staticmethod
+    def _parse_header(header):
+        """Return (segment size, chunk size, chunk count, plaintext size, base IV, flags)"""
+        if len(header) < HEADER_SIZE or not is_chunked(header):
+            raise ValueError("Not a chunked CFB file")
+        magic, version, segment_size, flags, chunk_size, count, size, base_iv = _HEADER.unpack(
+            bytes(header[:HEADER_SIZE]))
+        if version != VERSION:
+            raise ValueError(f"Unsupported chunked CFB version {version}")
+        return segment_size, chunk_size, count, size, base_iv, flags
+
+    @classmethod
+    def _from_parts(cls, header, entries):
+        segment_size, chunk_size, count, size, base_iv, flags = cls._parse_header(header)
+        if len(entries) < _INDEX_ENTRY.size * count:
+            raise ValueError("Chunked CFB file is truncated")
+        index = list(_INDEX_ENTRY.iter_unpack(bytes(entries[:_INDEX_ENTRY.size * count])))
+        return cls(segment_size, chunk_size, size, base_iv, index, bool(flags & FLAG_COMPRESSED))
+
+    @classmethod
+    def read(cls, source):
+        """Read the header and index from the start of a binary file object"""
+        header = source.read(HEADER_SIZE)
+        count = cls._parse_header(header)[2]
+        return cls._from_parts(header, source.read(_INDEX_ENTRY.size * count))
+
+    @classmethod
+    def from_buffer(cls, data):
+        """Read the header and index of a container held in memory"""
+        count = cls._parse_header(data[:HEADER_SIZE])[2]
+        return cls._from_parts(data[:HEADER_SIZE], data[HEADER_SIZE:HEADER_SIZE + _INDEX_ENTRY.size * count])
+
+    def locate(self, offset):
+        """Index of the chunk holding plaintext byte ``offset``"""
+        return offset // self.chunk_size
+
+
+def _transform_chunk(data, key, iv, segment_size, decrypt):
+    """Encrypt or decrypt one chunk (runs in a worker process)"""
+    backend = get_backend(DEFAULT_BACKEND)
+    transform = backend.decrypt if decrypt else backend.encrypt
+    return bytes(transform(data, key, iv, segment_size))
+
+
+def _transform_file_chunk(source_path, source_offset, target_path, target_offset, length, key, iv,
+                          segment_size, decrypt):
+    """Transform one chunk from file to file, so only paths and offsets cross process boundaries"""
+    with open(source_path, 'rb') as source:
+        source.seek(source_offset)
+        data = source.read(length)
+    with open(target_path, 'r+b') as target:
+        target.seek(target_offset)
+        target.write(_transform_chunk(data, key, iv, segment_size, decrypt))
+    return length
+
+
+def _run(function, tasks, workers):
+    """Run ``function`` over a list of argument tuples, in a process pool when worthwhile"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(function, *zip(*tasks)))
+
+
+def _pipeline(tasks, workers):
+    """
+    Yield the results of ``_transform_chunk`` over an iterable of argument tuples, in order
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    while the tasks are produced (read) lazily.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for task in tasks:
+            yield _transform_chunk(*task)
+        return
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task in tasks:
+            pending.append(pool.submit(_transform_chunk, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _stream_size(source):
+    """Bytes left in a seekable binary file object"""
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END) - position
+    source.seek(position)
+    return size
+
+
+def encrypt_stream_chunked(source, target, key, iv, segment_size=16, chunk_size=CONTAINER_CHUNK_SIZE, workers=None,
+                           compressed=False):
+    """
+    Encrypt a seekable binary file object into a chunked container
+
+    Args:
+        source: Readable, seekable binary file object with the plaintext
+        target: Writable binary file object for the container
+        key: 256-bit encryption key (32 bytes)
+        iv: Base IV (16 bytes) the chunk IVs are derived from
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Plaintext bytes per chunk (default: 1 MB)
+        workers: Worker processes (default: CPU count)
+        compressed: Set ``FLAG_COMPRESSED``: ``source`` holds the output of a ``CompressingReader``
+
+    Returns:
+        Number of plaintext bytes processed (int)
+    """
+    layout = ContainerLayout(segment_size, chunk_size, _stream_size(source), iv, compressed=compressed)
+    ivs = chunk_ivs(key, layout.base_iv, len(layout.index))
+    target.write(layout.pack())
+
+    tasks = ((source.read(chunk_size), key, chunk_iv, segment_size, False) for chunk_iv in ivs)
+    for ciphertext in _pipeline(tasks, workers):
+        target.write(ciphertext)
+    return layout.size
+
+
+def decrypt_stream_chunked(source, target, key, workers=None):
+    """
+    Decrypt a chunked container into a binary file object
+
+    Args:
+        source: Readable, seekable binary file object with the container
+        target: Writable binary file object for the plaintext
+        key: 256-bit decryption key (32 bytes)
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        Number of plaintext bytes (int)
+    """
+    start = source.tell()
+    layout = ContainerLayout.read(source)
+    ivs = chunk_ivs(key, layout.base_iv, len(layout.index))
+
+    def tasks():
+        for (offset, length), chunk_iv in zip(layout.index, ivs):
+            source.seek(start + offset)
+            yield source.read(length), key, chunk_iv, layout.segment_size, True
+
+    for plaintext in _pipeline(tasks(), workers):
+        target.write(plaintext)
+    return layout.size
+
+
+def encrypt_file_chunked(source_path, target_path, key, iv, segment_size=16, chunk_size=CONTAINER_CHUNK_SIZE,
+                         workers=None, compressed=False):
+    """
+    Encrypt a file on disk into a chunked container, one chunk per task
+
+    Args:
+        source_path: Path of the plaintext file
+        target_path: Path of the container (must differ from ``source_path``)
+        key: 256-bit encryption key (32 bytes)
+        iv: Base IV (16 bytes) the chunk IVs are derived from
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Plaintext bytes per chunk (default: 1 MB)
+        workers: Worker processes (default: CPU count)
+        compressed: Set ``FLAG_COMPRESSED``: the source file was written by ``compress_stream``
+
+    Returns:
+        Number of plaintext bytes processed (int)
+    """
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        raise ValueError("Chunked containers cannot be written in place")
+    layout = ContainerLayout(segment_size, chunk_size, os.path.getsize(source_path), iv, compressed=compressed)
+    ivs = chunk_ivs(key, layout.base_iv, len(layout.index))
+    with open(target_path, 'wb') as target:
+        target.write(layout.pack())
+        target.truncate(layout.header_size + layout.size)
+
+    tasks = [(source_path, i * chunk_size, target_path, offset, length, key, chunk_iv, segment_size, False)
+             for i, ((offset, length), chunk_iv) in enumerate(zip(layout.index, ivs))]
+    _run(_transform_file_chunk, tasks, workers)
+    return layout.size
+
+
+def decrypt_file_chunked(source_path, target_path, key, workers=None):
+    """
+    Decrypt a chunked container on disk, one chunk per task
+
+    Args:
+        source_path: Path of the container
+        target_path: Path of the plaintext file (must differ from ``source_path``)
+        key: 256-bit decryption key (32 bytes)
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        Number of plaintext bytes (int)
+    """
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        raise ValueError("Chunked containers cannot be decrypted in place")
+    with open(source_path, 'rb') as source:
+        layout = ContainerLayout.read(source)
+    ivs = chunk_ivs(key, layout.base_iv, len(layout.index))
+    with open(target_path, 'wb') as target:
+        target.truncate(layout.size)
+
+    tasks = [(source_path, offset, target_path, i * layout.chunk_size, length, key, chunk_iv, layout.segment_size, True)
+             for i, ((offset, length), chunk_iv) in enumerate(zip(layout.index, ivs))]
+    _run(_transform_file_chunk, tasks, workers)
+    return layout.size
+
+
+def decrypt_range_chunked(container, offset, length, key, backend=DEFAULT_BACKEND):
+    """
+    Decrypt a plaintext byte range of a chunked container held in memory
+
+    Only the chunks covering the range are read, found through the index.
+
+    Args:
+        container: Complete container (bytes-like, e.g. bytes, memoryview or mmap)
+        offset: Plaintext position of the first byte
+        length: Number of bytes (clipped at the end of the plaintext)
+        key: 256-bit decryption key (32 bytes)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Decrypted plaintext of the requested range (bytes)
+    """
+    from cfb.ranges import decrypt_range
+
+    if offset < 0 or length < 0:
+        raise ValueError("Offset and length must not be negative")
+    layout = ContainerLayout.from_buffer(container)
+    stop = min(offset + length, layout.size)
+    if offset >= stop:
+        return b''
+
+    first, last = layout.locate(offset), layout.locate(stop - 1)
+    ivs = chunk_ivs(key, layout.base_iv, last - first + 1, first)
+    pieces = []
+    for number, chunk_iv in zip(range(first, last + 1), ivs):
+        chunk_offset, chunk_length = layout.index[number]
+        chunk_start = number * layout.chunk_size
+        start = max(offset, chunk_start) - chunk_start
+        end = min(stop, chunk_start + chunk_length) - chunk_start
+        chunk = memoryview(container)[chunk_offset:chunk_offset + chunk_length]
+        pieces.append(decrypt_range(chunk, start, end - start, key, chunk_iv, layout.segment_size, backend))
+    return b''.join(pieces)
@@ -0,0 +1,95 @@
+"""
+Windowed rendering of large payloads
+
+Pages keep ciphertext and plaintext as bytes and only render a window of
+them: small payloads are shown whole, large ones as a head and a tail,
+plus whatever window the user browses to. Every view is computed from the
+window alone, so the cost of a rerun does not depend on the payload size.
+
+Windows start on multiples of ``ALIGNMENT`` bytes. That is a whole number
+of hex dump rows (16 bytes) and of Base64 groups (3 bytes), so the Base64
+of a window is exactly the matching slice of the Base64 of the whole
+payload, and hex offsets line up with the full dump.
+"""
+
+import base64
+
+# Payloads up to this size are rendered whole
+INLINE_LIMIT = 4096
+# Bytes shown at each end of a large payload, and per browsed window
+PREVIEW_BYTES = 1536
+ALIGNMENT = 48
+VIEWS = ("base64", "hex", "text")
+
+
+def is_large(data):
+    """True if ``data`` is rendered as a preview rather than whole"""
+    return len(data) > INLINE_LIMIT
+
+
+def align(offset):
+    """Round ``offset`` down to the start of a window"""
+    return offset - offset % ALIGNMENT
+
+
+def head_tail(data, size=PREVIEW_BYTES):
+    """
+    First and last bytes of a payload, without copying the rest
+
+    Args:
+        data: Payload (bytes-like)
+        size: Bytes at each end, rounded down to ``ALIGNMENT``
+
+    Returns:
+        (head, tail offset, tail); the tail starts on a window boundary and
+        is empty when the head already covers the payload
+    """
+    size = max(align(size), ALIGNMENT)
+    view = memoryview(data)
+    head = bytes(view[:size])
+    if len(data) <= size:
+        return head, len(data), b''
+    tail_offset = max(align(len(data) - size + ALIGNMENT - 1), size)
+    return head, tail_offset, bytes(view[tail_offset:])
+
+
+def window(data, offset, size=PREVIEW_BYTES):
+    """
+    Bytes of the window containing ``offset``
+
+    Returns:
+        (window offset, window bytes)
+    """
+    start = align(min(max(offset, 0), max(len(data) - 1, 0)))
+    return start, bytes(memoryview(data)[start:start + size])
+
+
+def hex_dump(data, offset=0):
+    """Hex dump of ``data`` with 16 bytes per line, addresses starting at ``offset``"""
+    return "\n".join(f"{offset + i:08x}  {data[i:i + 16].hex(' ')}" for i in range(0, len(data), 16))
+
+
+def render(data, view, offset=0):
+    """
+    Render a window as "base64", "hex" or "text"
+
+    Args:
+        data: Window bytes (starting on a window boundary for Base64)
+        view: One of ``VIEWS``
+        offset: Position of the window in the payload, for hex addresses
+
+    Returns:
+        str
+    """
+    if view == "base64":
+        return base64.b64encode(data).decode()
+    if view == "hex":
+        return hex_dump(data, offset)
+    if view == "text":
+        return bytes(data).decode('utf-8', errors='replace')
+    raise ValueError(f"Unknown view {view!r}, expected one of {', '.join(VIEWS)}")
+
+
+def base64_text(data):
+    """Base64 of the whole payload, for downloads (only called when one is requested)"""
+    return base64.b64encode(data).decode()
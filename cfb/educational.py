@@ -0,0 +1,85 @@
+"""
+Step-by-step CFB reference implementation
+
+This is the straightforward loop the Simulation page was built on: one AES
+call per segment, a per-byte XOR and a feedback register rebuilt from
+slices. It is kept as the "educational" backend because it mirrors the
+equations on the Theory page line by line, and the Theory page displays
+this source directly; use the other backends for anything larger than a
+few kilobytes.
+"""
+
+from Crypto.Cipher import AES
+
+
+def cfb_encrypt(plaintext_bytes, key, iv, segment_size=16):
+    """
+    CFB mode encryption implementation
+
+    Args:
+        plaintext_bytes: Data to encrypt (bytes)
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        Encrypted ciphertext (bytes)
+    """
+    cipher = AES.new(key, AES.MODE_ECB)  # Use ECB for single block encryption
+    ciphertext = b''
+    feedback_register = iv
+
+    for i in range(0, len(plaintext_bytes), segment_size):
+        # Encrypt the feedback register
+        encrypted_feedback = cipher.encrypt(feedback_register)
+
+        # Get current plaintext segment
+        plaintext_segment = plaintext_bytes[i:i+segment_size]
+
+        # XOR plaintext with encrypted feedback
+        ciphertext_segment = bytes(a ^ b for a, b in zip(plaintext_segment, encrypted_feedback))
+        ciphertext += ciphertext_segment
+
+        # Shift the ciphertext segment into the feedback register
+        feedback_register = feedback_register[len(ciphertext_segment):] + ciphertext_segment
+
+        if len(feedback_register) < 16:
+            feedback_register += b'\x00' * (16 - len(feedback_register))
+
+    return ciphertext
+
+def cfb_decrypt(ciphertext_bytes, key, iv, segment_size=16):
+    """
+    CFB mode decryption implementation
+
+    Args:
+        ciphertext_bytes: Data to decrypt (bytes)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        Decrypted plaintext (bytes)
+    """
+    cipher = AES.new(key, AES.MODE_ECB)  # Same as encryption!
+    plaintext = b''
+    feedback_register = iv
+
+    for i in range(0, len(ciphertext_bytes), segment_size):
+        # Encrypt the feedback register (same as encryption)
+        encrypted_feedback = cipher.encrypt(feedback_register)
+
+        # Get current ciphertext segment
+        ciphertext_segment = ciphertext_bytes[i:i+segment_size]
+
+        # XOR ciphertext with encrypted feedback
+        plaintext_segment = bytes(a ^ b for a, b in zip(ciphertext_segment, encrypted_feedback))
+        plaintext += plaintext_segment
+
+        # Shift the received ciphertext segment into the feedback register
+        feedback_register = feedback_register[len(ciphertext_segment):] + ciphertext_segment
+
+        if len(feedback_register) < 16:
+            feedback_register += b'\x00' * (16 - len(feedback_register))
+
+    return plaintext
@@ -0,0 +1,168 @@
+"""
+Linear-time CFB engine
+
+The output is written into a preallocated bytearray, each segment is XORed
+with a single integer operation and the feedback register is a fixed
+16-byte value rebuilt from two slices per segment, so the cost of
+encrypting or decrypting grows linearly with the input size.
+
+Under ``cfb.instrument.profiling()`` a timed copy of the loop runs instead,
+which books every AES call, XOR and register update on its own phase.
+"""
+
+import time
+
+from cfb.instrument import current_profile
+
+BLOCK_SIZE = 16
+
+
+def new_ecb(key):
+    """
+    AES cipher object in ECB mode, used to encrypt single feedback registers
+
+    pycryptodome is imported here rather than at module level so that
+    importing the package stays cheap.
+    """
+    from Crypto.Cipher import AES
+
+    return AES.new(key, AES.MODE_ECB)
+
+
+def check_parameters(iv, segment_size):
+    """
+    Validate the IV and segment size shared by every CFB entry point
+
+    Args:
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (1 to 16)
+    """
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError(f"IV must be {BLOCK_SIZE} bytes long, got {len(iv)}")
+    if not 1 <= segment_size <= BLOCK_SIZE:
+        raise ValueError(f"Segment size must be between 1 and {BLOCK_SIZE} bytes, got {segment_size}")
+
+
+def cfb_process_into(source, target, cipher, iv, segment_size, decrypt):
+    """
+    Run the CFB feedback loop over ``source`` and write the result to ``target``
+
+    Args:
+        source: Input data (bytes-like, whole segments except possibly the last)
+        target: Writable buffer of the same length as ``source`` (may be ``source`` itself)
+        cipher: AES cipher object in ECB mode
+        iv: Initial content of the feedback register (16 bytes)
+        segment_size: Segment size in bytes
+        decrypt: True when ``source`` is ciphertext
+
+    Returns:
+        Feedback register after the last segment (16 bytes)
+    """
+    profile = current_profile()
+    if profile is not None:
+        return _process_into_profiled(source, target, cipher, iv, segment_size, decrypt, profile)
+    src = memoryview(source)
+    dst = memoryview(target)
+    encrypt_block = cipher.encrypt
+    from_bytes = int.from_bytes
+    # Keystream bytes used by a segment are the leading bytes of the AES output
+    shift = 8 * (BLOCK_SIZE - segment_size)
+    register = bytes(iv)
+    length = len(src)
+    full = length - length % segment_size
+
+    for i in range(0, full, segment_size):
+        # Copy the input segment first, ``target`` may be the same buffer as ``source``
+        input_segment = src[i:i + segment_size].tobytes()
+        value = from_bytes(input_segment, 'big') ^ (from_bytes(encrypt_block(register), 'big') >> shift)
+        output_segment = value.to_bytes(segment_size, 'big')
+        dst[i:i + segment_size] = output_segment
+        # The ciphertext segment is what gets fed back in both directions
+        register = register[segment_size:] + (input_segment if decrypt else output_segment)
+
+    if full < length:
+        # Trailing partial segment: use the leading bytes of the keystream
+        remaining = length - full
+        input_segment = src[full:].tobytes()
+        keystream = from_bytes(encrypt_block(register), 'big') >> (8 * (BLOCK_SIZE - remaining))
+        output_segment = (from_bytes(input_segment, 'big') ^ keystream).to_bytes(remaining, 'big')
+        dst[full:] = output_segment
+        register = register[remaining:] + (input_segment if decrypt else output_segment)
+
+    return register
+
+
+def _process_into_profiled(source, target, cipher, iv, segment_size, decrypt, profile):
+    """``cfb_process_into`` with every phase of every segment timed"""
+    src = memoryview(source)
+    dst = memoryview(target)
+    encrypt_block = cipher.encrypt
+    from_bytes = int.from_bytes
+    clock = time.perf_counter
+    register = bytes(iv)
+    length = len(src)
+    aes = xor = feedback = 0.0
+
+    for i in range(0, length, segment_size):
+        input_segment = src[i:i + segment_size].tobytes()
+        size = len(input_segment)
+        start = clock()
+        block = encrypt_block(register)
+        after_aes = clock()
+        value = from_bytes(input_segment, 'big') ^ (from_bytes(block, 'big') >> (8 * (BLOCK_SIZE - size)))
+        output_segment = value.to_bytes(size, 'big')
+        after_xor = clock()
+        dst[i:i + size] = output_segment
+        register = register[size:] + (input_segment if decrypt else output_segment)
+        after_feedback = clock()
+        aes += after_aes - start
+        xor += after_xor - after_aes
+        feedback += after_feedback - after_xor
+
+    segments = -(-length // segment_size)
+    profile.add("aes", aes, segments)
+    profile.add("xor", xor, segments)
+    profile.add("feedback", feedback, segments)
+    profile.count("aes_calls", segments)
+    profile.count("bytes", length)
+    return register
+
+
+def cfb_encrypt(plaintext_bytes, key, iv, segment_size=16):
+    """
+    CFB mode encryption implementation
+
+    Args:
+        plaintext_bytes: Data to encrypt (bytes)
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        Encrypted ciphertext (bytes)
+    """
+    check_parameters(iv, segment_size)
+    ciphertext = bytearray(len(plaintext_bytes))
+    cfb_process_into(plaintext_bytes, ciphertext, new_ecb(key),
+                     iv, segment_size, decrypt=False)
+    return bytes(ciphertext)
+
+
+def cfb_decrypt(ciphertext_bytes, key, iv, segment_size=16):
+    """
+    CFB mode decryption implementation
+
+    Args:
+        ciphertext_bytes: Data to decrypt (bytes)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        Decrypted plaintext (bytes)
+    """
+    check_parameters(iv, segment_size)
+    plaintext = bytearray(len(ciphertext_bytes))
+    cfb_process_into(ciphertext_bytes, plaintext, new_ecb(key),
+                     iv, segment_size, decrypt=True)
+    return bytes(plaintext)
@@ -0,0 +1,200 @@
+"""
+Error-propagation and self-synchronization experiments
+
+A message is encrypted once, then each trial corrupts its ciphertext with a
+single bit flip, dropped byte or inserted byte and decrypts it again. CFB
+decryption only looks at the 16 ciphertext bytes before each segment, so
+the effect of an error is confined to a short stretch after it: a trial
+only decrypts a window of ``WINDOW`` bytes starting at the segment that
+holds the error. All windows of a batch of trials are decrypted with a
+single AES-ECB call, and the result is compared with the original
+plaintext (shifted by one byte after a drop or an insertion).
+
+For each trial the engine reports the number of corrupted bytes and
+segments, whether decryption got back in sync before the end of the
+window, and the resync distance: bytes from the error to the first
+position after which every byte is correct again.
+"""
+
+import numpy as np
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.engine import BLOCK_SIZE, check_parameters, new_ecb
+
+ERROR_KINDS = ("bit_flip", "byte_drop", "byte_insert")
+ERROR_LABELS = {"bit_flip": "Bit flip", "byte_drop": "Byte dropped", "byte_insert": "Byte inserted"}
+# Ciphertext bytes decrypted per trial, far more than an error can garble once resynchronized
+WINDOW = 256
+# A trial has resynchronized when the end of its window decrypts correctly
+RESYNC_TAIL = 64
+# Trials decrypted per AES call (bounds the register array at about 64 MB in CFB-8)
+TRIAL_BATCH = 4096
+
+
+def expected_corrupted_segments(segment_size):
+    """
+    Average number of segments garbled by a single bit flip, from theory
+
+    The flipped bit corrupts its own segment and every later segment whose
+    feedback register still contains the flipped byte.
+    """
+    return 1 + np.mean([(offset + BLOCK_SIZE) // segment_size for offset in range(segment_size)])
+
+
+def _corrupt(stream, starts, offsets, kind, rng):
+    """
+    Build the corrupted ciphertext windows, each preceded by its 16-byte register
+
+    Args:
+        stream: IV || ciphertext (uint8 array)
+        starts: Start of each window in ciphertext coordinates (segment aligned)
+        offsets: Position of the error inside each window
+        kind: One of ``ERROR_KINDS``
+        rng: NumPy random generator
+
+    Returns:
+        uint8 array of shape (trials, 16 + WINDOW)
+    """
+    columns = np.arange(BLOCK_SIZE + WINDOW)
+    error_columns = (BLOCK_SIZE + offsets)[:, None]
+    source = np.broadcast_to(columns, (len(starts), len(columns)))
+    if kind == "byte_drop":
+        source = source + (source >= error_columns)
+    elif kind == "byte_insert":
+        source = source - (source > error_columns)
+    rows = stream[starts[:, None] + source]
+
+    trials = np.arange(len(starts))
+    error_at = BLOCK_SIZE + offsets
+    if kind == "bit_flip":
+        rows[trials, error_at] ^= (1 << rng.integers(0, 8, len(starts))).astype(np.uint8)
+    elif kind == "byte_insert":
+        rows[trials, error_at] = rng.integers(0, 256, len(starts), dtype=np.uint8)
+    return rows
+
+
+def _decrypt_windows(cipher, rows, segment_size):
+    """Decrypt every window at once; returns uint8 array (trials, whole segments in WINDOW)"""
+    segments = WINDOW // segment_size
+    registers = np.lib.stride_tricks.sliding_window_view(rows, BLOCK_SIZE, axis=1)[:, ::segment_size][:, :segments]
+    keystream = np.frombuffer(cipher.encrypt(np.ascontiguousarray(registers).tobytes()), dtype=np.uint8)
+    keystream = keystream.reshape(len(rows), segments, BLOCK_SIZE)[:, :, :segment_size]
+    return rows[:, BLOCK_SIZE:BLOCK_SIZE + segments * segment_size] ^ keystream.reshape(len(rows), -1)
+
+
+def run_trials(plaintext, key, iv, segment_size=16, kind="bit_flip", trials=1000, seed=None,
+               backend=DEFAULT_BACKEND):
+    """
+    Inject one error per trial into the ciphertext of ``plaintext`` and measure its effect
+
+    Args:
+        plaintext: Message to encrypt (bytes, at least WINDOW + 2 bytes long)
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        kind: "bit_flip", "byte_drop" or "byte_insert"
+        trials: Number of trials
+        seed: Seed of the random error positions (default: random)
+        backend: Backend used to encrypt the message (default: "native")
+
+    Returns:
+        Dictionary of NumPy arrays with one entry per trial: "position",
+        "corrupted_bytes", "corrupted_segments", "resynced" and "resync_distance"
+    """
+    check_parameters(iv, segment_size)
+    if kind not in ERROR_KINDS:
+        raise ValueError(f"Unknown error kind {kind!r}, expected one of {', '.join(ERROR_KINDS)}")
+    if len(plaintext) < WINDOW + 2:
+        raise ValueError(f"Message must be at least {WINDOW + 2} bytes long")
+
+    rng = np.random.default_rng(seed)
+    ciphertext = get_backend(backend).encrypt(plaintext, key, iv, segment_size)
+    stream = np.frombuffer(bytes(iv) + bytes(ciphertext), dtype=np.uint8)
+    message = np.frombuffer(bytes(plaintext), dtype=np.uint8)
+    cipher = new_ecb(key)
+
+    # Leave room for the window and the extra byte read after a drop
+    positions = rng.integers(0, len(plaintext) - WINDOW - 1, trials)
+    length = (WINDOW // segment_size) * segment_size
+    columns = np.arange(length)
+    corrupted_bytes = np.empty(trials, dtype=np.int64)
+    corrupted_segments = np.empty(trials, dtype=np.int64)
+    last_error = np.empty(trials, dtype=np.int64)
+
+    for first in range(0, trials, TRIAL_BATCH):
+        batch = positions[first:first + TRIAL_BATCH]
+        offsets = batch % segment_size
+        starts = batch - offsets
+        decrypted = _decrypt_windows(cipher, _corrupt(stream, starts, offsets, kind, rng), segment_size)
+
+        # Original plaintext position of every decrypted byte
+        reference = np.broadcast_to(columns, decrypted.shape)
+        if kind == "byte_drop":
+            reference = reference + (reference >= offsets[:, None])
+        elif kind == "byte_insert":
+            reference = reference - (reference > offsets[:, None])
+        mismatch = decrypted != message[starts[:, None] + reference]
+        if kind == "byte_insert":
+            # The inserted byte has no original, it is always an error
+            mismatch[np.arange(len(batch)), offsets] = True
+
+        stop = first + len(batch)
+        corrupted_bytes[first:stop] = mismatch.sum(axis=1)
+        corrupted_segments[first:stop] = mismatch.reshape(len(batch), -1, segment_size).any(axis=2).sum(axis=1)
+        last_error[first:stop] = np.where(mismatch.any(axis=1), length - 1 - mismatch[:, ::-1].argmax(axis=1), -1)
+
+    offsets = positions % segment_size
+    return {
+        "position": positions,
+        "corrupted_bytes": corrupted_bytes,
+        "corrupted_segments": corrupted_segments,
+        "resynced": last_error < length - RESYNC_TAIL,
+        "resync_distance": np.maximum(last_error + 1 - offsets, 0),
+    }
+
+
+def summarize(segment_size, kind, result):
+    """One summary row of a ``run_trials`` result"""
+    resynced = result["resynced"]
+    distance = result["resync_distance"][resynced]
+    return {
+        "segment_size": segment_size,
+        "kind": kind,
+        "trials": len(resynced),
+        "mean_corrupted_bytes": float(result["corrupted_bytes"].mean()),
+        "mean_corrupted_segments": float(result["corrupted_segments"].mean()),
+        "expected_corrupted_segments": float(expected_corrupted_segments(segment_size)) if kind == "bit_flip" else None,
+        "resync_rate": float(resynced.mean()),
+        "mean_resync_distance": float(distance.mean()) if len(distance) else None,
+        "max_resync_distance": int(distance.max()) if len(distance) else None,
+    }
+
+
+def run_sweep(plaintext, key, iv, segment_sizes=(1, 2, 4, 8, 16), kinds=ERROR_KINDS, trials=10000, seed=None,
+              backend=DEFAULT_BACKEND, progress=None):
+    """
+    Run ``trials`` trials for every combination of segment size and error kind
+
+    Args:
+        plaintext: Message to encrypt (bytes)
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_sizes: Segment sizes in bytes
+        kinds: Error kinds (see ``ERROR_KINDS``)
+        trials: Trials per combination
+        seed: Seed of the random error positions (default: random)
+        backend: Backend used to encrypt the message (default: "native")
+        progress: Optional callable receiving (combinations done, total combinations)
+
+    Returns:
+        List of summary rows (see ``summarize``)
+    """
+    rng = np.random.default_rng(seed)
+    combinations = [(segment_size, kind) for segment_size in segment_sizes for kind in kinds]
+    rows = []
+    for done, (segment_size, kind) in enumerate(combinations, 1):
+        result = run_trials(plaintext, key, iv, segment_size, kind, trials, rng, backend)
+        rows.append(summarize(segment_size, kind, result))
+        if progress:
+            progress(done, len(combinations))
+    return rows
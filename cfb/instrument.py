@@ -0,0 +1,270 @@
+"""
+Opt-in timing of the CFB hot paths
+
+Code that wants to know where the time goes runs under ``profiling()``::
+
+    with profiling() as profile:
+        ciphertext = get_backend("vectorized").encrypt(data, key, iv, 1)
+    print(profile.to_json())
+
+While a profile is active the engines record the time spent in each
+phase (AES block calls, XOR, feedback-register updates) and count the AES
+calls and bytes they process; the pages add Base64 encoding and file I/O.
+Backends that do all three in C (pycryptodome's ``MODE_CFB``, the
+educational loop shown on the Theory page) are timed as a single
+"cipher" phase.
+
+When no profile is active the only cost is one ``ContextVar.get()`` per
+engine call (not per segment): the hot loops themselves are untouched and
+a separate, timed copy of the loop runs instead when profiling. Timing
+every segment adds clock reads to the loop, so a profiled run is slower
+than a normal one; the split between phases is what matters.
+
+The active profile is held in a context variable, so every Streamlit
+session (each runs in its own thread) profiles only its own work. Thread
+pools inside the engines receive the profile explicitly.
+"""
+
+import contextlib
+import contextvars
+import json
+import threading
+import time
+
+PHASES = ("aes", "xor", "feedback", "cipher", "compress", "base64", "upload", "read", "write", "download")
+PHASE_LABELS = {
+    "aes": "AES block calls",
+    "xor": "XOR with the keystream",
+    "feedback": "Feedback-register updates",
+    "cipher": "Cipher (AES, XOR and feedback in one call)",
+    "compress": "Compression/decompression",
+    "base64": "Base64 encoding/decoding",
+    "upload": "Upload I/O",
+    "read": "Read I/O",
+    "write": "Write I/O",
+    "download": "Download I/O",
+}
+# Phases that are encryption work, the others are encoding and I/O
+CIPHER_PHASES = ("aes", "xor", "feedback", "cipher")
+COUNTER_HELP = {
+    "aes_calls": "AES block encryptions",
+    "bytes": "Bytes encrypted or decrypted",
+}
+
+_current = contextvars.ContextVar("cfb_profile", default=None)
+
+
+def current_profile():
+    """Profile of the enclosing ``profiling()`` block, or None when profiling is off"""
+    return _current.get()
+
+
+class Profile:
+    """
+    Time per phase and counters collected while profiling
+
+    Attributes:
+        seconds: Time spent per phase (dict of floats)
+        calls: Number of timed sections per phase (dict of ints)
+        counters: "aes_calls" and "bytes" processed by the cipher (dict of ints)
+        elapsed: Wall-clock time of the ``profiling()`` block, None while it runs
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self.elapsed = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Profiles travel back from worker processes, the lock stays behind
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds, calls=1):
+        """Book ``seconds`` of work on ``phase``"""
+        with self._lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + calls
+
+    def count(self, counter, amount=1):
+        """Increase a counter such as "aes_calls" or "bytes" """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def phase(self, name):
+        """Context manager timing the enclosed block as phase ``name``"""
+        return _Timer(self, name)
+
+    def merge(self, other):
+        """Add the phases and counters of another profile (e.g. from a worker process)"""
+        for phase, seconds in other.seconds.items():
+            self.add(phase, seconds, other.calls.get(phase, 0))
+        for counter, amount in other.counters.items():
+            self.count(counter, amount)
+        if other.elapsed is not None:
+            self.elapsed = (self.elapsed or 0.0) + other.elapsed
+
+    def report(self):
+        """
+        Summary of the profile as plain data (JSON serializable)
+
+        Returns:
+            Dictionary with "phases" (seconds, calls and share of the total per
+            phase, in ``PHASES`` order), "counters", "total_seconds",
+            "cipher_seconds", "elapsed_seconds" and "throughput_mb_s" (bytes
+            processed per second of cipher work, None if nothing was timed)
+        """
+        total = sum(self.seconds.values())
+        cipher = sum(self.seconds.get(phase, 0.0) for phase in CIPHER_PHASES)
+        ordered = [phase for phase in PHASES if phase in self.seconds]
+        ordered += sorted(set(self.seconds) - set(PHASES))
+        processed = self.counters.get("bytes", 0)
+        return {
+            "phases": {
+                phase: {
+                    "seconds": self.seconds[phase],
+                    "calls": self.calls.get(phase, 0),
+                    "share": self.seconds[phase] / total if total else 0.0,
+                }
+                for phase in ordered
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "total_seconds": total,
+            "cipher_seconds": cipher,
+            "elapsed_seconds": self.elapsed,
+            "throughput_mb_s": processed / cipher / (1024 * 1024) if cipher else None,
+        }
+
+    def to_json(self, indent=2):
+        """The ``report()`` as a JSON document"""
+        return json.dumps(self.report(), indent=indent)
+
+    def to_prometheus(self, prefix="cfb", labels=None):
+        """
+        The profile in the Prometheus text exposition format
+
+        Args:
+            prefix: Prefix of the metric names (default: "cfb")
+            labels: Optional dict of extra labels added to every sample
+
+        Returns:
+            str
+        """
+        extra = "".join(f',{name}="{_escape(value)}"' for name, value in (labels or {}).items())
+        plain = f"{{{extra[1:]}}}" if extra else ""
+        report = self.report()
+        lines = [
+            f"# HELP {prefix}_phase_seconds_total Time spent per phase of CFB processing",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{phase}"{extra}}} {entry["seconds"]:.9f}'
+                  for phase, entry in report["phases"].items()]
+        lines += [
+            f"# HELP {prefix}_phase_calls_total Timed sections per phase of CFB processing",
+            f"# TYPE {prefix}_phase_calls_total counter",
+        ]
+        lines += [f'{prefix}_phase_calls_total{{phase="{phase}"{extra}}} {entry["calls"]}'
+                  for phase, entry in report["phases"].items()]
+        for counter, amount in report["counters"].items():
+            lines += [
+                f"# HELP {prefix}_{counter}_total {COUNTER_HELP.get(counter, counter)}",
+                f"# TYPE {prefix}_{counter}_total counter",
+                f"{prefix}_{counter}_total{plain} {amount}",
+            ]
+        if report["throughput_mb_s"] is not None:
+            lines += [
+                f"# HELP {prefix}_throughput_mb_per_second Bytes processed per second of cipher work, in MB/s",
+                f"# TYPE {prefix}_throughput_mb_per_second gauge",
+                f"{prefix}_throughput_mb_per_second{plain} {report['throughput_mb_s']:.6f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Timer:
+    """Times a block and books it on a phase of a profile (nothing happens without one)"""
+
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.add(self.name, time.perf_counter() - self.start)
+
+
+def timed(phase, profile=None):
+    """
+    Context manager timing the enclosed block as ``phase``
+
+    Args:
+        phase: Phase name (see ``PHASES``)
+        profile: Profile to book the time on (default: the active one)
+
+    Does nothing beyond two clock reads when there is no profile, so it can
+    wrap calls such as Base64 encoding unconditionally.
+    """
+    return _Timer(profile if profile is not None else _current.get(), phase)
+
+
+def run_timed(function, data, *args, segments):
+    """
+    Call ``function(data, *args)``, booked as one "cipher" phase when profiling
+
+    For implementations whose AES calls, XOR and feedback cannot be timed
+    separately (C code, the educational loop).
+
+    Args:
+        function: CFB function taking the data first
+        data: Input data (bytes-like)
+        *args: Remaining arguments of ``function``
+        segments: AES calls the operation makes
+
+    Returns:
+        Result of ``function``
+    """
+    profile = _current.get()
+    if profile is None:
+        return function(data, *args)
+    with profile.phase("cipher"):
+        result = function(data, *args)
+    profile.count("aes_calls", segments)
+    profile.count("bytes", len(data))
+    return result
+
+
+@contextlib.contextmanager
+def profiling(profile=None):
+    """
+    Turn profiling on for the enclosed block
+
+    Args:
+        profile: Profile to add to (default: a new one)
+
+    Yields:
+        The active Profile
+    """
+    profile = profile if profile is not None else Profile()
+    token = _current.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.elapsed = (profile.elapsed or 0.0) + time.perf_counter() - start
+        _current.reset(token)
@@ -0,0 +1,485 @@
+"""
+Background job queue for file encryption and decryption
+
+``JobManager`` runs file operations in a shared, bounded pool of worker
+processes so that a large file neither blocks the Streamlit session that
+submitted it nor holds the GIL of the server. Inputs and results live in
+a spool directory on disk: the caller copies the upload there, the
+worker streams it into the result file, and the page polls the job for
+progress (how far the worker has read its input, recorded in a small
+file next to the result) and offers the result for download when it is
+done. Encryption can compress the data first (see ``cfb.compress``);
+decryption undoes it when the container header says so, or for raw files
+when the job is submitted with ``decompress=True``.
+
+A running job is cancelled through a marker file next to its result: the
+worker checks for it before every chunk it reads. Raw-format encryptions
+save checkpoints as they go (see ``cfb.checkpoint``), so when one is
+cancelled or its worker dies, ``JobManager.resume`` continues it from the
+last checkpoint instead of starting over. Jobs submitted with
+``profile=True`` also time the upload, the worker's reads and writes and
+the cipher work (see ``cfb.instrument``). Each session may only
+have a few jobs queued or running at once, and the whole queue is
+bounded, so one user cannot starve the others.
+"""
+
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cfb.checkpoint import checkpoint_path, encrypt_file_resumable, load_checkpoint
+from cfb.compress import PREFIX_SIZE, CompressingReader, DecompressingWriter, available_methods, container_compressed
+from cfb.instrument import Profile, profiling, timed
+from cfb.stream import CHUNK_SIZE
+
+FORMATS = ("raw", "authenticated", "chunked")
+# Jobs a single session may have queued or running at the same time
+MAX_JOBS_PER_SESSION = 2
+# Jobs queued or running across all sessions
+MAX_PENDING_JOBS = 32
+# Finished jobs and their files are removed after this many seconds
+JOB_TTL = 3600
+# Input bytes encrypted between two checkpoints of a resumable job
+JOB_CHECKPOINT_INTERVAL = 8 * 1024 * 1024
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+
+class JobLimitError(ValueError):
+    """Raised when a session or the whole queue has too many pending jobs"""
+
+
+class _CancellableReader:
+    """
+    File wrapper that stops the job once its cancel marker exists
+
+    After every read it records its position in the progress file, and it
+    times the reads when profiling.
+    """
+
+    def __init__(self, handle, cancel_path, progress_path):
+        self.handle = handle
+        self.cancel_path = cancel_path
+        self.progress_path = progress_path
+
+    def read(self, size=-1):
+        if os.path.exists(self.cancel_path):
+            raise JobCancelled()
+        with timed("read"):
+            data = self.handle.read(size)
+        _write_progress(self.progress_path, self.handle.tell())
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+def _write_progress(progress_path, done):
+    with open(progress_path, 'w') as marker:
+        marker.write(str(done))
+
+
+class _TimedWriter:
+    """File wrapper timing writes when profiling"""
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def write(self, data):
+        with timed("write"):
+            return self.handle.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+def _compression_stats(stage, elapsed):
+    """
+    Sizes of a compression stage and the time it saved the job
+
+    The rest of the job (cipher work and I/O) ran over the compressed bytes;
+    without compression it would have processed the original bytes at the
+    same rate. The estimate is negative when compressing cost more time
+    than it saved.
+    """
+    if stage.method is None:
+        return None
+    encrypting = isinstance(stage, CompressingReader)
+    original, packed = (stage.bytes_in, stage.bytes_out) if encrypting else (stage.bytes_out, stage.bytes_in)
+    rest = max(elapsed - stage.seconds, 0.0)
+    return {
+        "method": stage.method,
+        "original": original,
+        "compressed": packed,
+        "seconds": stage.seconds,
+        "saved_seconds": (original - packed) * rest / packed - stage.seconds if packed else 0.0,
+    }
+
+
+def _run_job(operation, file_format, compression, source_path, target_path, key, iv, segment_size, profile=False,
+             workers=1):
+    """
+    Encrypt or decrypt ``source_path`` into ``target_path`` (runs in a worker process)
+
+    Args:
+        compression: Compression method tried before encrypting, or None; for decryption, True if the
+            plaintext of a raw file is compressed (containers record it in their header)
+        workers: Processes the chunks of a chunked container are spread over
+
+    Returns:
+        (size of the result, Profile of the work or None, compression stats or None)
+    """
+    if profile:
+        with profiling() as job_profile:
+            size, _, stats = _run_job(operation, file_format, compression, source_path, target_path, key, iv,
+                                      segment_size, workers=workers)
+        return size, job_profile, stats
+
+    from cfb.auth import decrypt_stream_authenticated, encrypt_stream_authenticated, is_authenticated
+    from cfb.container import decrypt_stream_chunked, encrypt_stream_chunked, is_chunked
+    from cfb.stream import decrypt_stream, encrypt_stream, spooled_output
+
+    started = time.perf_counter()
+    stage = None
+    try:
+        if operation == "encrypt" and file_format == "raw" and not compression:
+            return _run_resumable(source_path, target_path, key, iv, segment_size), None, None
+        with open(source_path, 'rb') as handle, open(target_path, 'w+b') as output:
+            source = _CancellableReader(handle, f"{target_path}.cancel", f"{target_path}.progress")
+            target = _TimedWriter(output)
+            if operation == "encrypt":
+                if compression:
+                    source = stage = CompressingReader(source, compression)
+                    if file_format == "chunked":
+                        # The container needs the size up front: compress into a spooled file first
+                        source = spooled_output()
+                        shutil.copyfileobj(stage, source, CHUNK_SIZE)
+                        source.seek(0)
+                compressed = bool(compression)
+                if file_format == "authenticated":
+                    encrypt_stream_authenticated(source, target, key, iv, segment_size, CHUNK_SIZE,
+                                                 compressed=compressed)
+                elif file_format == "chunked":
+                    encrypt_stream_chunked(source, target, key, iv, segment_size, workers=workers,
+                                           compressed=compressed)
+                else:
+                    encrypt_stream(source, target, key, iv, segment_size, CHUNK_SIZE)
+            else:
+                prefix = handle.read(PREFIX_SIZE)
+                handle.seek(0)
+                compressed = container_compressed(prefix)
+                if compressed or (compressed is None and compression):
+                    target = stage = DecompressingWriter(target)
+                if is_authenticated(prefix):
+                    # Compressed plaintext is only expanded once the tag has been checked
+                    decrypt_stream_authenticated(source, target, key, CHUNK_SIZE, verify_first=bool(stage))
+                elif is_chunked(prefix):
+                    decrypt_stream_chunked(source, target, key, workers=workers)
+                else:
+                    decrypt_stream(source, target, key, iv, segment_size, CHUNK_SIZE)
+                if stage:
+                    stage.finish()
+            stats = _compression_stats(stage, time.perf_counter() - started) if stage else None
+            return output.tell(), None, stats
+    except BaseException:
+        # Never leave a partial (or unverified) result behind, unless a checkpoint lets the job resume
+        if os.path.exists(target_path) and not os.path.exists(checkpoint_path(target_path)):
+            os.remove(target_path)
+        raise
+
+
+def _run_resumable(source_path, target_path, key, iv, segment_size):
+    """Checkpointed encryption, continuing from the checkpoint of an earlier attempt if there is one"""
+    cancel_path = f"{target_path}.cancel"
+    progress_path = f"{target_path}.progress"
+
+    def report(done, total):
+        if os.path.exists(cancel_path):
+            raise JobCancelled()
+        _write_progress(progress_path, done)
+
+    return encrypt_file_resumable(source_path, target_path, key, iv, segment_size, JOB_CHECKPOINT_INTERVAL,
+                                  progress=report)
+
+
+class Job:
+    """
+    One file operation submitted to a ``JobManager``
+
+    Attributes:
+        id: Job identifier (str)
+        session_id: Session that submitted the job
+        name: File name of the result
+        operation: "encrypt" or "decrypt"
+        size: Size of the input in bytes
+        created: Submission time (time.time())
+        finished: Completion time, or None
+        profile: Profile with the timings of the job (``profile=True`` only), or None
+    """
+
+    def __init__(self, job_id, session_id, name, operation, size, source_path, target_path, future, profile=None):
+        self.id = job_id
+        self.session_id = session_id
+        self.name = name
+        self.operation = operation
+        self.size = size
+        self.source_path = source_path
+        self.target_path = target_path
+        self.cancel_path = f"{target_path}.cancel"
+        self.progress_path = f"{target_path}.progress"
+        self.created = time.time()
+        self.profile = profile
+        self._watch(future)
+
+    def _watch(self, future):
+        self.future = future
+        self.finished = None
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        if self.profile is not None and not future.cancelled() and not future.exception():
+            self.profile.merge(future.result()[1])
+        self.finished = time.time()
+
+    @property
+    def status(self):
+        """One of "queued", "running", "cancelling", "done", "failed" and "cancelled" """
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.done():
+            error = self.future.exception()
+            if isinstance(error, JobCancelled):
+                return "cancelled"
+            return "failed" if error else "done"
+        if os.path.exists(self.cancel_path):
+            return "cancelling"
+        return "running" if self.future.running() else "queued"
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running", "cancelling")
+
+    @property
+    def error(self):
+        """Error message of a failed job, or None"""
+        if self.status != "failed":
+            return None
+        return str(self.future.exception()) or type(self.future.exception()).__name__
+
+    def progress(self):
+        """Fraction of the work done (0.0 to 1.0), from how far the worker has read its input"""
+        if self.status == "done":
+            return 1.0
+        try:
+            with open(self.progress_path) as marker:
+                done = int(marker.read())
+        except (OSError, ValueError):
+            return 0.0
+        return min(done / self.size, 1.0) if self.size else 0.0
+
+    @property
+    def resumable(self):
+        """True if the job was cancelled or failed after saving a checkpoint (see ``JobManager.resume``)"""
+        return self.status in ("cancelled", "failed") and os.path.exists(checkpoint_path(self.target_path))
+
+    @property
+    def checkpoint(self):
+        """Last checkpoint of a resumable job, or None"""
+        return load_checkpoint(self.target_path) if self.resumable else None
+
+    @property
+    def result_path(self):
+        """Path of the result file of a finished job, or None"""
+        return self.target_path if self.status == "done" else None
+
+    @property
+    def result_size(self):
+        return self.future.result()[0] if self.status == "done" else None
+
+    @property
+    def compression(self):
+        """
+        Compression stats of a finished job, or None if it did not (de)compress
+
+        Dictionary with "method", "original" and "compressed" sizes, "seconds"
+        spent (de)compressing and the estimated "saved_seconds"
+        """
+        return self.future.result()[2] if self.status == "done" else None
+
+
+class JobManager:
+    """
+    Shared, bounded pool of worker processes with a job queue
+
+    Args:
+        max_workers: Worker processes (default: CPU count)
+        max_jobs_per_session: Jobs one session may have queued or running (default: 2)
+        max_pending_jobs: Jobs queued or running across all sessions (default: 32)
+        spool_dir: Directory for inputs and results (default: a new temporary directory)
+        chunk_workers: Processes each chunked job spreads its chunks over (default: the CPUs left per
+            worker, at least 1)
+    """
+
+    def __init__(self, max_workers=None, max_jobs_per_session=MAX_JOBS_PER_SESSION,
+                 max_pending_jobs=MAX_PENDING_JOBS, spool_dir=None, chunk_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # With every worker busy on a chunked job, the machine still has one process per CPU
+        self.chunk_workers = chunk_workers or max((os.cpu_count() or 1) // self.max_workers, 1)
+        self.max_jobs_per_session = max_jobs_per_session
+        self.max_pending_jobs = max_pending_jobs
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="cfb-jobs-")
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        # Workers are spawned rather than forked: the Streamlit server is multi-threaded
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, session_id, operation, source, name, key, iv, segment_size=16, file_format="raw",
+               compression=None, decompress=False, profile=False):
+        """
+        Queue a file operation
+
+        Args:
+            session_id: Identifier of the submitting session
+            operation: "encrypt" or "decrypt"
+            source: Readable binary file object with the input (copied to the spool directory)
+            name: File name for the result
+            key: 256-bit key (32 bytes)
+            iv: Initialization vector (16 bytes)
+            segment_size: Segment size in bytes (default: 16)
+            file_format: "raw", "authenticated" or "chunked" (encryption only; decryption detects it)
+            compression: "zlib", "lzma" or "zstd" to compress before encrypting, or None
+            decompress: Decryption of a raw file only: its plaintext was compressed (authenticated and
+                chunked files record it in their header)
+            profile: Time the upload, I/O and cipher work of the job (see ``Job.profile``)
+
+        Returns:
+            Job
+
+        Raises:
+            JobLimitError: The session or the queue already has too many pending jobs
+        """
+        if operation not in ("encrypt", "decrypt"):
+            raise ValueError(f"Unknown operation {operation!r}")
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown format {file_format!r}, expected one of {', '.join(FORMATS)}")
+        if compression and compression not in available_methods():
+            raise ValueError(f"Compression {compression!r} is not available, use one of "
+                             f"{', '.join(available_methods())}")
+        self.prune()
+
+        with self._lock:
+            self._check_limits(session_id)
+            job_id = str(next(self._ids))
+
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir)
+        source_path = os.path.join(job_dir, "input")
+        target_path = os.path.join(job_dir, "output")
+        job_profile = Profile() if profile else None
+        with timed("upload", job_profile), open(source_path, 'wb') as handle:
+            shutil.copyfileobj(source, handle, CHUNK_SIZE)
+        size = os.path.getsize(source_path)
+
+        if operation == "decrypt":
+            compression = decompress
+        future = self._submit(operation, file_format, compression, source_path, target_path, key, iv, segment_size,
+                              profile, self.chunk_workers)
+        job = Job(job_id, session_id, name, operation, size, source_path, target_path, future, job_profile)
+        with self._lock:
+            self.jobs[job_id] = job
+        return job
+
+    def _check_limits(self, session_id):
+        """Raise JobLimitError if another job may not be queued (call with the lock held)"""
+        pending = [job for job in self.jobs.values() if job.active]
+        if sum(job.session_id == session_id for job in pending) >= self.max_jobs_per_session:
+            raise JobLimitError(f"At most {self.max_jobs_per_session} jobs per session can run at once")
+        if len(pending) >= self.max_pending_jobs:
+            raise JobLimitError("The server is busy, please try again in a moment")
+
+    def _submit(self, *arguments):
+        try:
+            return self.pool.submit(_run_job, *arguments)
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory): start a new pool, checkpointed jobs can be resumed
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            return self.pool.submit(_run_job, *arguments)
+
+    def resume(self, job_id, key, iv, segment_size=16):
+        """
+        Continue a cancelled or failed job from its last checkpoint
+
+        The key, IV and segment size must be those the job was submitted
+        with; the checkpoint records a fingerprint of them and the job fails
+        again if they differ.
+
+        Raises:
+            ValueError: The job does not exist or has no checkpoint
+            JobLimitError: The session or the queue already has too many pending jobs
+        """
+        job = self.jobs.get(job_id)
+        if job is None or not job.resumable:
+            raise ValueError("This job cannot be resumed")
+        with self._lock:
+            self._check_limits(job.session_id)
+        if os.path.exists(job.cancel_path):
+            os.remove(job.cancel_path)
+        job._watch(self._submit(job.operation, "raw", None, job.source_path, job.target_path, key, iv, segment_size,
+                                job.profile is not None))
+
+    def session_jobs(self, session_id):
+        """Jobs of one session, oldest first"""
+        with self._lock:
+            return [job for job in self.jobs.values() if job.session_id == session_id]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job"""
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return
+        if not job.future.cancel():
+            # Already running: the worker stops before its next chunk
+            open(job.cancel_path, 'w').close()
+
+    def remove(self, job_id):
+        """Cancel a job if needed and delete its files"""
+        self.cancel(job_id)
+        with self._lock:
+            job = self.jobs.pop(job_id, None)
+        if job is not None and not job.active:
+            shutil.rmtree(os.path.dirname(job.target_path), ignore_errors=True)
+        elif job is not None:
+            job.future.add_done_callback(
+                lambda future: shutil.rmtree(os.path.dirname(job.target_path), ignore_errors=True))
+
+    def prune(self, max_age=JOB_TTL):
+        """Remove finished jobs older than ``max_age`` seconds"""
+        now = time.time()
+        for job in list(self.jobs.values()):
+            if job.finished and now - job.finished > max_age:
+                self.remove(job.id)
+
+    def shutdown(self):
+        """Stop the workers and delete the spool directory"""
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
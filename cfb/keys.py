@@ -0,0 +1,18 @@
+"""
+Key and IV generation
+"""
+
+import secrets
+
+KEY_SIZE = 32
+IV_SIZE = 16
+
+
+def generate_key():
+    """Generate a random 256-bit AES key"""
+    return secrets.token_bytes(KEY_SIZE)
+
+
+def generate_iv():
+    """Generate a random 128-bit IV"""
+    return secrets.token_bytes(IV_SIZE)
@@ -0,0 +1,126 @@
+"""
+Batched and multi-threaded CFB decryption
+
+During decryption the input to the block cipher for segment ``i`` is made
+of ciphertext that is already known, so every feedback register can be
+built up front and the whole keystream produced by one AES-ECB call per
+chunk. Chunks are independent and are spread over a thread pool for large
+inputs (AES and NumPy both release the GIL while they work).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cfb.engine import BLOCK_SIZE, check_parameters, new_ecb
+from cfb.instrument import current_profile
+
+# Keep the feedback registers of one chunk around 4 MB regardless of segment size
+CHUNK_REGISTER_BYTES = 4 * 1024 * 1024
+# Below this size the thread pool costs more than it saves
+PARALLEL_THRESHOLD = 1024 * 1024
+
+
+def _feedback_stream(ciphertext, iv, start, stop):
+    """Return bytes ``start:stop`` of the sequence IV || ciphertext"""
+    if start >= BLOCK_SIZE:
+        return ciphertext[start - BLOCK_SIZE:stop - BLOCK_SIZE]
+    return bytes(iv[start:]) + bytes(ciphertext[:stop - BLOCK_SIZE])
+
+
+def feedback_registers(ciphertext, iv, segment_size, first, last):
+    """
+    Build the feedback registers for segments ``first`` to ``last - 1``
+
+    Args:
+        ciphertext: Complete ciphertext (bytes-like)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes
+        first: Index of the first segment
+        last: Index one past the last segment
+
+    Returns:
+        Concatenated 16-byte registers (bytes)
+    """
+    start = first * segment_size
+    stop = (last - 1) * segment_size + BLOCK_SIZE
+    window = _feedback_stream(ciphertext, iv, start, stop)
+    if segment_size == BLOCK_SIZE:
+        return bytes(window)
+    # Overlapping 16-byte windows that advance by one segment each
+    windows = np.lib.stride_tricks.sliding_window_view(np.frombuffer(window, dtype=np.uint8), BLOCK_SIZE)
+    return windows[::segment_size].tobytes()
+
+
+def _decrypt_segments(ciphertext, plaintext, key, iv, segment_size, first, last, profile=None):
+    """Decrypt segments ``first`` to ``last - 1`` into ``plaintext``, timing each phase into ``profile``"""
+    clock = time.perf_counter
+    start_time = clock()
+    registers = feedback_registers(ciphertext, iv, segment_size, first, last)
+    after_feedback = clock()
+    keystream = np.frombuffer(new_ecb(key).encrypt(registers), dtype=np.uint8)
+    after_aes = clock()
+    keystream = keystream.reshape(-1, BLOCK_SIZE)[:, :segment_size].reshape(-1)
+
+    start = first * segment_size
+    stop = min(last * segment_size, len(ciphertext))
+    source = np.frombuffer(ciphertext, dtype=np.uint8, count=stop - start, offset=start)
+    target = np.frombuffer(plaintext, dtype=np.uint8, count=stop - start, offset=start)
+    np.bitwise_xor(source, keystream[:stop - start], out=target)
+
+    if profile is not None:
+        profile.add("feedback", after_feedback - start_time)
+        profile.add("aes", after_aes - after_feedback)
+        profile.add("xor", clock() - after_aes)
+        profile.count("aes_calls", last - first)
+        profile.count("bytes", stop - start)
+
+
+def cfb_decrypt_parallel(ciphertext_bytes, key, iv, segment_size=16, workers=None):
+    """
+    CFB mode decryption with batched AES calls and a thread pool
+
+    Produces exactly the same output as ``cfb_decrypt``.
+
+    Args:
+        ciphertext_bytes: Data to decrypt (bytes)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        workers: Number of threads (default: CPU count, 1 for small inputs)
+
+    Returns:
+        Decrypted plaintext (bytes)
+    """
+    check_parameters(iv, segment_size)
+    length = len(ciphertext_bytes)
+    plaintext = bytearray(length)
+    if not length:
+        return b''
+
+    segments = (length + segment_size - 1) // segment_size
+    per_chunk = max(1, CHUNK_REGISTER_BYTES // BLOCK_SIZE)
+    bounds = [(first, min(first + per_chunk, segments)) for first in range(0, segments, per_chunk)]
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if length >= PARALLEL_THRESHOLD else 1
+    workers = min(workers, len(bounds))
+    # Pool threads do not inherit the context, the profile is handed over explicitly
+    profile = current_profile()
+
+    if workers <= 1:
+        for first, last in bounds:
+            _decrypt_segments(ciphertext_bytes, plaintext, key, iv, segment_size, first, last, profile)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_decrypt_segments, ciphertext_bytes, plaintext, key, iv, segment_size, first, last,
+                            profile)
+                for first, last in bounds
+            ]
+            for future in futures:
+                future.result()
+
+    return bytes(plaintext)
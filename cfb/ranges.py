@@ -0,0 +1,121 @@
+"""
+Random-access CFB decryption
+
+The feedback register for segment ``k`` is made of the 16 bytes of IV ||
+ciphertext that precede it, so any byte range can be decrypted by starting
+at the segment containing its first byte, without touching the rest of
+the ciphertext. ``MappedCiphertext`` applies this to files on disk through
+a read-only memory map, so only the pages that are needed are read.
+"""
+
+import mmap
+import os
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.engine import BLOCK_SIZE, check_parameters
+
+
+def register_at(ciphertext, iv, segment_index, segment_size=16):
+    """
+    Feedback register used to decrypt a given segment
+
+    Args:
+        ciphertext: Complete ciphertext (bytes-like)
+        iv: Initialization vector (16 bytes)
+        segment_index: Index of the segment
+        segment_size: Segment size in bytes (default: 16)
+
+    Returns:
+        Feedback register (16 bytes)
+    """
+    end = segment_index * segment_size
+    if end >= BLOCK_SIZE:
+        return bytes(ciphertext[end - BLOCK_SIZE:end])
+    return bytes(iv[end:]) + bytes(ciphertext[:end])
+
+
+def decrypt_range(ciphertext, offset, length, key, iv, segment_size=16, backend=DEFAULT_BACKEND):
+    """
+    Decrypt ``length`` bytes of ``ciphertext`` starting at ``offset``
+
+    Args:
+        ciphertext: Complete ciphertext (bytes-like, e.g. bytes or mmap)
+        offset: Position of the first byte to decrypt
+        length: Number of bytes to decrypt (clipped at the end of the ciphertext)
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Decrypted plaintext of the requested range (bytes)
+    """
+    check_parameters(iv, segment_size)
+    if offset < 0 or length < 0:
+        raise ValueError("Offset and length must not be negative")
+
+    stop = min(offset + length, len(ciphertext))
+    if offset >= stop:
+        return b''
+
+    # Start at the segment containing ``offset`` and stop at the end of the segment containing ``stop - 1``
+    first_segment = offset // segment_size
+    start = first_segment * segment_size
+    end = min(-(-stop // segment_size) * segment_size, len(ciphertext))
+    register = register_at(ciphertext, iv, first_segment, segment_size)
+
+    plaintext = get_backend(backend).decrypt(bytes(ciphertext[start:end]), key, register, segment_size)
+    return bytes(plaintext[offset - start:stop - start])
+
+
+class MappedCiphertext:
+    """
+    Read-only, memory-mapped view of an encrypted file
+
+    Args:
+        path: Path of the encrypted file
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+    """
+
+    def __init__(self, path, key, iv, segment_size=16, backend=DEFAULT_BACKEND):
+        check_parameters(iv, segment_size)
+        self.key = key
+        self.iv = iv
+        self.segment_size = segment_size
+        self.backend = backend
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        try:
+            # Zero-length files cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        except Exception:
+            self._file.close()
+            raise
+
+    def read_range(self, offset, length):
+        """
+        Decrypt a byte range of the file
+
+        Args:
+            offset: Position of the first byte to decrypt
+            length: Number of bytes to decrypt
+
+        Returns:
+            Decrypted plaintext (bytes)
+        """
+        return decrypt_range(self._map, offset, length, self.key, self.iv, self.segment_size, self.backend)
+
+    def close(self):
+        """Unmap and close the file"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,214 @@
+"""
+Statistical checks of ciphertext quality
+
+``ByteStats`` accumulates a byte histogram chunk by chunk with
+``np.bincount``, so a file of any size is analysed in bounded memory:
+only the 256 counters are kept between chunks. From the histogram it
+derives the Shannon entropy (8 bits per byte for uniform data), the
+chi-square statistic against a uniform distribution with its p-value,
+and the fraction of one bits.
+
+``avalanche`` measures diffusion: it flips one plaintext bit per trial and
+counts the ciphertext bits that change (``np.unpackbits`` of the XOR of
+both ciphertexts). In CFB the flipped bit changes only its own position
+in the ciphertext segment; the segment after it is encrypted from a
+register holding the changed ciphertext and comes out completely
+different, about half of its bits flipped. Smaller segments spread the
+change sooner. Every trial only re-encrypts a window after the flip,
+starting from the register of its segment, and all windows go through
+one batched encryption.
+"""
+
+import math
+
+import numpy as np
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.batch import cfb_encrypt_batch
+from cfb.engine import BLOCK_SIZE, check_parameters
+from cfb.stream import CHUNK_SIZE, CFBEncryptor
+
+# Ciphertext bytes compared per avalanche trial
+AVALANCHE_WINDOW = 256
+# Number of one bits of every byte value
+_BIT_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def chi_square_p_value(statistic, degrees):
+    """
+    Probability that uniform data gives a chi-square statistic at least this large
+
+    Uses the Wilson-Hilferty normal approximation, accurate to a few
+    thousandths for the 255 degrees of freedom of a byte histogram.
+    """
+    if degrees <= 0:
+        return 1.0
+    scale = 2 / (9 * degrees)
+    z = ((statistic / degrees) ** (1 / 3) - (1 - scale)) / math.sqrt(scale)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class ByteStats:
+    """
+    Byte histogram of a stream, accumulated chunk by chunk
+
+    Attributes:
+        counts: Occurrences of every byte value (int64 array of 256)
+        total: Bytes seen
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(256, dtype=np.int64)
+        self.total = 0
+
+    def update(self, chunk):
+        """Add the bytes of ``chunk`` (bytes-like) to the histogram"""
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        self.counts += np.bincount(data, minlength=256)
+        self.total += len(data)
+
+    def merge(self, other):
+        """Add the histogram of another ``ByteStats``"""
+        self.counts += other.counts
+        self.total += other.total
+
+    def entropy(self):
+        """Shannon entropy in bits per byte (0 to 8)"""
+        if not self.total:
+            return 0.0
+        p = self.counts[self.counts > 0] / self.total
+        return float((p * np.log2(1 / p)).sum())
+
+    def chi_square(self):
+        """
+        Chi-square test of the histogram against a uniform distribution
+
+        Returns:
+            (statistic, p-value); a p-value below 0.01 suggests the bytes are not uniform
+        """
+        if not self.total:
+            return 0.0, 1.0
+        expected = self.total / 256
+        statistic = float(((self.counts - expected) ** 2).sum() / expected)
+        return statistic, chi_square_p_value(statistic, 255)
+
+    def ones_fraction(self):
+        """Fraction of one bits (0.5 for uniform data)"""
+        return float(self.counts @ _BIT_COUNTS) / (8 * self.total) if self.total else 0.0
+
+    def summary(self):
+        """Bytes, entropy, chi-square, p-value and ones fraction as a dictionary"""
+        statistic, p_value = self.chi_square()
+        return {
+            "bytes": self.total,
+            "entropy": self.entropy(),
+            "chi_square": statistic,
+            "p_value": p_value,
+            "ones_fraction": self.ones_fraction(),
+        }
+
+
+def analyze_stream(source, chunk_size=CHUNK_SIZE):
+    """
+    Byte statistics of a binary file object, read ``chunk_size`` bytes at a time
+
+    Returns:
+        ByteStats
+    """
+    stats = ByteStats()
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return stats
+        stats.update(chunk)
+
+
+def analyze_encryption(source, key, iv, segment_size=16, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND,
+                       progress=None):
+    """
+    Encrypt a binary file object chunk by chunk and collect statistics of both sides
+
+    The ciphertext is not kept, so memory stays bounded whatever the size.
+
+    Args:
+        source: Readable binary file object with the plaintext
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+        progress: Optional callable receiving the bytes processed after each chunk
+
+    Returns:
+        (plaintext ByteStats, ciphertext ByteStats)
+    """
+    encryptor = CFBEncryptor(key, iv, segment_size, backend)
+    plaintext, ciphertext = ByteStats(), ByteStats()
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        plaintext.update(chunk)
+        ciphertext.update(encryptor.update(chunk))
+        if progress:
+            progress(plaintext.total)
+    ciphertext.update(encryptor.finalize())
+    return plaintext, ciphertext
+
+
+def avalanche(plaintext, key, iv, segment_size=16, trials=1000, seed=None, backend=DEFAULT_BACKEND):
+    """
+    Flip one random plaintext bit per trial and measure how many ciphertext bits change
+
+    Args:
+        plaintext: Message to encrypt (bytes, longer than ``AVALANCHE_WINDOW``)
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        trials: Number of bit flips
+        seed: Seed of the random flip positions (default: random)
+        backend: Backend used to encrypt the message (default: "native")
+
+    Returns:
+        Dictionary with "profile" (mean changed bits of the ciphertext byte
+        at each distance from the flipped byte, NumPy array), "flipped_byte_bits"
+        (changed bits in the flipped byte itself), "delay_bytes" (mean bytes
+        until the next segment, where diffusion starts), "diffused_fraction"
+        (fraction of changed bits from the next segment on, 0.5 for full
+        diffusion) and "hamming_distance" (mean changed bits per window)
+    """
+    check_parameters(iv, segment_size)
+    if len(plaintext) <= AVALANCHE_WINDOW:
+        raise ValueError(f"Message must be longer than {AVALANCHE_WINDOW} bytes")
+
+    rng = np.random.default_rng(seed)
+    ciphertext = get_backend(backend).encrypt(plaintext, key, iv, segment_size)
+    stream = bytes(iv) + bytes(ciphertext)
+    message = np.frombuffer(bytes(plaintext), dtype=np.uint8)
+    window = AVALANCHE_WINDOW - AVALANCHE_WINDOW % segment_size
+
+    positions = rng.integers(0, len(plaintext) - window, trials)
+    offsets = positions % segment_size
+    starts = positions - offsets
+    windows = message[starts[:, None] + np.arange(window)]
+    windows[np.arange(trials), offsets] ^= (1 << rng.integers(0, 8, trials)).astype(np.uint8)
+
+    # Each window restarts from the register of its segment: the 16 bytes of IV || ciphertext before it
+    changed = cfb_encrypt_batch([(row.tobytes(), stream[start:start + BLOCK_SIZE])
+                                 for row, start in zip(windows, starts.tolist())], key, segment_size)
+    original = np.frombuffer(b''.join(stream[BLOCK_SIZE + start:BLOCK_SIZE + start + window]
+                                      for start in starts.tolist()), dtype=np.uint8).reshape(trials, window)
+    difference = np.frombuffer(b''.join(changed), dtype=np.uint8).reshape(trials, window) ^ original
+    bits = np.unpackbits(difference, axis=1).reshape(trials, window, 8).sum(axis=2)
+
+    # Changed bits by distance from the flipped byte (every trial covers window - segment_size of them)
+    distances = offsets[:, None] + np.arange(window - segment_size + 1)
+    profile = bits[np.arange(trials)[:, None], distances].mean(axis=0)
+    after = np.arange(window) >= segment_size
+    return {
+        "profile": profile,
+        "flipped_byte_bits": float(bits[np.arange(trials), offsets].mean()),
+        "delay_bytes": float((segment_size - offsets).mean()),
+        "diffused_fraction": float(bits[:, after].mean() / 8),
+        "hamming_distance": float(bits.sum(axis=1).mean()),
+    }
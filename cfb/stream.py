@@ -0,0 +1,172 @@
+"""
+Streaming CFB encryption and decryption
+
+``CFBEncryptor`` and ``CFBDecryptor`` accept data in arbitrary pieces via
+``update`` and carry the feedback register and any incomplete segment
+between calls, so the concatenated output equals ``cfb_encrypt`` /
+``cfb_decrypt`` of the concatenated input. ``encrypt_stream`` and
+``decrypt_stream`` drive them over file objects chunk by chunk.
+
+With ``emit_partial=True`` the bytes of an incomplete segment are output
+as soon as they arrive instead of waiting for the rest of the segment,
+which keeps the latency of live streams independent of the segment size.
+The segment is transformed again once complete and only its new bytes
+are returned, so the output is unchanged.
+"""
+
+import tempfile
+
+from cfb.backends import DEFAULT_BACKEND, get_backend
+from cfb.engine import BLOCK_SIZE, check_parameters
+
+# Amount of input read per step by the file pipeline
+CHUNK_SIZE = 1024 * 1024
+# Spooled outputs stay in memory up to this size, then move to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class CFBStreamCipher:
+    """
+    Common state of the streaming encryptor and decryptor
+
+    Args:
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        backend: Name of the CFB backend doing the work (default: "native")
+        emit_partial: Output the bytes of an incomplete segment right away (default: False)
+    """
+
+    decrypt = False
+
+    def __init__(self, key, iv, segment_size=16, backend=DEFAULT_BACKEND, emit_partial=False):
+        check_parameters(iv, segment_size)
+        self.key = key
+        self.segment_size = segment_size
+        self.backend = get_backend(backend)
+        self.emit_partial = emit_partial
+        self.feedback = bytes(iv)
+        self.pending = bytearray()
+        # Bytes of ``pending`` whose output was already returned (emit_partial only)
+        self.emitted = 0
+        self.finalized = False
+
+    def _process(self, data):
+        """Transform whole segments (and a final partial one) of ``data``"""
+        transform = self.backend.decrypt if self.decrypt else self.backend.encrypt
+        output = transform(data, self.key, self.feedback, self.segment_size)
+        # After whole segments the register holds the last 16 bytes of register || ciphertext
+        ciphertext = data if self.decrypt else output
+        self.feedback = (self.feedback + bytes(ciphertext[-BLOCK_SIZE:]))[-BLOCK_SIZE:]
+        return output
+
+    def update(self, chunk):
+        """
+        Process the next piece of input
+
+        Args:
+            chunk: Next piece of data (bytes-like)
+
+        Returns:
+            Output for every segment completed so far (bytes)
+        """
+        if self.finalized:
+            raise ValueError("update() called after finalize()")
+
+        data = memoryview(chunk)
+        if self.pending:
+            self.pending += data
+            data = memoryview(self.pending)
+
+        whole = len(data) - len(data) % self.segment_size
+        output = self._process(data[:whole]) if whole else b''
+        if self.emit_partial and (self.emitted or whole < len(data)):
+            # The register is not advanced: the segment is transformed again once complete
+            transform = self.backend.decrypt if self.decrypt else self.backend.encrypt
+            tail = transform(data[whole:], self.key, self.feedback, self.segment_size) if whole < len(data) else b''
+            output = (bytes(output) + bytes(tail))[self.emitted:]
+            self.emitted = len(data) - whole
+        # Copy the remainder before ``pending`` is replaced, it may be a view of it
+        self.pending = bytearray(data[whole:])
+        return bytes(output)
+
+    def finalize(self):
+        """
+        Process the incomplete trailing segment, if any
+
+        Returns:
+            Output for the remaining bytes (bytes)
+        """
+        if self.finalized:
+            raise ValueError("finalize() called twice")
+        self.finalized = True
+        output = self._process(self.pending)[self.emitted:] if self.pending else b''
+        self.pending = bytearray()
+        self.emitted = 0
+        return bytes(output)
+
+
+class CFBEncryptor(CFBStreamCipher):
+    """Incremental CFB encryption"""
+
+
+class CFBDecryptor(CFBStreamCipher):
+    """Incremental CFB decryption"""
+
+    decrypt = True
+
+
+def _pump(transform, source, target, chunk_size):
+    """Copy ``source`` to ``target`` through ``transform``, returning the byte count"""
+    total = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        target.write(transform.update(chunk))
+        total += len(chunk)
+    target.write(transform.finalize())
+    return total
+
+
+def encrypt_stream(source, target, key, iv, segment_size=16, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND):
+    """
+    Encrypt a binary file object into another, one chunk at a time
+
+    Args:
+        source: Readable binary file object with the plaintext
+        target: Writable binary file object for the ciphertext
+        key: 256-bit encryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Number of bytes processed (int)
+    """
+    return _pump(CFBEncryptor(key, iv, segment_size, backend), source, target, chunk_size)
+
+
+def decrypt_stream(source, target, key, iv, segment_size=16, chunk_size=CHUNK_SIZE, backend=DEFAULT_BACKEND):
+    """
+    Decrypt a binary file object into another, one chunk at a time
+
+    Args:
+        source: Readable binary file object with the ciphertext
+        target: Writable binary file object for the plaintext
+        key: 256-bit decryption key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+        chunk_size: Bytes read per step (default: 1 MB)
+        backend: Name of the CFB backend doing the work (default: "native")
+
+    Returns:
+        Number of bytes processed (int)
+    """
+    return _pump(CFBDecryptor(key, iv, segment_size, backend), source, target, chunk_size)
+
+
+def spooled_output():
+    """Return a binary temporary file that moves to disk once it grows large"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b')
@@ -0,0 +1,145 @@
+"""
+Lazy step-by-step trace of CFB processing
+
+For every segment ``i`` the trace shows the block cipher input Iᵢ, its
+output Oᵢ = E(K, Iᵢ), the plaintext Pᵢ and the ciphertext Cᵢ, as on the
+Theory page. The trace is built from the ciphertext: Iᵢ is made of the
+ciphertext bytes just before segment ``i``, so any window of segments can
+be computed directly, without producing the records before it. Windows
+are stored column by column in NumPy arrays.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from cfb.engine import BLOCK_SIZE, check_parameters, new_ecb
+from cfb.parallel import feedback_registers
+
+TraceRecord = namedtuple("TraceRecord", ["index", "input", "output", "plaintext", "ciphertext"])
+
+
+class TraceTable:
+    """
+    Columnar trace of consecutive segments
+
+    Attributes:
+        start: Index of the first segment
+        inputs: Block cipher inputs Iᵢ, shape (n, 16)
+        outputs: Block cipher outputs Oᵢ, shape (n, 16)
+        plaintext: Plaintext segments Pᵢ, shape (n, segment size), zero padded
+        ciphertext: Ciphertext segments Cᵢ, shape (n, segment size), zero padded
+        lengths: Length of each segment in bytes (only the last one can be short)
+    """
+
+    def __init__(self, start, inputs, outputs, plaintext, ciphertext, lengths):
+        self.start = start
+        self.inputs = inputs
+        self.outputs = outputs
+        self.plaintext = plaintext
+        self.ciphertext = ciphertext
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def record(self, row):
+        """Segment ``row`` of the table as a ``TraceRecord`` of bytes"""
+        length = int(self.lengths[row])
+        return TraceRecord(
+            self.start + row,
+            self.inputs[row].tobytes(),
+            self.outputs[row].tobytes(),
+            self.plaintext[row, :length].tobytes(),
+            self.ciphertext[row, :length].tobytes(),
+        )
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def rows(self):
+        """Display rows with hexadecimal values"""
+        return [
+            {
+                "Segment": record.index,
+                "Iᵢ (cipher input)": record.input.hex(),
+                "Oᵢ = E(K, Iᵢ)": record.output.hex(),
+                "Pᵢ (plaintext)": record.plaintext.hex(),
+                "Cᵢ (ciphertext)": record.ciphertext.hex(),
+            }
+            for record in self
+        ]
+
+
+class CFBTrace:
+    """
+    Seekable trace of the CFB segments of a ciphertext
+
+    Args:
+        ciphertext: Complete ciphertext (bytes-like, e.g. bytes, memoryview or mmap)
+        key: 256-bit key (32 bytes)
+        iv: Initialization vector (16 bytes)
+        segment_size: Segment size in bytes (default: 16)
+    """
+
+    def __init__(self, ciphertext, key, iv, segment_size=16):
+        check_parameters(iv, segment_size)
+        self.ciphertext = ciphertext
+        self.iv = iv
+        self.segment_size = segment_size
+        self._cipher = new_ecb(key)
+
+    @property
+    def num_segments(self):
+        """Number of segments in the ciphertext"""
+        return -(-len(self.ciphertext) // self.segment_size)
+
+    def window(self, start, count):
+        """
+        Compute the trace of ``count`` segments starting at segment ``start``
+
+        Args:
+            start: Index of the first segment
+            count: Number of segments (clipped at the end of the ciphertext)
+
+        Returns:
+            TraceTable
+        """
+        size = self.segment_size
+        start = max(0, min(start, self.num_segments))
+        stop = min(start + max(count, 0), self.num_segments)
+        n = stop - start
+        if not n:
+            empty = np.zeros((0, BLOCK_SIZE), dtype=np.uint8)
+            return TraceTable(start, empty, empty, empty[:, :size], empty[:, :size], np.zeros(0, dtype=np.uint8))
+
+        registers = feedback_registers(self.ciphertext, self.iv, size, start, stop)
+        inputs = np.frombuffer(registers, dtype=np.uint8).reshape(n, BLOCK_SIZE)
+        outputs = np.frombuffer(self._cipher.encrypt(registers), dtype=np.uint8).reshape(n, BLOCK_SIZE)
+
+        available = bytes(self.ciphertext[start * size:stop * size])
+        ciphertext = np.zeros(n * size, dtype=np.uint8)
+        ciphertext[:len(available)] = np.frombuffer(available, dtype=np.uint8)
+        ciphertext = ciphertext.reshape(n, size)
+
+        lengths = np.full(n, size, dtype=np.uint8)
+        lengths[-1] = len(available) - (n - 1) * size
+        # Zero the padding of a short last segment so it does not show up as plaintext
+        valid = np.arange(size) < lengths[:, None]
+        plaintext = (ciphertext ^ outputs[:, :size]) * valid
+
+        return TraceTable(start, inputs, outputs, plaintext.astype(np.uint8), ciphertext, lengths)
+
+    def records(self, start=0, stop=None, batch=1024):
+        """
+        Yield ``TraceRecord`` objects one at a time, computing them in batches
+
+        Args:
+            start: Index of the first segment
+            stop: Index one past the last segment (default: end of the ciphertext)
+            batch: Segments computed per batch
+        """
+        stop = self.num_segments if stop is None else min(stop, self.num_segments)
+        for first in range(start, stop, batch):
+            yield from self.window(first, min(batch, stop - first))
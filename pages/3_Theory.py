@@ -1,4 +1,7 @@
 import streamlit as st
+import inspect
+
+from cfb import educational
 
 st.set_page_config(page_title="Theory", layout="wide")
 st.header("CFB Mode Theory")
@@ -97,75 +100,11 @@ st.markdown("---")
 
 st.subheader("🔹 Core CFB Functions")
 
-st.markdown("""
-```python
-def cfb_encrypt(plaintext, key, iv, block_size=16):
-    '''
-    CFB mode encryption
-    
-    Args:
-        plaintext: Data to encrypt (bytes)
-        key: Encryption key (bytes)
-        iv: Initialization vector (bytes)
-        block_size: Block size in bytes (default: 16 for AES)
-    
-    Returns:
-        Encrypted ciphertext (bytes)
-    '''
-    cipher = AES.new(key, AES.MODE_ECB)  # Use ECB for single block encryption
-    ciphertext = b''
-    feedback = iv
-    
-    for i in range(0, len(plaintext), block_size):
-        # Encrypt the feedback register
-        encrypted_feedback = cipher.encrypt(feedback)
-        
-        # Get current plaintext block
-        plaintext_block = plaintext[i:i+block_size]
-        
-        # XOR plaintext with encrypted feedback
-        ciphertext_block = bytes(a ^ b for a, b in zip(plaintext_block, encrypted_feedback))
-        ciphertext += ciphertext_block
-        
-        # Update feedback register with ciphertext
-        feedback = ciphertext_block + feedback[len(ciphertext_block):]
-    
-    return ciphertext
-```
-
-```python
-def cfb_decrypt(ciphertext, key, iv, block_size=16):
-    '''
-    CFB mode decryption
-    
-    Args:
-        ciphertext: Data to decrypt (bytes)
-        key: Decryption key (bytes)  
-        iv: Initialization vector (bytes)
-        block_size: Block size in bytes (default: 16 for AES)
-    
-    Returns:
-        Decrypted plaintext (bytes)
-    '''
-    cipher = AES.new(key, AES.MODE_ECB)  # Same as encryption!
-    plaintext = b''
-    feedback = iv
-    
-    for i in range(0, len(ciphertext), block_size):
-        # Encrypt the feedback register (same as encryption)
-        encrypted_feedback = cipher.encrypt(feedback)
-        
-        # Get current ciphertext block
-        ciphertext_block = ciphertext[i:i+block_size]
-        
-        # XOR ciphertext with encrypted feedback
-        plaintext_block = bytes(a ^ b for a, b in zip(ciphertext_block, encrypted_feedback))
-        plaintext += plaintext_block
-        
-        # Update feedback register with received ciphertext
-        feedback = ciphertext_block + feedback[len(ciphertext_block):]
-    
-    return plaintext
-```
+st.write("""
+This is the step-by-step implementation behind the **educational** option of the Simulation page.
+The other implementations produce exactly the same output, only faster.
 """)
 
+st.code(inspect.getsource(educational.cfb_encrypt), language="python")
+
+st.code(inspect.getsource(educational.cfb_decrypt), language="python")
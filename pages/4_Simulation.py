@@ -1,85 +1,147 @@
 import streamlit as st
 import os
-import secrets
-from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 import base64
+from contextlib import nullcontext
+from functools import partial
 
-st.set_page_config(page_title="CFB Simulation", layout="wide")
-st.header("🔐 CFB Mode Simulation")
+import uuid
 
-def cfb_encrypt(plaintext_bytes, key, iv, segment_size=16):
-    """
-    CFB mode encryption implementation
-    
-    Args:
-        plaintext_bytes: Data to encrypt (bytes)
-        key: 256-bit encryption key (32 bytes)
-        iv: Initialization vector (16 bytes)
-        segment_size: Segment size in bytes (default: 16)
-    
-    Returns:
-        Encrypted ciphertext (bytes)
-    """
-    cipher = AES.new(key, AES.MODE_ECB)
-    ciphertext = b''
-    feedback_register = iv
+from cfb import (BACKENDS, DEFAULT_BACKEND, SEGMENT_BITS, CFBCache, CFBTrace, ContainerLayout, JobLimitError,
+                 JobManager, cfb_decrypt_bits, cfb_encrypt_bits, decrypt_range, decrypt_range_chunked,
+                 decrypted_name, describe_segment, encrypted_name, generate_iv, generate_key, get_backend,
+                 is_authenticated, is_chunked)
+from cfb.auth import unpack_container
+from cfb.compress import METHOD_LABELS, PREFIX_SIZE, available_methods, container_compressed
+from cfb.container import chunk_ivs
+from cfb.display import PREVIEW_BYTES, base64_text, head_tail, is_large, render, window
+from cfb.bench import parse_size
+from cfb.experiments import ERROR_KINDS, ERROR_LABELS, run_sweep
+from cfb.instrument import PHASE_LABELS, profiling, timed
+
+@st.cache_resource
+def job_manager():
+    """Worker pool and job queue shared by every session"""
+    # Half the CPUs run jobs, so a chunked job can spread its chunks over two or more processes
+    return JobManager(max_workers=max((os.cpu_count() or 1) // 2, 1))
+
+
+def read_result(job):
+    """Contents of a finished job, read only when its download button is clicked"""
+    with timed("download", job.profile), open(job.result_path, 'rb') as handle:
+        return handle.read()
 
-    for i in range(0, len(plaintext_bytes), segment_size):
-        encrypted_feedback = cipher.encrypt(feedback_register)
-        
-        plaintext_segment = plaintext_bytes[i:i+segment_size]
-        
-        ciphertext_segment = bytes(a ^ b for a, b in zip(plaintext_segment, encrypted_feedback))
-        ciphertext += ciphertext_segment
-        
-        feedback_register = feedback_register[len(ciphertext_segment):] + ciphertext_segment
-        
-        if len(feedback_register) < 16:
-            feedback_register += b'\x00' * (16 - len(feedback_register))
-    
-    return ciphertext
 
-def cfb_decrypt(ciphertext_bytes, key, iv, segment_size=16):
+def show_profile(profile, name):
     """
-    CFB mode decryption implementation
-    
+    Phase timings and counters of a profiled operation, with JSON and Prometheus exports
+
     Args:
-        ciphertext_bytes: Data to decrypt (bytes)
-        key: 256-bit decryption key (32 bytes)
-        iv: Initialization vector (16 bytes)
-        segment_size: Segment size in bytes (default: 16)
-    
-    Returns:
-        Decrypted plaintext (bytes)
+        profile: cfb.instrument.Profile
+        name: Operation name, used for the widget keys and file names
     """
-    cipher = AES.new(key, AES.MODE_ECB) 
-    plaintext = b''
-    feedback_register = iv
+    report = profile.report()
+    if not report["cipher_seconds"]:
+        st.caption("⏱️ No cipher work was timed: the result came from the cache.")
+    if not report["phases"]:
+        return
+    st.write("**⏱️ Timing:**")
+    st.dataframe([
+        {
+            "Phase": PHASE_LABELS.get(phase, phase),
+            "Time (ms)": round(entry["seconds"] * 1000, 3),
+            "Share": f"{entry['share']:.1%}",
+            "Calls": entry["calls"],
+        }
+        for phase, entry in report["phases"].items()
+    ], hide_index=True)
+    counters = report["counters"]
+    if counters:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("AES calls", f"{counters.get('aes_calls', 0):,}")
+        col2.metric("Bytes processed", f"{counters.get('bytes', 0):,}")
+        if report["throughput_mb_s"] is not None:
+            col3.metric("Cipher throughput", f"{report['throughput_mb_s']:.2f} MB/s")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("💾 Export JSON", data=profile.to_json(), file_name=f"cfb_profile_{name}.json",
+                           mime="application/json", key=f"profile_json_{name}", on_click="ignore")
+    with col2:
+        st.download_button("💾 Export Prometheus", data=profile.to_prometheus(labels={"operation": name}),
+                           file_name=f"cfb_profile_{name}.prom", mime="text/plain",
+                           key=f"profile_prom_{name}", on_click="ignore")
 
-    for i in range(0, len(ciphertext_bytes), segment_size):
-        encrypted_feedback = cipher.encrypt(feedback_register)
 
-        ciphertext_segment = ciphertext_bytes[i:i+segment_size]
+def show_compression(job):
+    """Caption with what compressing (or decompressing) a finished job saved"""
+    stats = job.compression
+    if stats["method"] == "none":
+        if job.operation == "encrypt":
+            st.caption("🗜️ Compression skipped: a sample of the file did not compress, it was stored as is")
+        return
+    ratio = stats["original"] / stats["compressed"] if stats["compressed"] else 0.0
+    saved = stats["saved_seconds"]
+    effect = f"saved about {saved:.2f} s" if saved >= 0 else f"cost about {-saved:.2f} s more than it saved"
+    action = "Compressed" if job.operation == "encrypt" else "Decompressed"
+    st.caption(f"🗜️ {action} with {METHOD_LABELS[stats['method']]}: {stats['original']:,} bytes ↔ "
+               f"{stats['compressed']:,} bytes ({ratio:.1f}×) in {stats['seconds']:.2f} s, {effect}")
 
-        plaintext_segment = bytes(a ^ b for a, b in zip(ciphertext_segment, encrypted_feedback))
-        plaintext += plaintext_segment
 
-        feedback_register = feedback_register[len(ciphertext_segment):] + ciphertext_segment
+@st.fragment
+def show_payload(data, title, file_name, text=False):
+    """
+    Show a payload kept on the server as bytes, whole when small and as a preview when large
 
-        if len(feedback_register) < 16:
-            feedback_register += b'\x00' * (16 - len(feedback_register))
-    
-    return plaintext
+    Large payloads show their first and last bytes and a window that can be
+    moved through the payload; every view is rendered from the visible bytes
+    only, and the whole payload is offered as a download. Runs as a fragment,
+    so browsing reruns only this part of the page.
 
-def generate_key():
-    """Generate a random 256-bit AES key"""
-    return secrets.token_bytes(32)
+    Args:
+        data: Payload (bytes)
+        title: Heading, e.g. "Ciphertext"
+        file_name: Base name of the downloads, also used for the widget keys
+        text: True for UTF-8 plaintext, False for ciphertext
+    """
+    if not is_large(data):
+        st.write(f"**{title}:**" if text else f"**{title} (Base64):**")
+        with timed("base64"):
+            rendered = render(data, "text" if text else "base64")
+        st.code(rendered, language="text")
+        return
+    
+    views = {"Text": "text", "Base64": "base64", "Hex": "hex"} if text else {"Base64": "base64", "Hex": "hex"}
+    view = views[st.radio("View", list(views), horizontal=True, key=f"{file_name}_view")]
+    st.write(f"**{title}:** {len(data):,} bytes. The first and last {PREVIEW_BYTES:,} bytes are shown, "
+             f"the whole {title.lower()} stays on the server.")
+    head, tail_offset, tail = head_tail(data)
+    with timed("base64"):
+        preview = (f"{render(head, view)}\n… {tail_offset - len(head):,} bytes not shown …\n"
+                   f"{render(tail, view, tail_offset)}")
+    st.code(preview, language="text")
+    
+    with st.expander("🔎 Browse"):
+        offset = st.number_input("Offset (bytes)", min_value=0, max_value=len(data) - 1, value=0,
+                                 step=PREVIEW_BYTES, key=f"{file_name}_offset")
+        start, visible = window(data, offset)
+        st.caption(f"Bytes {start:,} – {start + len(visible) - 1:,}")
+        st.code(render(visible, view, start), language="text")
+    
+    # Downloads are produced only when clicked
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("💾 Download", data=partial(bytes, data),
+                           file_name=f"{file_name}.{'txt' if text else 'bin'}",
+                           mime="text/plain" if text else "application/octet-stream",
+                           key=f"{file_name}_download", on_click="ignore")
+    if not text:
+        with col2:
+            st.download_button("💾 Download Base64", data=partial(base64_text, data),
+                               file_name=f"{file_name}.b64", mime="text/plain", key=f"{file_name}_download_base64", on_click="ignore")
 
-def generate_iv():
-    """Generate a random 128-bit IV"""
-    return secrets.token_bytes(16)
 
+st.set_page_config(page_title="CFB Simulation", layout="wide")
+st.header("🔐 CFB Mode Simulation")
 
 st.write("""
 This simulation demonstrates CFB (Cipher Feedback) mode encryption and decryption using AES as the underlying block cipher.
@@ -90,22 +152,47 @@ if 'key' not in st.session_state:
     st.session_state.key = generate_key()
 if 'iv' not in st.session_state:
     st.session_state.iv = generate_iv()
+if 'cfb_cache' not in st.session_state:
+    st.session_state.cfb_cache = CFBCache()
+cfb_cache = st.session_state.cfb_cache
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'authenticated_jobs' not in st.session_state:
+    st.session_state.authenticated_jobs = set()
+jobs = job_manager()
 
 # Key and IV management
-col1, col2, col3 = st.columns([1, 1, 1])
+col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
 
 with col1:
     if st.button("🔑 Generate New Key"):
         st.session_state.key = generate_key()
+        cfb_cache.clear()
         st.rerun()
 
 with col2:
     if st.button("🎲 Generate New IV"):
         st.session_state.iv = generate_iv()
+        cfb_cache.clear()
         st.rerun()
 
 with col3:
-    segment_size = st.selectbox("Segment Size (bytes)", [1, 8, 16], index=2)
+    segment_bits = st.selectbox("Segment Size", SEGMENT_BITS, index=len(SEGMENT_BITS) - 1,
+                                format_func=describe_segment)
+    # Byte-oriented operations (files, previews) use the segment size in bytes
+    segment_size = segment_bits // 8
+    bit_mode = segment_bits == 1
+
+with col4:
+    backend_names = list(BACKENDS)
+    backend_name = st.selectbox("Implementation", backend_names, index=backend_names.index(DEFAULT_BACKEND),
+                                help="\n".join(f"**{b.name}**: {b.description}" for b in BACKENDS.values()))
+    backend = get_backend(backend_name)
+
+profile_enabled = st.toggle("⏱️ Profile operations",
+                            help="Time AES calls, XOR, feedback-register updates, Base64 and file I/O and show "
+                                 "them in the details. The vectorized engine times every segment, which slows "
+                                 "it down while profiling is on.")
 
 # Display current key and IV
 st.subheader("🔐 Current Cryptographic Parameters")
@@ -122,7 +209,8 @@ with col2:
 st.markdown("---")
 
 # Main encryption/decryption interface
-tab1, tab2, tab3 = st.tabs(["🔒 Text Encryption", "🔓 Text Decryption", "📁 File Operations"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔒 Text Encryption", "🔓 Text Decryption", "📁 File Operations",
+                                        "🔬 Step-by-step Trace", "🧪 Error Propagation"])
 
 with tab1:
     st.subheader("CFB Encryption")
@@ -134,26 +222,35 @@ with tab1:
             # Convert to bytes
             plaintext_bytes = plaintext_input.encode('utf-8')
             
-            # Encrypt using CFB mode
-            ciphertext_bytes = cfb_encrypt(plaintext_bytes, st.session_state.key, st.session_state.iv, segment_size)
-            
-            # Encode for display
-            ciphertext_b64 = base64.b64encode(ciphertext_bytes).decode()
-            
-            st.success("✅ Encryption successful!")
-            st.write("**Ciphertext (Base64):**")
-            st.code(ciphertext_b64, language="text")
+            with profiling() if profile_enabled else nullcontext() as profile:
+                # Encrypt using CFB mode (reruns with the same input are served from the cache)
+                ciphertext_bytes = cfb_cache.cached("encrypt", partial(cfb_encrypt_bits, backend=backend.name),
+                                                    plaintext_bytes, st.session_state.key, st.session_state.iv,
+                                                    segment_bits)
+                
+                # The matching decryption is known now, so round-trip verification needs no cipher work
+                cfb_cache.put("decrypt", st.session_state.key, st.session_state.iv, segment_bits,
+                              ciphertext_bytes, plaintext_bytes)
+                
+                st.success("✅ Encryption successful!")
+                show_payload(ciphertext_bytes, "Ciphertext", "ciphertext")
             
-            # Store in session for decryption tab
-            st.session_state.last_ciphertext = ciphertext_b64
-            st.session_state.last_plaintext = plaintext_input
+            # Store in session for decryption tab (as bytes, Base64 is only produced for display)
+            st.session_state.last_ciphertext = ciphertext_bytes
+            st.session_state.last_plaintext = plaintext_bytes
             
             # Show encryption details
             with st.expander("🔍 Encryption Details"):
                 st.write(f"**Original length:** {len(plaintext_bytes)} bytes")
                 st.write(f"**Encrypted length:** {len(ciphertext_bytes)} bytes")
-                st.write(f"**Segment size:** {segment_size} bytes")
-                st.write(f"**Number of segments:** {(len(plaintext_bytes) + segment_size - 1) // segment_size}")
+                st.write(f"**Segment size:** {describe_segment(segment_bits)}")
+                st.write(f"**Implementation:** {backend.name}")
+                st.write(f"**Number of segments:** {(8 * len(plaintext_bytes) + segment_bits - 1) // segment_bits}")
+                cache_stats = cfb_cache.stats()
+                st.write(f"**Cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                         f"{cache_stats['entries']} entries ({cache_stats['bytes']} bytes)")
+                if profile:
+                    show_profile(profile, "encrypt")
                 
         except Exception as e:
             st.error(f"❌ Encryption failed: {str(e)}")
@@ -161,30 +258,42 @@ with tab1:
 with tab2:
     st.subheader("CFB Decryption")
     
-    # Auto-fill with last ciphertext if available
-    default_ciphertext = st.session_state.get('last_ciphertext', '')
-    ciphertext_input = st.text_area("Enter ciphertext to decrypt (Base64):", 
-                                   value=default_ciphertext, height=100,
-                                   placeholder="Paste Base64 encoded ciphertext here...")
+    last_ciphertext = st.session_state.get('last_ciphertext', b'')
+    use_last = False
+    if is_large(last_ciphertext):
+        # Large ciphertexts stay on the server rather than being copied into the text area
+        use_last = st.checkbox(f"Decrypt the last encrypted message ({len(last_ciphertext):,} bytes, "
+                               f"kept on the server)", value=True)
+    
+    ciphertext_input = ""
+    if not use_last:
+        # Auto-fill with last ciphertext if available
+        default_ciphertext = "" if is_large(last_ciphertext) else base64.b64encode(last_ciphertext).decode()
+        ciphertext_input = st.text_area("Enter ciphertext to decrypt (Base64):", 
+                                       value=default_ciphertext, height=100,
+                                       placeholder="Paste Base64 encoded ciphertext here...")
     
-    if st.button("🔓 Decrypt Text", disabled=not ciphertext_input):
+    if st.button("🔓 Decrypt Text", disabled=not (use_last or ciphertext_input)):
         try:
-            # Decode from Base64
-            ciphertext_bytes = base64.b64decode(ciphertext_input)
-            
-            # Decrypt using CFB mode
-            decrypted_bytes = cfb_decrypt(ciphertext_bytes, st.session_state.key, st.session_state.iv, segment_size)
-            
-            # Convert back to string
-            decrypted_text = decrypted_bytes.decode('utf-8')
-            
-            st.success("✅ Decryption successful!")
-            st.write("**Decrypted plaintext:**")
-            st.code(decrypted_text, language="text")
+            with profiling() if profile_enabled else nullcontext() as profile:
+                # Decode from Base64
+                with timed("base64"):
+                    ciphertext_bytes = last_ciphertext if use_last else base64.b64decode(ciphertext_input)
+                
+                # Decrypt using CFB mode
+                decrypted_bytes = cfb_cache.cached("decrypt", partial(cfb_decrypt_bits, backend=backend.name),
+                                                   ciphertext_bytes, st.session_state.key, st.session_state.iv,
+                                                   segment_bits)
+                
+                # Check that it is text before showing it
+                decrypted_bytes.decode('utf-8')
+                
+                st.success("✅ Decryption successful!")
+                show_payload(decrypted_bytes, "Decrypted plaintext", "plaintext", text=True)
             
             # Verify round-trip if we have the original
             if 'last_plaintext' in st.session_state:
-                if decrypted_text == st.session_state.last_plaintext:
+                if decrypted_bytes == st.session_state.last_plaintext:
                     st.success("🎯 **Round-trip verification:** SUCCESS - Decrypted text matches original!")
                 else:
                     st.error("❌ **Round-trip verification:** FAILED - Decrypted text doesn't match original!")
@@ -193,71 +302,320 @@ with tab2:
             with st.expander("🔍 Decryption Details"):
                 st.write(f"**Ciphertext length:** {len(ciphertext_bytes)} bytes")
                 st.write(f"**Decrypted length:** {len(decrypted_bytes)} bytes")
-                st.write(f"**Segment size:** {segment_size} bytes")
+                st.write(f"**Segment size:** {describe_segment(segment_bits)}")
+                st.write(f"**Implementation:** {backend.name}")
+                cache_stats = cfb_cache.stats()
+                st.write(f"**Cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                         f"{cache_stats['entries']} entries ({cache_stats['bytes']} bytes)")
+                if profile:
+                    show_profile(profile, "decrypt")
                 
         except Exception as e:
             st.error(f"❌ Decryption failed: {str(e)}")
 
 with tab3:
     st.subheader("File Encryption/Decryption")
+    st.caption(f"Files are processed in the background by a shared pool of worker processes "
+               f"with the {get_backend(DEFAULT_BACKEND).name} implementation.")
+    if bit_mode:
+        st.info("CFB-1 needs one AES call per bit and is only offered for text. "
+                "Choose a segment size of 8 bits or more to work with files.")
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.write("**📤 Encrypt File**")
         uploaded_file = st.file_uploader("Choose file to encrypt", key="encrypt_file")
+        file_formats = {
+            "🛡️ Authenticated (HMAC-SHA256)": "authenticated",
+            "⚡ Chunked (parallel)": "chunked",
+            "📄 Raw CFB": "raw",
+        }
+        file_format = st.radio("Format", list(file_formats), horizontal=True,
+                               help="**Authenticated** adds a tag, computed in the same pass, that is checked "
+                                    "before the file is decrypted. **Chunked** encrypts independent 1 MB chunks, "
+                                    "each with its own IV, so they can be spread over CPU cores "
+                                    "(`python -m cfb encrypt --chunked`). **Raw** is the ciphertext alone; raw "
+                                    "encryption saves checkpoints, so a cancelled or crashed job can be resumed.")
+        compression_methods = {"Off": None, **{METHOD_LABELS[method]: method for method in available_methods()}}
+        compression = st.selectbox("🗜️ Compression", list(compression_methods),
+                                   help="Compress the file before encrypting it: fewer bytes go through AES, to "
+                                        "disk and over the download. Data that does not compress (already "
+                                        "compressed files, media) is detected from a sample and stored as is. "
+                                        "Authenticated and chunked files record it and are decompressed "
+                                        "automatically; raw files need **Compressed before encryption** ticked "
+                                        "when decrypting. Compression makes the ciphertext "
+                                        "length depend on the content, which can leak information.")
         
-        if uploaded_file and st.button("🔒 Encrypt File"):
+        if uploaded_file and st.button("🔒 Encrypt File", disabled=bit_mode):
             try:
-                # Read file content
-                file_bytes = uploaded_file.read()
-                
-                # Encrypt
-                encrypted_bytes = cfb_encrypt(file_bytes, st.session_state.key, st.session_state.iv, segment_size)
-                
-                # Provide download
-                st.download_button(
-                    label="💾 Download Encrypted File",
-                    data=encrypted_bytes,
-                    file_name=f"{uploaded_file.name}.cfb_encrypted",
-                    mime="application/octet-stream"
-                )
-                
-                st.success(f"✅ File encrypted! Original: {len(file_bytes)} bytes → Encrypted: {len(encrypted_bytes)} bytes")
-                
+                # Runs in the background worker pool, see the jobs list below
+                jobs.submit(st.session_state.session_id, "encrypt", uploaded_file, encrypted_name(uploaded_file.name),
+                            st.session_state.key, st.session_state.iv, segment_size, file_formats[file_format],
+                            compression_methods[compression], profile=profile_enabled)
+            except JobLimitError as e:
+                st.warning(f"⏳ {str(e)}")
             except Exception as e:
                 st.error(f"❌ File encryption failed: {str(e)}")
     
     with col2:
         st.write("**📥 Decrypt File**")
         encrypted_file = st.file_uploader("Choose encrypted file", key="decrypt_file")
-        
-        if encrypted_file and st.button("🔓 Decrypt File"):
+        authenticated_file = chunked_file = unreadable_file = False
+        compressed_file = None
+        if encrypted_file:
             try:
-                # Read encrypted file
-                encrypted_bytes = encrypted_file.read()
-                
-                # Decrypt
-                decrypted_bytes = cfb_decrypt(encrypted_bytes, st.session_state.key, st.session_state.iv, segment_size)
+                authenticated_file = is_authenticated(encrypted_file.getbuffer())
+                chunked_file = is_chunked(encrypted_file.getbuffer())
+                # Containers record compression in their header; raw ciphertext cannot, so the user says so
+                compressed_file = container_compressed(encrypted_file.getbuffer()[:PREFIX_SIZE])
+                if authenticated_file:
+                    unpack_container(encrypted_file.getbuffer())
+                elif chunked_file:
+                    chunked_layout = ContainerLayout.from_buffer(encrypted_file.getbuffer())
+            except ValueError as e:
+                # A damaged header (truncated file, unknown version) must not take the page down
+                authenticated_file = chunked_file = False
+                unreadable_file = True
+                st.error(f"❌ Unreadable encrypted file: {str(e)}")
+        if compressed_file is None:
+            decompress = st.checkbox("🗜️ Compressed before encryption",
+                                     disabled=not encrypted_file or unreadable_file,
+                                     help="Raw files do not record whether they were compressed: tick this to "
+                                          "decompress the plaintext after decrypting it.")
+        else:
+            decompress = compressed_file
+        if authenticated_file:
+            st.caption("🛡️ Authenticated file: the tag is verified before the plaintext is released. "
+                       "Segment size and IV are read from its header.")
+        elif chunked_file:
+            st.caption(f"⚡ Chunked file: {len(chunked_layout.index)} chunk(s) of up to "
+                       f"{chunked_layout.chunk_size:,} bytes. Segment size and IV are read from its header.")
+        if compressed_file:
+            st.caption("🗜️ Its header says the plaintext is compressed: it is decompressed after decrypting.")
+        
+        if encrypted_file and not unreadable_file and not authenticated_file and (chunked_file or not bit_mode):
+            with st.expander("👁️ Preview without decrypting the whole file"):
+                plaintext_size = chunked_layout.size if chunked_file else encrypted_file.size
+                preview_offset = st.number_input("Offset (bytes)", min_value=0,
+                                                 max_value=max(plaintext_size - 1, 0), value=0)
+                preview_length = st.number_input("Length (bytes)", min_value=1, max_value=4096, value=256)
                 
-                # Determine original filename
-                original_name = encrypted_file.name
-                if original_name.endswith('.cfb_encrypted'):
-                    original_name = original_name[:-14]  # Remove .cfb_encrypted
+                # Only the segments covering the requested range are decrypted
+                # (chunked files find the chunks holding them through their index)
+                if chunked_file:
+                    preview_bytes = decrypt_range_chunked(encrypted_file.getbuffer(), preview_offset, preview_length,
+                                                          st.session_state.key)
                 else:
-                    original_name = f"decrypted_{original_name}"
+                    preview_bytes = decrypt_range(encrypted_file.getbuffer(), preview_offset, preview_length,
+                                                  st.session_state.key, st.session_state.iv, segment_size)
                 
-                # Provide download
-                st.download_button(
-                    label="💾 Download Decrypted File",
-                    data=decrypted_bytes,
-                    file_name=original_name,
-                    mime="application/octet-stream"
-                )
-                
-                st.success(f"✅ File decrypted! Encrypted: {len(encrypted_bytes)} bytes → Decrypted: {len(decrypted_bytes)} bytes")
+                if decompress:
+                    st.caption("🗜️ The plaintext is compressed: the preview shows compressed bytes, "
+                               "the decrypted file is decompressed.")
                 
+                st.write("**Hex:**")
+                st.code("\n".join(
+                    f"{preview_offset + i:08x}  {preview_bytes[i:i + 16].hex(' ')}"
+                    for i in range(0, len(preview_bytes), 16)
+                ), language="text")
+                st.write("**Text:**")
+                st.code(preview_bytes.decode('utf-8', errors='replace'), language="text")
+        
+        decrypt_disabled = unreadable_file or (bit_mode and not (authenticated_file or chunked_file))
+        if encrypted_file and st.button("🔓 Decrypt File", disabled=decrypt_disabled):
+            try:
+                # Authenticated and chunked files are recognised by the worker
+                job = jobs.submit(st.session_state.session_id, "decrypt", encrypted_file,
+                                  decrypted_name(encrypted_file.name), st.session_state.key, st.session_state.iv,
+                                  segment_size, decompress=decompress, profile=profile_enabled)
+                if authenticated_file:
+                    st.session_state.authenticated_jobs.add(job.id)
+            except JobLimitError as e:
+                st.warning(f"⏳ {str(e)}")
             except Exception as e:
                 st.error(f"❌ File decryption failed: {str(e)}")
+    
+    polling = any(job.active for job in jobs.session_jobs(st.session_state.session_id))
+    
+    # Poll every second while a job is pending, only this part of the page reruns
+    @st.fragment(run_every=1.0 if polling else None)
+    def show_jobs():
+        session_jobs = jobs.session_jobs(st.session_state.session_id)
+        if not session_jobs:
+            return
+        st.markdown("---")
+        st.write("**⏳ File Jobs**")
+        for job in reversed(session_jobs):
+            action = "Encrypting" if job.operation == "encrypt" else "Decrypting"
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                status = job.status
+                if status == "done":
+                    st.success(f"✅ {job.name}: {job.size:,} bytes → {job.result_size:,} bytes")
+                    if job.id in st.session_state.authenticated_jobs:
+                        st.caption("🛡️ Integrity verified: the HMAC-SHA256 tag matches")
+                    if job.compression:
+                        show_compression(job)
+                    if job.profile:
+                        with st.expander("🔍 Job Details"):
+                            show_profile(job.profile, f"job_{job.id}")
+                elif status == "failed":
+                    st.error(f"❌ {job.name}: {job.error}")
+                elif status == "cancelled":
+                    st.info(f"🚫 {job.name}: cancelled")
+                checkpoint = job.checkpoint
+                if checkpoint:
+                    st.caption(f"💾 Checkpoint saved after {checkpoint.offset:,} of {job.size:,} bytes: "
+                               f"resuming continues from there")
+                else:
+                    st.progress(job.progress(), text=f"{action} {job.name} ({status})")
+            with col2:
+                if job.result_path:
+                    st.download_button("💾 Download", data=partial(read_result, job), file_name=job.name,
+                                       mime="application/octet-stream", key=f"download_{job.id}")
+                elif job.active:
+                    st.button("🛑 Cancel", key=f"cancel_{job.id}", on_click=jobs.cancel, args=(job.id,))
+                elif job.resumable and st.button("🔁 Resume", key=f"resume_{job.id}", disabled=bit_mode):
+                    try:
+                        jobs.resume(job.id, st.session_state.key, st.session_state.iv, segment_size)
+                    except JobLimitError as e:
+                        st.warning(f"⏳ {str(e)}")
+                    else:
+                        # Refresh the whole page so the jobs list polls again
+                        st.rerun()
+            with col3:
+                if not job.active:
+                    st.button("🗑️ Remove", key=f"remove_{job.id}", on_click=jobs.remove, args=(job.id,))
+        if polling and not any(job.active for job in session_jobs):
+            # Every job finished: refresh the whole page once to stop polling
+            st.rerun()
+    
+    show_jobs()
 
+with tab4:
+    st.subheader("Step-by-step CFB Process")
+    st.write("""
+    Each row shows one segment: the block cipher input **Iᵢ**, its output **Oᵢ = E(K, Iᵢ)**,
+    the plaintext **Pᵢ** and the ciphertext **Cᵢ = Pᵢ ⊕ Oᵢ**. Only the visible page is computed,
+    so any segment of a large file can be inspected directly.
+    """)
+    
+    trace_sources = ["Last encrypted text", "Encrypted file (File Operations tab)"]
+    trace_source = st.radio("Trace source", trace_sources, horizontal=True)
+    
+    trace_iv, trace_segment_size = st.session_state.iv, segment_size
+    if trace_source == trace_sources[0]:
+        trace_ciphertext = st.session_state.get('last_ciphertext', b'')
+    else:
+        trace_file = st.session_state.get('decrypt_file')
+        trace_ciphertext = trace_file.getbuffer() if trace_file else b''
+        try:
+            if is_authenticated(trace_ciphertext):
+                # Trace the ciphertext inside the container with its own parameters
+                trace_segment_size, trace_iv, trace_ciphertext = unpack_container(trace_ciphertext)
+            elif is_chunked(trace_ciphertext):
+                layout = ContainerLayout.from_buffer(trace_ciphertext)
+        except ValueError as e:
+            st.error(f"❌ Unreadable encrypted file: {str(e)}")
+            trace_ciphertext = b''
+        if len(trace_ciphertext) and is_chunked(trace_ciphertext):
+            # Chunks are independent CFB ciphertexts: trace one of them
+            chunk = st.number_input(f"Chunk (0 – {max(len(layout.index) - 1, 0)})", min_value=0,
+                                    max_value=max(len(layout.index) - 1, 0), value=0)
+            trace_segment_size = layout.segment_size
+            if layout.index:
+                chunk_offset, chunk_length = layout.index[chunk]
+                trace_iv = chunk_ivs(st.session_state.key, layout.base_iv, 1, chunk)[0]
+                trace_ciphertext = trace_ciphertext[chunk_offset:chunk_offset + chunk_length]
+            else:
+                trace_ciphertext = b''
+    
+    if not trace_segment_size:
+        st.info("The trace shows byte-sized segments. Choose a segment size of 8 bits or more.")
+    elif not len(trace_ciphertext):
+        st.info("Encrypt some text, or upload an encrypted file in the File Operations tab, to trace it.")
+    else:
+        trace = CFBTrace(trace_ciphertext, st.session_state.key, trace_iv, trace_segment_size)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            page_size = st.selectbox("Segments per page", [10, 25, 50, 100], index=1)
+        with col2:
+            first_segment = st.number_input(f"Go to segment (0 – {trace.num_segments - 1:,})", min_value=0,
+                                            max_value=trace.num_segments - 1, value=0, step=page_size)
+        
+        trace_window = trace.window(first_segment, page_size)
+        st.dataframe(trace_window.rows(), hide_index=True)
+        st.caption(f"Segments {trace_window.start:,} – {trace_window.start + len(trace_window) - 1:,} "
+                   f"of {trace.num_segments:,}")
 
+with tab5:
+    st.subheader("Error Propagation and Self-Synchronization")
+    st.write("""
+    A random message is encrypted with the current key and IV, then each trial corrupts the ciphertext
+    with one flipped bit, dropped byte or inserted byte and decrypts it again. The charts show how many
+    segments get garbled and how often decryption recovers, for each segment size.
+    """)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        message_size = st.selectbox("Message size", ["64K", "256K", "1M"], index=2)
+        trials = st.select_slider("Trials per combination", [100, 1000, 5000, 10000], value=10000)
+    with col2:
+        sweep_segments = st.multiselect("Segment sizes (bytes)", list(range(1, 17)), default=[1, 2, 4, 8, 16])
+        kinds = st.multiselect("Error types", ERROR_KINDS, default=list(ERROR_KINDS), format_func=ERROR_LABELS.get)
+    
+    if st.button("🧪 Run Experiment", disabled=not sweep_segments or not kinds):
+        progress_bar = st.progress(0.0)
+        message = os.urandom(parse_size(message_size))
+        st.session_state.error_sweep = run_sweep(
+            message, st.session_state.key, st.session_state.iv, sorted(sweep_segments), kinds, trials,
+            backend=backend_name, progress=lambda done, total: progress_bar.progress(done / total))
+        progress_bar.empty()
+    
+    sweep = st.session_state.get('error_sweep')
+    if not sweep:
+        st.info("Run the experiment to measure error propagation.")
+    else:
+        rows = [
+            {
+                "Segment size (bytes)": r["segment_size"],
+                "Error": ERROR_LABELS[r["kind"]],
+                "Corrupted segments": r["mean_corrupted_segments"],
+                "Corrupted bytes": r["mean_corrupted_bytes"],
+                "Resynchronized (%)": 100 * r["resync_rate"],
+            }
+            for r in sweep
+        ]
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Average corrupted segments**")
+            st.bar_chart(rows, x="Segment size (bytes)", y="Corrupted segments", color="Error", stack=False)
+        with col2:
+            st.write("**Trials that resynchronized**")
+            st.bar_chart(rows, x="Segment size (bytes)", y="Resynchronized (%)", color="Error", stack=False)
+        
+        st.markdown("""
+        **Reading the results:**
+        - A flipped bit garbles its own segment plus every segment whose feedback register still holds it: 1 + 16/s segments
+        - A dropped or inserted byte only resynchronizes in CFB-8 (1-byte segments); with larger segments the
+          segment boundaries stay shifted and the rest of the message is lost
+        """)
+        
+        with st.expander("📋 Detailed results"):
+            st.dataframe([
+                {
+                    "Segment": r["segment_size"],
+                    "Error": ERROR_LABELS[r["kind"]],
+                    "Trials": r["trials"],
+                    "Corrupted bytes": round(r["mean_corrupted_bytes"], 2),
+                    "Corrupted segments": round(r["mean_corrupted_segments"], 2),
+                    "Theory (segments)": r["expected_corrupted_segments"],
+                    "Resync rate": round(r["resync_rate"], 4),
+                    "Mean resync distance (bytes)": r["mean_resync_distance"],
+                    "Max resync distance (bytes)": r["max_resync_distance"],
+                }
+                for r in sweep
+            ], hide_index=True)
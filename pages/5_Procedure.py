@@ -16,7 +16,7 @@ st.subheader("� Implementation Steps")
 st.markdown("""
 1. **Select encryption parameters:**
    - Choose AES-256 as the block cipher
-   - Set segment size (1, 8, or 16 bytes)
+   - Set segment size (1, 8, 64 or 128 bits)
    - Generate a unique 128-bit IV for each encryption
 
 2. **Input plaintext:**
@@ -0,0 +1,118 @@
+import streamlit as st
+import json
+
+from cfb.backends import BACKENDS
+from cfb.bench import format_size, is_batch_report, run_benchmarks
+
+st.set_page_config(page_title="Performance", layout="wide")
+st.header("⚡ CFB Performance")
+
+st.write("""
+Throughput and per-segment latency of the CFB implementations across input sizes and segment sizes.
+Run a quick benchmark here, or load the JSON written by the command-line harness:
+""")
+
+st.code("python -m cfb.bench --sizes 1K 1M 16M 256M --output results.json\n"
+        "python -m cfb.bench --batch --output batch.json", language="bash")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.write("**📂 Load results**")
+    results_file = st.file_uploader("Benchmark results (JSON)", type=["json"])
+    if results_file:
+        try:
+            loaded = json.load(results_file)
+            if not isinstance(loaded, dict) or not loaded.get("results"):
+                raise ValueError("no benchmark results in this file")
+            st.session_state.bench_report = loaded
+        except ValueError as e:
+            st.error(f"❌ Could not read results: {str(e)}")
+
+with col2:
+    st.write("**▶️ Quick benchmark**")
+    sizes = st.multiselect("Input sizes", ["1K", "16K", "64K", "256K", "1M", "4M"], default=["1K", "16K", "256K", "1M"])
+    implementations = st.multiselect("Implementations", list(BACKENDS), default=list(BACKENDS))
+    if st.button("⚡ Run Benchmark", disabled=not sizes or not implementations):
+        with st.spinner("Benchmarking..."):
+            st.session_state.bench_report = run_benchmarks(sizes, implementations=implementations, repeat=1)
+
+st.markdown("---")
+
+report = st.session_state.get('bench_report')
+
+if not report:
+    st.info("Load benchmark results or run a quick benchmark to see the scaling curves.")
+else:
+    results = report["results"]
+    meta = report.get("meta", {})
+    st.caption(f"Python {meta.get('python', '?')} · {meta.get('platform', '?')} · "
+               f"{meta.get('cpu_count', '?')} CPUs · {meta.get('timestamp', '')}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        segment_size = st.selectbox("Segment Size (bytes)", sorted({r["segment_size"] for r in results}))
+    with col2:
+        operation = st.selectbox("Operation", sorted({r["operation"] for r in results}, reverse=True))
+
+    selected = [r for r in results if r["segment_size"] == segment_size and r["operation"] == operation]
+    batch_report = is_batch_report(report)
+    if batch_report:
+        # Written by ``python -m cfb.bench --batch``: messages per second against the batch size
+        st.subheader("📦 Batched messages")
+        st.caption(f"{selected[0]['message_size'] if selected else '?'}-byte messages, one call per batch "
+                   "against one call per message")
+        st.line_chart([
+            {
+                "Messages per batch": r["batch_size"],
+                "Implementation": r["implementation"],
+                "Messages/s": r["messages_per_s"],
+            }
+            for r in selected
+        ], x="Messages per batch", y="Messages/s", color="Implementation")
+    else:
+        rows = [
+            {
+                "Input size (bytes)": r["size"],
+                "Implementation": r["implementation"],
+                "Throughput (MB/s)": r["mb_per_s"],
+                "Latency (µs/segment)": r["segment_latency_us"],
+            }
+            for r in selected
+        ]
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("📈 Throughput")
+            st.line_chart(rows, x="Input size (bytes)", y="Throughput (MB/s)", color="Implementation")
+        with col2:
+            st.subheader("⏱️ Per-segment latency")
+            st.line_chart(rows, x="Input size (bytes)", y="Latency (µs/segment)", color="Implementation")
+
+    with st.expander("📋 Raw results"):
+        if batch_report:
+            st.dataframe([
+                {
+                    "Implementation": r["implementation"],
+                    "Operation": r["operation"],
+                    "Batch": r["batch_size"],
+                    "Message": format_size(r["message_size"]),
+                    "Segment": r["segment_size"],
+                    "Messages/s": round(r["messages_per_s"]),
+                }
+                for r in results
+            ])
+        else:
+            st.dataframe([
+                {
+                    "Implementation": r["implementation"],
+                    "Operation": r["operation"],
+                    "Size": format_size(r["size"]),
+                    "Segment": r["segment_size"],
+                    "MB/s": round(r["mb_per_s"], 2),
+                    "µs/segment": round(r["segment_latency_us"], 3),
+                }
+                for r in results
+            ])
+        st.download_button("💾 Download results (JSON)", data=json.dumps(report, indent=2),
+                           file_name="cfb_benchmark.json", mime="application/json")
@@ -0,0 +1,139 @@
+import streamlit as st
+import io
+import os
+
+from cfb import generate_iv, generate_key
+from cfb.bench import parse_size
+from cfb.stats import AVALANCHE_WINDOW, analyze_encryption, analyze_stream, avalanche
+
+st.set_page_config(page_title="Analysis", layout="wide")
+st.header("📊 Ciphertext Analysis")
+
+st.write("""
+Good ciphertext is indistinguishable from random bytes: every byte value equally frequent, 8 bits of
+entropy per byte, and a single changed plaintext bit scrambling everything the feedback carries it into.
+The statistics below are accumulated chunk by chunk, so files of any size are analysed in bounded memory.
+""")
+
+# Same key and IV as the Simulation page, if it was opened first
+if 'key' not in st.session_state:
+    st.session_state.key = generate_key()
+if 'iv' not in st.session_state:
+    st.session_state.iv = generate_iv()
+
+SAMPLE_TEXT = b"CFB mode turns a block cipher into a self-synchronizing stream cipher. "
+SAMPLES = {
+    "📝 Repeated text": lambda size: (SAMPLE_TEXT * (size // len(SAMPLE_TEXT) + 1))[:size],
+    "⬛ All zeros": bytes,
+    "🎲 Random bytes": os.urandom,
+}
+
+
+def show_stats(title, stats):
+    """Metrics and histogram of one side of the analysis"""
+    summary = stats.summary()
+    st.write(f"**{title}** ({summary['bytes']:,} bytes)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Entropy (bits/byte)", f"{summary['entropy']:.4f}")
+    col2.metric("Chi-square (255 dof)", f"{summary['chi_square']:,.1f}")
+    col3.metric("p-value", f"{summary['p_value']:.3f}")
+    if summary['bytes'] and summary['p_value'] < 0.01:
+        st.caption(f"⚠️ Not uniform: byte values are far from equally frequent. "
+                   f"{summary['ones_fraction']:.1%} of the bits are ones.")
+    elif summary['bytes']:
+        st.caption(f"✅ Consistent with uniform random bytes. {summary['ones_fraction']:.1%} of the bits are ones.")
+    st.bar_chart({"Byte value": list(range(256)), "Count": stats.counts.tolist()}, x="Byte value", y="Count")
+
+
+st.subheader("🎲 Byte Statistics")
+
+col1, col2 = st.columns(2)
+with col1:
+    source_kind = st.radio("Data", ["Sample data", "Upload a file"], horizontal=True)
+    if source_kind == "Sample data":
+        sample = st.selectbox("Sample", list(SAMPLES))
+        sample_size = st.selectbox("Size", ["64K", "1M", "16M"], index=1)
+        uploaded_file = None
+        already_encrypted = False
+    else:
+        uploaded_file = st.file_uploader("File to analyse", key="analysis_file")
+        already_encrypted = st.checkbox("🔐 The file is already encrypted (analyse it as is)",
+                                        help="For example a `.cfb_encrypted` file from the File Operations tab")
+with col2:
+    segment_size = st.selectbox("Segment Size (bytes)", [1, 2, 4, 8, 16], index=4,
+                                help="Used to encrypt the data; the statistics do not depend on it")
+
+if st.button("📊 Analyze", disabled=source_kind == "Upload a file" and not uploaded_file):
+    if uploaded_file:
+        source, size = uploaded_file, uploaded_file.size
+    else:
+        size = parse_size(sample_size)
+        source = io.BytesIO(SAMPLES[sample](size))
+    progress = st.progress(0.0, text="Analysing...")
+    if already_encrypted:
+        st.session_state.analysis = (None, analyze_stream(source))
+    else:
+        st.session_state.analysis = analyze_encryption(
+            source, st.session_state.key, st.session_state.iv, segment_size,
+            progress=lambda done: progress.progress(min(done / size, 1.0) if size else 1.0, text="Analysing..."))
+    progress.empty()
+
+analysis = st.session_state.get('analysis')
+if not analysis:
+    st.info("Pick some data and click Analyze to compare plaintext and ciphertext statistics.")
+else:
+    plaintext_stats, ciphertext_stats = analysis
+    if plaintext_stats:
+        col1, col2 = st.columns(2)
+        with col1:
+            show_stats("📄 Plaintext", plaintext_stats)
+        with col2:
+            show_stats("🔒 Ciphertext", ciphertext_stats)
+    else:
+        show_stats("🔒 Ciphertext", ciphertext_stats)
+
+st.markdown("---")
+st.subheader("🌊 Avalanche")
+st.write(f"""
+Each trial flips one random plaintext bit and counts the ciphertext bits that change over the next
+{AVALANCHE_WINDOW} bytes. The flipped bit changes only its own position at first; the following segment is
+encrypted from a feedback register holding the changed ciphertext and about half of its bits flip.
+Larger segments therefore delay the diffusion by up to a whole segment.
+""")
+
+col1, col2 = st.columns(2)
+with col1:
+    avalanche_sizes = st.multiselect("Segment sizes (bytes)", [1, 2, 4, 8, 16], default=[1, 8, 16])
+with col2:
+    trials = st.slider("Trials per segment size", min_value=100, max_value=5000, value=1000, step=100)
+
+if st.button("🌊 Run Avalanche Test", disabled=not avalanche_sizes):
+    message = os.urandom(64 * 1024)
+    with st.spinner("Flipping bits..."):
+        st.session_state.avalanche_results = {
+            size: avalanche(message, st.session_state.key, st.session_state.iv, size, trials)
+            for size in sorted(avalanche_sizes)
+        }
+
+results = st.session_state.get('avalanche_results')
+if not results:
+    st.info("Run the avalanche test to see how far a single bit flip spreads.")
+else:
+    st.dataframe([
+        {
+            "Segment size": size,
+            "Bits changed in the flipped byte": round(result["flipped_byte_bits"], 2),
+            "Bytes before diffusion": round(result["delay_bytes"], 2),
+            "Bits changed after it": f"{result['diffused_fraction']:.2%}",
+            f"Hamming distance ({AVALANCHE_WINDOW} bytes)": round(result["hamming_distance"], 1),
+        }
+        for size, result in results.items()
+    ])
+    distance_limit = 40
+    st.line_chart([
+        {"Distance from the flipped byte (bytes)": distance, "Changed bits per byte": float(bits),
+         "Segment size": str(size)}
+        for size, result in results.items()
+        for distance, bits in enumerate(result["profile"][:distance_limit])
+    ], x="Distance from the flipped byte (bytes)", y="Changed bits per byte", color="Segment size")
+    st.caption("A fully diffused byte has 4 of its 8 bits changed on average.")
@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from cfb.auth import AuthenticationError, decrypt_stream_authenticated, encrypt_stream_authenticated
+from cfb.compress import CompressingReader, DecompressingWriter
+
+KEY = bytes(range(32))
+IV = bytes(range(16))
+DATA = b"".join(b"line %d of a compressible file\n" % i for i in range(20000))
+
+
+def compressed_container():
+    container = io.BytesIO()
+    encrypt_stream_authenticated(CompressingReader(io.BytesIO(DATA), "zlib"), container, KEY, IV, compressed=True)
+    return bytearray(container.getvalue())
+
+
+class RecordingTarget(io.BytesIO):
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def test_compressed_round_trip():
+    target = io.BytesIO()
+    writer = DecompressingWriter(target)
+    decrypt_stream_authenticated(io.BytesIO(compressed_container()), writer, KEY, verify_first=True)
+    writer.finish()
+    assert target.getvalue() == DATA
+
+
+def test_tampered_container_reaches_no_decompressor():
+    container = compressed_container()
+    container[len(container) // 2] ^= 0xFF
+    target = RecordingTarget()
+    with pytest.raises(AuthenticationError):
+        decrypt_stream_authenticated(io.BytesIO(bytes(container)), DecompressingWriter(target), KEY,
+                                     verify_first=True)
+    assert target.writes == 0
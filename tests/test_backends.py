@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from cfb.backends import BACKENDS, cross_check, get_backend, native_available
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+SEGMENT_SIZES = range(1, 17)
+# Empty, shorter than a segment, around the block size and not a multiple of any segment size above 1
+LENGTHS = (0, 1, 15, 16, 17, 31, 33, 100, 1000, 4099)
+
+
+def message(length, segment_size):
+    return random.Random(length * 100 + segment_size).randbytes(length)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """Ciphertexts of the educational loop, the reference every backend must match"""
+    educational = BACKENDS["educational"]
+    return {(segment_size, length): bytes(educational.encrypt(message(length, segment_size), KEY, IV, segment_size))
+            for segment_size in SEGMENT_SIZES for length in LENGTHS}
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("segment_size", SEGMENT_SIZES)
+@pytest.mark.parametrize("name", BACKENDS)
+def test_backend_matches_reference(reference, name, segment_size, length):
+    backend = BACKENDS[name]
+    plaintext = message(length, segment_size)
+    ciphertext = reference[segment_size, length]
+    assert bytes(backend.encrypt(plaintext, KEY, IV, segment_size)) == ciphertext
+    assert bytes(backend.decrypt(ciphertext, KEY, IV, segment_size)) == plaintext
+
+
+@pytest.mark.skipif(not native_available(), reason="pycryptodome MODE_CFB is not usable here")
+@pytest.mark.parametrize("segment_size", SEGMENT_SIZES)
+def test_reference_matches_pycryptodome(reference, segment_size):
+    from Crypto.Cipher import AES
+
+    for length in LENGTHS:
+        cipher = AES.new(KEY, AES.MODE_CFB, iv=IV, segment_size=segment_size * 8)
+        assert cipher.encrypt(message(length, segment_size)) == reference[segment_size, length]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown CFB backend"):
+        get_backend("missing")
+
+
+def test_cross_check_agrees():
+    assert cross_check(lengths=(0, 17), segment_sizes=(1, 16)) == []
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from cfb import batch
+from cfb.batch import MIN_BATCH, cfb_decrypt_batch, cfb_encrypt_batch
+from cfb.engine import cfb_decrypt, cfb_encrypt
+
+KEY = bytes(range(32))
+SEGMENT_SIZES = range(1, 17)
+# Mixed lengths so messages drop out of the lock-step rounds at different times, empty ones included
+LENGTHS = (0, 100, 1, 16, 0, 33, 17, 250, 15, 64)
+
+
+def messages(lengths, seed):
+    generator = random.Random(seed)
+    return [(generator.randbytes(length), generator.randbytes(16)) for length in lengths]
+
+
+def per_message(function, pairs, segment_size):
+    return [bytes(function(data, KEY, iv, segment_size)) for data, iv in pairs]
+
+
+@pytest.mark.parametrize("lengths", [LENGTHS, LENGTHS[:MIN_BATCH - 1], (), (0,) * MIN_BATCH],
+                         ids=["mixed", "below-min-batch", "none", "all-empty"])
+@pytest.mark.parametrize("segment_size", SEGMENT_SIZES)
+def test_batch_matches_per_message(segment_size, lengths):
+    plaintexts = messages(lengths, segment_size)
+    ciphertexts = per_message(cfb_encrypt, plaintexts, segment_size)
+    assert cfb_encrypt_batch(plaintexts, KEY, segment_size) == ciphertexts
+
+    pairs = [(ciphertext, iv) for ciphertext, (_, iv) in zip(ciphertexts, plaintexts)]
+    assert per_message(cfb_decrypt, pairs, segment_size) == [data for data, _ in plaintexts]
+    assert cfb_decrypt_batch(pairs, KEY, segment_size) == [data for data, _ in plaintexts]
+
+
+@pytest.mark.parametrize("segment_size", [1, 5, 16])
+def test_decrypt_in_several_ecb_calls(monkeypatch, segment_size):
+    monkeypatch.setattr(batch, "DECRYPT_BATCH_REGISTERS", 7)
+    plaintexts = messages(LENGTHS, segment_size)
+    pairs = [(cfb_encrypt(data, KEY, iv, segment_size), iv) for data, iv in plaintexts]
+    assert cfb_decrypt_batch(pairs, KEY, segment_size) == [data for data, _ in plaintexts]
@@ -0,0 +1,19 @@
+import json
+
+from cfb.bench import is_batch_report, main, run_batch_benchmarks, run_benchmarks
+
+
+def test_batch_covers_every_segment_size(tmp_path):
+    output = tmp_path / "batch.json"
+    assert main(["--batch", "--batch-sizes", "1", "4", "--segment-sizes", "1", "8", "16", "--message-size", "40",
+                 "--repeat", "1", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert is_batch_report(report)
+    assert {result["segment_size"] for result in report["results"]} == {1, 8, 16}
+
+
+def test_report_kinds():
+    assert is_batch_report(run_batch_benchmarks([1], 16, [16], repeat=1))
+    assert not is_batch_report(run_benchmarks(["1K"], [16], ["native"], repeat=1))
+    # Batch reports written before the metadata recorded their kind
+    assert is_batch_report({"meta": {}, "results": [{"batch_size": 1}]})
@@ -0,0 +1,66 @@
+import os
+import types
+
+import pytest
+
+from cfb import bits
+from cfb.bits import cfb_decrypt_bits, cfb_encrypt_bits
+
+# NIST SP 800-38A, appendix F.3
+IV = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+KEY_128 = bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c")
+KEY_256 = bytes.fromhex("603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4")
+PLAINTEXT = bytes.fromhex("6bc1bee22e409f96e93d7e117393172a ae2d8a571e03ac9c9eb76fac45af8e51"
+                          "30c81c46a35ce411e5fbc1191a0a52ef f69f2445df4f9b17ad2b417be66c3710")
+VECTORS = [
+    # (key, segment bits, plaintext bytes used, ciphertext)
+    (KEY_128, 1, 2, "68b3"),                                   # F.3.1 CFB1-AES128
+    (KEY_256, 1, 2, "9029"),                                   # F.3.5 CFB1-AES256
+    (KEY_128, 8, 18, "3b79424c9c0dd436bace9e0ed4586a4f32b9"),  # F.3.7 CFB8-AES128
+    (KEY_256, 8, 18, "dc1f1a8520a64db55fcc8ac554844e889700"),  # F.3.11 CFB8-AES256
+    (KEY_128, 128, 64, "3b3fd92eb72dad20333449f8e83cfb4a c8a64537a0b3a93fcde3cdad9f1ce58b"
+                       "26751f67a3cbb140b1808cf187a4f4df c04b05357c5d1c0eeac4c66f9ff7f2e6"),  # F.3.13 CFB128-AES128
+    (KEY_256, 128, 64, "dc7e84bfda79164b7ecd8486985d3860 39ffed143b28b1c832113c6331e5407b"
+                       "df10132415e54b92a13ed0a8267ae2f9 75a385741ab9cef82031623d55b1e471"),  # F.3.17 CFB128-AES256
+]
+
+
+@pytest.mark.parametrize("key, segment_bits, length, ciphertext", VECTORS)
+def test_sp800_38a_vectors(key, segment_bits, length, ciphertext):
+    ciphertext = bytes.fromhex(ciphertext)
+    assert cfb_encrypt_bits(PLAINTEXT[:length], key, IV, segment_bits) == ciphertext
+    assert cfb_decrypt_bits(ciphertext, key, IV, segment_bits) == PLAINTEXT[:length]
+
+
+@pytest.mark.parametrize("key", [KEY_128, KEY_256])
+def test_cfb64_matches_pycryptodome(key):
+    # SP 800-38A has no CFB-64 vectors: compare with pycryptodome's own MODE_CFB
+    from Crypto.Cipher import AES
+
+    expected = AES.new(key, AES.MODE_CFB, iv=IV, segment_size=64).encrypt(PLAINTEXT)
+    assert cfb_encrypt_bits(PLAINTEXT, key, IV, 64) == expected
+    assert cfb_decrypt_bits(expected, key, IV, 64) == PLAINTEXT
+
+
+def test_cfb1_without_ctypes_gives_the_same_output(monkeypatch):
+    import Crypto.Cipher
+
+    message = os.urandom(300)
+    fast = cfb_encrypt_bits(message, KEY_256, IV, 1)
+    # Without pycryptodome's raw ECB library _first_byte_encryptor falls back to cipher.encrypt
+    monkeypatch.setattr(Crypto.Cipher, "_mode_ecb", types.SimpleNamespace())
+    assert bits._first_byte_encryptor(KEY_256).__name__ == "<lambda>"
+    assert cfb_encrypt_bits(message, KEY_256, IV, 1) == fast
+    assert cfb_decrypt_bits(fast, KEY_256, IV, 1) == message
+
+
+def test_cfb1_decrypts_across_chunks(monkeypatch):
+    monkeypatch.setattr(bits, "CFB1_DECRYPT_CHUNK", 7)
+    message = os.urandom(50)
+    assert cfb_decrypt_bits(cfb_encrypt_bits(message, KEY_256, IV, 1), KEY_256, IV, 1) == message
+
+
+@pytest.mark.parametrize("segment_bits", [0, 2, 12, 136])
+def test_rejects_unsupported_segment_bits(segment_bits):
+    with pytest.raises(ValueError, match="Segment size"):
+        cfb_encrypt_bits(b"data", KEY_256, IV, segment_bits)
@@ -0,0 +1,149 @@
+import json
+import os
+import random
+
+import pytest
+
+from cfb.backends import native_encrypt
+from cfb.checkpoint import CheckpointError, checkpoint_path, decrypt_file_resumable, encrypt_file_resumable
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+LENGTH = 20011
+# Chunks and checkpoints that do not line up with segments, so checkpoints carry pending input
+CHUNK_SIZE = 1000
+INTERVAL = 3000
+STOP_AFTER = 11000
+OPERATIONS = {"encrypt": encrypt_file_resumable, "decrypt": decrypt_file_resumable}
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt(done, total):
+    if done >= STOP_AFTER:
+        raise Interrupted
+
+
+def files(tmp_path, operation, segment_size):
+    """Source, target and expected output of an operation on a random file"""
+    plaintext = random.Random(segment_size).randbytes(LENGTH)
+    ciphertext = native_encrypt(plaintext, KEY, IV, segment_size)
+    source = tmp_path / "source"
+    source.write_bytes(plaintext if operation == "encrypt" else ciphertext)
+    return str(source), str(tmp_path / "target"), ciphertext if operation == "encrypt" else plaintext
+
+
+def run(operation, source, target, segment_size, key=KEY, iv=IV, progress=None):
+    return OPERATIONS[operation](source, target, key, iv, segment_size, interval=INTERVAL, progress=progress,
+                                 chunk_size=CHUNK_SIZE)
+
+
+def interrupted(tmp_path, operation, segment_size):
+    """Source, target and expected output, after a run stopped between two checkpoints"""
+    source, target, expected = files(tmp_path, operation, segment_size)
+    with pytest.raises(Interrupted):
+        run(operation, source, target, segment_size, progress=interrupt)
+    return source, target, expected
+
+
+@pytest.mark.parametrize("segment_size", [1, 7, 16])
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_resume_after_interruption(tmp_path, operation, segment_size):
+    source, target, expected = interrupted(tmp_path, operation, segment_size)
+    with open(checkpoint_path(target)) as handle:
+        saved = json.load(handle)
+    # The run stopped past its last checkpoint: the output holds bytes that get redone
+    assert 0 < saved["offset"] < STOP_AFTER
+    assert saved["output_length"] < os.path.getsize(target)
+    assert len(bytes.fromhex(saved["pending"])) == saved["offset"] % segment_size
+
+    reported = []
+    assert run(operation, source, target, segment_size, progress=lambda done, total: reported.append(done)) == LENGTH
+    assert reported[0] == saved["offset"]
+    with open(target, 'rb') as handle:
+        assert handle.read() == expected
+    assert not os.path.exists(checkpoint_path(target))
+
+
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_resume_false_starts_over(tmp_path, operation):
+    source, target, expected = interrupted(tmp_path, operation, 16)
+    assert OPERATIONS[operation](source, target, KEY, IV, 16, resume=False, chunk_size=CHUNK_SIZE) == LENGTH
+    with open(target, 'rb') as handle:
+        assert handle.read() == expected
+
+
+def _other_key(source, target):
+    return dict(key=bytes(32))
+
+
+def _other_iv(source, target):
+    return dict(iv=bytes(16))
+
+
+def _other_segment_size(source, target):
+    return dict(segment_size=8)
+
+
+def _source_changed(source, target):
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return {}
+
+
+def _output_changed(source, target):
+    with open(target, 'r+b') as handle:
+        handle.seek(100)
+        byte = handle.read(1)
+        handle.seek(100)
+        handle.write(bytes([byte[0] ^ 1]))
+    return {}
+
+
+def _output_truncated(source, target):
+    os.truncate(target, 100)
+    return {}
+
+
+def _unreadable(source, target):
+    with open(checkpoint_path(target), 'w') as handle:
+        handle.write("{")
+    return {}
+
+
+def _stale_version(source, target):
+    with open(checkpoint_path(target)) as handle:
+        saved = json.load(handle)
+    saved["version"] += 1
+    with open(checkpoint_path(target), 'w') as handle:
+        json.dump(saved, handle)
+    return {}
+
+
+@pytest.mark.parametrize("change, message", [
+    (_other_key, "different key or IV"),
+    (_other_iv, "different key or IV"),
+    (_other_segment_size, "different operation"),
+    (_source_changed, "source file changed"),
+    (_output_changed, "does not match the checkpoint"),
+    (_output_truncated, "shorter than the checkpoint"),
+    (_unreadable, "Unreadable checkpoint"),
+    (_stale_version, "Unsupported checkpoint version"),
+])
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_mismatched_checkpoint(tmp_path, operation, change, message):
+    source, target, _ = interrupted(tmp_path, operation, 16)
+    arguments = dict(key=KEY, iv=IV, segment_size=16)
+    arguments.update(change(source, target))
+    with pytest.raises(CheckpointError, match=message):
+        run(operation, source, target, **arguments)
+    # Nothing was overwritten: the checkpoint is still there for the right parameters
+    assert os.path.exists(checkpoint_path(target))
+
+
+def test_checkpoint_of_the_other_operation(tmp_path):
+    source, target, _ = interrupted(tmp_path, "encrypt", 16)
+    with pytest.raises(CheckpointError, match="different operation"):
+        run("decrypt", source, target, 16)
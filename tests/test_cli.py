@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import hmac
+import io
+
+import pytest
+
+from cfb.auth import TAG_SIZE, derive_mac_key, encrypt_stream_authenticated
+from cfb.cli import main
+from cfb.compress import CompressingReader
+
+KEY = bytes(range(32))
+IV = bytes(range(16))
+DATA = bytes(range(256)) * 400
+
+
+@pytest.fixture(autouse=True)
+def secrets(monkeypatch):
+    monkeypatch.setenv("CFB_KEY", base64.b64encode(KEY).decode())
+    monkeypatch.setenv("CFB_IV", base64.b64encode(IV).decode())
+
+
+def write_authenticated(path, data=DATA):
+    container = io.BytesIO()
+    encrypt_stream_authenticated(io.BytesIO(data), container, KEY, IV, 8)
+    path.write_bytes(container.getvalue())
+    return container.getvalue()
+
+
+def test_decrypts_authenticated_file(tmp_path):
+    write_authenticated(tmp_path / "data.cfb_encrypted")
+    assert main(["decrypt", str(tmp_path / "data.cfb_encrypted"), "-o", str(tmp_path / "data")]) == 0
+    assert (tmp_path / "data").read_bytes() == DATA
+
+
+def test_rejects_modified_authenticated_file(tmp_path):
+    container = bytearray(write_authenticated(tmp_path / "data.cfb_encrypted"))
+    container[100] ^= 1
+    (tmp_path / "data.cfb_encrypted").write_bytes(bytes(container))
+    assert main(["decrypt", str(tmp_path / "data.cfb_encrypted"), "-o", str(tmp_path / "data")]) == 2
+    assert not (tmp_path / "data").exists()
+    assert [path.name for path in tmp_path.iterdir()] == ["data.cfb_encrypted"]
+
+
+def test_decrypts_version_1_authenticated_file(tmp_path):
+    # Version 1 headers have no flags byte
+    container = bytearray(write_authenticated(tmp_path / "data.cfb_encrypted"))
+    del container[6]
+    container[4] = 1
+    ciphertext = bytes(container[:-TAG_SIZE])
+    tag = hmac.new(derive_mac_key(KEY), ciphertext, hashlib.sha256).digest()
+    (tmp_path / "data.cfb_encrypted").write_bytes(ciphertext + tag)
+    assert main(["decrypt", str(tmp_path / "data.cfb_encrypted"), "-o", str(tmp_path / "data")]) == 0
+    assert (tmp_path / "data").read_bytes() == DATA
+
+
+@pytest.mark.parametrize("options, decrypt_options", [
+    ([], []),
+    (["--chunked"], []),
+    (["--resumable"], []),
+    (["--compress", "zlib"], ["--decompress"]),
+    (["--chunked", "--compress", "zlib"], []),
+])
+def test_round_trip(tmp_path, options, decrypt_options):
+    (tmp_path / "data").write_bytes(DATA)
+    assert main(["encrypt", str(tmp_path / "data"), "-o", str(tmp_path / "data.enc"), "-j", "1", *options]) == 0
+    assert main(["decrypt", str(tmp_path / "data.enc"), "-o", str(tmp_path / "out"), "-j", "1",
+                 *decrypt_options]) == 0
+    assert (tmp_path / "out").read_bytes() == DATA
+
+
+@pytest.mark.parametrize("options", [[], ["--chunked"]])
+def test_plaintext_looking_compressed_is_kept(tmp_path, options):
+    data = b"CFBZ\x01\x01 starts like a compression header" * 100
+    (tmp_path / "data").write_bytes(data)
+    assert main(["encrypt", str(tmp_path / "data"), "-o", str(tmp_path / "data.enc"), "-j", "1", *options]) == 0
+    assert main(["decrypt", str(tmp_path / "data.enc"), "-o", str(tmp_path / "out"), "-j", "1"]) == 0
+    assert (tmp_path / "out").read_bytes() == data
+
+
+def test_decrypt_spreads_chunked_files_over_workers(tmp_path, monkeypatch):
+    from cfb import cli
+
+    (tmp_path / "data").write_bytes(DATA)
+    assert main(["encrypt", str(tmp_path / "data"), "-o", str(tmp_path / "data.enc"), "--chunked", "-j", "1"]) == 0
+    calls = []
+
+    def decrypt_file_chunked(source, target, key, workers=None):
+        calls.append(workers)
+        return original(source, target, key, 1)
+
+    original = cli.decrypt_file_chunked
+    monkeypatch.setattr(cli, "decrypt_file_chunked", decrypt_file_chunked)
+    assert main(["decrypt", str(tmp_path / "data.enc"), "-o", str(tmp_path / "out"), "-j", "4"]) == 0
+    assert calls == [4]
+    assert (tmp_path / "out").read_bytes() == DATA
+
+
+def test_rejects_tampered_compressed_authenticated_file(tmp_path):
+    container = io.BytesIO()
+    encrypt_stream_authenticated(CompressingReader(io.BytesIO(DATA * 4), "zlib"), container, KEY, IV,
+                                 compressed=True)
+    tampered = bytearray(container.getvalue())
+    tampered[len(tampered) // 2] ^= 0xFF
+    (tmp_path / "data.cfb_encrypted").write_bytes(bytes(tampered))
+    assert main(["decrypt", str(tmp_path / "data.cfb_encrypted"), "-o", str(tmp_path / "data")]) == 2
+    assert [path.name for path in tmp_path.iterdir()] == ["data.cfb_encrypted"]
+
+
+def test_reports_corrupt_compressed_data(tmp_path, capsys):
+    (tmp_path / "data").write_bytes(b"CFBZ\x01\x01 is not a zlib stream")
+    assert main(["encrypt", str(tmp_path / "data"), "-o", str(tmp_path / "data.enc")]) == 0
+    assert main(["decrypt", str(tmp_path / "data.enc"), "-o", str(tmp_path / "out"), "--decompress"]) == 2
+    assert "Corrupt zlib data" in capsys.readouterr().err
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from cfb import files
+from cfb.backends import native_encrypt
+from cfb.files import decrypt_file, encrypt_file
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+LENGTH = 10007
+# Several chunks, and a chunk size that is rounded down to whole segments for most segment sizes
+CHUNK_SIZE = 1000
+
+
+@pytest.fixture(params=[True, False], ids=["native", "engine"])
+def native(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(files, "native_available", lambda: False)
+    return request.param
+
+
+def write(tmp_path, segment_size):
+    message = random.Random(segment_size).randbytes(LENGTH)
+    path = tmp_path / "data"
+    path.write_bytes(message)
+    return path, message
+
+
+@pytest.mark.parametrize("segment_size", [1, 7, 16])
+def test_in_place_round_trip(tmp_path, native, segment_size):
+    path, message = write(tmp_path, segment_size)
+    reported = []
+    assert encrypt_file(str(path), None, KEY, IV, segment_size, lambda done, total: reported.append((done, total)),
+                        CHUNK_SIZE) == LENGTH
+    assert len(reported) > 1 and reported[-1] == (LENGTH, LENGTH)
+    assert path.read_bytes() == native_encrypt(message, KEY, IV, segment_size)
+
+    assert decrypt_file(str(path), str(path), KEY, IV, segment_size, chunk_size=CHUNK_SIZE) == LENGTH
+    assert path.read_bytes() == message
+
+
+@pytest.mark.parametrize("segment_size", [1, 7, 16])
+def test_file_to_file_round_trip(tmp_path, native, segment_size):
+    path, message = write(tmp_path, segment_size)
+    encrypted = tmp_path / "encrypted"
+    decrypted = tmp_path / "decrypted"
+    encrypt_file(str(path), str(encrypted), KEY, IV, segment_size, chunk_size=CHUNK_SIZE)
+    assert encrypted.read_bytes() == native_encrypt(message, KEY, IV, segment_size)
+    assert path.read_bytes() == message
+    decrypt_file(str(encrypted), str(decrypted), KEY, IV, segment_size, chunk_size=CHUNK_SIZE)
+    assert decrypted.read_bytes() == message
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty"
+    path.write_bytes(b'')
+    target = tmp_path / "target"
+    target.write_bytes(b'stale')
+    assert encrypt_file(str(path), None, KEY, IV) == 0
+    assert encrypt_file(str(path), str(target), KEY, IV) == 0
+    assert path.read_bytes() == target.read_bytes() == b''
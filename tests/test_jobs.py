@@ -0,0 +1,88 @@
+import io
+import os
+
+import pytest
+
+from cfb.jobs import FORMATS, JobManager
+
+KEY = bytes(range(32))
+IV = bytes(range(16))
+# Compressible, and more than one 1 MB chunk
+DATA = b"".join(b"record %d of a job test\n" % i for i in range(60000))
+
+
+@pytest.fixture(scope="module")
+def manager():
+    jobs = JobManager(max_workers=1, max_jobs_per_session=100)
+    yield jobs
+    jobs.shutdown()
+
+
+def run(job):
+    job.future.result(timeout=120)
+    assert job.status == "done", job.error
+    return job
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_round_trip(manager, file_format, compression):
+    encrypted = run(manager.submit("test", "encrypt", io.BytesIO(DATA), "data.enc", KEY, IV, 16, file_format,
+                                   compression))
+    with open(encrypted.result_path, 'rb') as handle:
+        # Containers record compression in their header, raw files are told
+        decrypted = run(manager.submit("test", "decrypt", handle, "data", KEY, IV, 16,
+                                       decompress=bool(compression) and file_format == "raw"))
+    with open(decrypted.result_path, 'rb') as handle:
+        assert handle.read() == DATA
+    assert (encrypted.compression is not None) == bool(compression)
+    assert (decrypted.compression is not None) == bool(compression)
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_plaintext_looking_compressed_is_kept(manager, file_format):
+    data = b"CFBZ\x01\x01 starts like a compression header" * 100
+    encrypted = run(manager.submit("test", "encrypt", io.BytesIO(data), "data.enc", KEY, IV, 16, file_format))
+    with open(encrypted.result_path, 'rb') as handle:
+        decrypted = run(manager.submit("test", "decrypt", handle, "data", KEY, IV, 16))
+    with open(decrypted.result_path, 'rb') as handle:
+        assert handle.read() == data
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_profile_records_io(manager, file_format):
+    job = run(manager.submit("test", "encrypt", io.BytesIO(DATA), "data.enc", KEY, IV, 16, file_format,
+                             profile=True))
+    assert {"upload", "read", "write", "cipher"} <= set(job.profile.seconds)
+
+
+def test_failed_job_leaves_no_result(manager):
+    job = manager.submit("test", "decrypt", io.BytesIO(b"CFBA\x01\x10" + bytes(100)), "bad", KEY, IV)
+    job.future.exception(timeout=120)
+    assert job.status == "failed"
+    assert not os.path.exists(job.target_path)
+
+
+def test_chunked_job_with_chunk_workers():
+    jobs = JobManager(max_workers=1, chunk_workers=2)
+    try:
+        encrypted = run(jobs.submit("test", "encrypt", io.BytesIO(DATA), "data.enc", KEY, IV, 16, "chunked"))
+        with open(encrypted.result_path, 'rb') as handle:
+            decrypted = run(jobs.submit("test", "decrypt", handle, "data", KEY, IV, 16))
+        with open(decrypted.result_path, 'rb') as handle:
+            assert handle.read() == DATA
+    finally:
+        jobs.shutdown()
+
+
+def test_tampered_compressed_container_fails_authentication(manager):
+    encrypted = run(manager.submit("test", "encrypt", io.BytesIO(DATA), "data.enc", KEY, IV, 16, "authenticated",
+                                   "zlib"))
+    with open(encrypted.result_path, 'rb') as handle:
+        container = bytearray(handle.read())
+    container[len(container) // 2] ^= 0xFF
+    job = manager.submit("test", "decrypt", io.BytesIO(bytes(container)), "data", KEY, IV)
+    job.future.exception(timeout=120)
+    assert job.status == "failed"
+    assert "Authentication failed" in job.error
+    assert not os.path.exists(job.target_path)
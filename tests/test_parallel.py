@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from cfb import parallel
+from cfb.backends import native_encrypt
+from cfb.engine import cfb_decrypt
+from cfb.parallel import PARALLEL_THRESHOLD, cfb_decrypt_parallel
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+# Not a multiple of the segment sizes tested, so the last chunk ends on a partial segment
+LENGTH = PARALLEL_THRESHOLD + 1003
+# 3001 registers per chunk, so chunk edges fall inside AES blocks of the ciphertext
+CHUNK_REGISTER_BYTES = 3001 * 16
+
+
+@pytest.fixture(scope="module")
+def plaintext():
+    return random.Random(LENGTH).randbytes(LENGTH)
+
+
+# The serial loop of cfb_decrypt takes seconds per megabyte for the smallest segments
+@pytest.mark.parametrize("segment_size", [3, 8, 16])
+def test_threaded_chunks_match_serial_decrypt(monkeypatch, plaintext, segment_size):
+    monkeypatch.setattr(parallel, "CHUNK_REGISTER_BYTES", CHUNK_REGISTER_BYTES)
+    ciphertext = native_encrypt(plaintext, KEY, IV, segment_size)
+    assert -(-LENGTH // segment_size) > CHUNK_REGISTER_BYTES // 16
+    decrypted = cfb_decrypt_parallel(ciphertext, KEY, IV, segment_size, workers=4)
+    assert decrypted == cfb_decrypt(ciphertext, KEY, IV, segment_size)
+    assert decrypted == plaintext
+
+
+def test_default_workers_use_every_core(monkeypatch, plaintext):
+    monkeypatch.setattr(parallel, "CHUNK_REGISTER_BYTES", CHUNK_REGISTER_BYTES)
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 4)
+    pools = []
+    real_pool = parallel.ThreadPoolExecutor
+
+    def pool(max_workers):
+        pools.append(max_workers)
+        return real_pool(max_workers=max_workers)
+
+    monkeypatch.setattr(parallel, "ThreadPoolExecutor", pool)
+    ciphertext = native_encrypt(plaintext, KEY, IV, 16)
+    assert cfb_decrypt_parallel(ciphertext, KEY, IV, 16) == plaintext
+    assert pools == [4]
+    # Below the threshold the chunks are decrypted in the calling thread
+    assert cfb_decrypt_parallel(ciphertext[:1000], KEY, IV, 16) == plaintext[:1000]
+    assert pools == [4]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from cfb.backends import BACKENDS, native_encrypt
+from cfb.ranges import MappedCiphertext, decrypt_range
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+LENGTH = 1001
+SEGMENT_SIZES = (1, 5, 16)
+
+
+def plaintext():
+    return random.Random(LENGTH).randbytes(LENGTH)
+
+
+def boundaries(segment_size):
+    """Offsets around the start, segment edges, the end of the IV in the register and the end of the data"""
+    edges = {0, 1, 15, 16, 17, LENGTH - 1}
+    for segment in (1, 2, 3, 4, 100, (LENGTH - 1) // segment_size):
+        edges.update({segment * segment_size - 1, segment * segment_size, segment * segment_size + 1})
+    return sorted(offset for offset in edges if 0 <= offset < LENGTH)
+
+
+def ranges(segment_size):
+    for offset in boundaries(segment_size):
+        for length in (1, segment_size - 1, segment_size, segment_size + 1, 40, LENGTH):
+            if length > 0:
+                yield offset, length
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("segment_size", SEGMENT_SIZES)
+def test_ranges_at_boundaries(segment_size, backend):
+    message = plaintext()
+    ciphertext = native_encrypt(message, KEY, IV, segment_size)
+    for offset, length in ranges(segment_size):
+        assert decrypt_range(ciphertext, offset, length, KEY, IV, segment_size, backend) == \
+            message[offset:offset + length], (offset, length)
+
+
+@pytest.mark.parametrize("offset, length", [(0, 0), (LENGTH, 10), (LENGTH + 5, 10), (10, 0)])
+def test_empty_ranges(offset, length):
+    ciphertext = native_encrypt(plaintext(), KEY, IV, 16)
+    assert decrypt_range(ciphertext, offset, length, KEY, IV) == b''
+
+
+@pytest.mark.parametrize("offset, length", [(-1, 10), (0, -1)])
+def test_negative_range(offset, length):
+    with pytest.raises(ValueError, match="must not be negative"):
+        decrypt_range(b'data', offset, length, KEY, IV)
+
+
+@pytest.mark.parametrize("segment_size", SEGMENT_SIZES)
+def test_mapped_ciphertext(tmp_path, segment_size):
+    message = plaintext()
+    path = tmp_path / "encrypted"
+    path.write_bytes(native_encrypt(message, KEY, IV, segment_size))
+    with MappedCiphertext(str(path), KEY, IV, segment_size) as mapped:
+        assert mapped.size == LENGTH
+        for offset, length in ranges(segment_size):
+            assert mapped.read_range(offset, length) == message[offset:offset + length], (offset, length)
+        assert mapped.read_range(LENGTH, 1) == b''
+
+
+def test_mapped_empty_file(tmp_path):
+    path = tmp_path / "empty"
+    path.write_bytes(b'')
+    with MappedCiphertext(str(path), KEY, IV) as mapped:
+        assert mapped.size == 0
+        assert mapped.read_range(0, 10) == b''
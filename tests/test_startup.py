@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+from cfb.bench import STARTUP_BUDGET_MS, measure_startup
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on first use only, never by ``import cfb``
+HEAVY_MODULES = ("streamlit", "numpy", "Crypto")
+SCRIPT = f"""
+import sys
+import cfb
+cfb.cfb_encrypt, cfb.cfb_decrypt, cfb.generate_key
+print(*[name for name in {HEAVY_MODULES!r} if name in sys.modules])
+"""
+
+
+def test_import_loads_no_heavy_modules():
+    output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=PACKAGE_ROOT, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.split() == []
+
+
+def test_import_within_budget():
+    milliseconds, imports_streamlit = measure_startup()
+    assert not imports_streamlit
+    assert milliseconds <= STARTUP_BUDGET_MS, f"import cfb took {milliseconds:.1f} ms"